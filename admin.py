@@ -3,9 +3,8 @@
 Управление пользователями, статистикой, рассылками и настройками
 """
 
+import html
 import logging
-import csv
-import io
 import asyncio
 import os
 import sys
@@ -18,7 +17,13 @@ from telegram.constants import ParseMode
 from config import ADMIN_IDS, MESSAGES
 from keyboards import Keyboards
 from database import db
+from gateway import outbound
+from notifications import notification_planner
 from payment import payment_system
+from export import data_exporter, EXPORT_QUERIES
+from utils import Utils
+from content import content_registry
+from sqltrace import sql_tracer
 # from validation import input_validator, error_handler, ValidationError  # Модуль не существует
 
 logger = logging.getLogger(__name__)
@@ -26,6 +31,9 @@ logger = logging.getLogger(__name__)
 # Создаем экземпляр клавиатур
 keyboards = Keyboards()
 
+# Пользователей на странице в админ-панели
+USERS_PAGE_SIZE = 10
+
 class AdminPanel:
     """Класс для управления админ-панелью"""
     
@@ -58,14 +66,22 @@ class AdminPanel:
                 await self.start_broadcast(query)
             elif callback_data == 'admin_export_db':
                 await self.export_database(query)
+            elif callback_data == 'admin_export_columns':
+                await self.export_database(query, fmt='columns')
             elif callback_data == 'admin_analytics':
                 await self.show_simple_analytics(query)
-            elif callback_data == 'admin_users':
-                await self.show_users(query)
+            elif callback_data == 'admin_users' or callback_data.startswith('admin_users_'):
+                await self.show_users(query, callback_data)
             elif callback_data == 'admin_payments':
                 await self.show_payments(query)
             elif callback_data == 'admin_reviews':
                 await self.show_reviews(query)
+            elif callback_data == 'admin_reload_content':
+                await self.reload_content(query)
+            elif callback_data == 'admin_scheduler':
+                await self.show_scheduler_health(query)
+            elif callback_data == 'admin_sql_trace':
+                await self.show_sql_trace(query)
             elif callback_data == 'admin_clear_db':
                 await self.show_clear_db_confirmation(query)
             elif callback_data == 'confirm_clear_db':
@@ -91,8 +107,9 @@ class AdminPanel:
         """Показ общей статистики"""
         try:
             # Получаем статистику
-            users_count = db.get_users_count()
-            premium_users = len([u for u in db.get_all_users() if u['is_premium']])
+            counters = db.get_dashboard_counters()
+            users_count = counters['total']
+            premium_users = counters['premium']
             
             # Безопасное получение статистики платежей
             try:
@@ -107,10 +124,15 @@ class AdminPanel:
                 avg_amount = 0
             
             # Статистика по дням курса
-            users_by_day = {}
-            for user in db.get_all_users():
-                day = user['current_day']
-                users_by_day[day] = users_by_day.get(day, 0) + 1
+            users_by_day = counters['users_by_day']
+            
+            # Метрики доставки исходящего шлюза по классам приоритета
+            delivery = outbound.get_stats()
+            delivery_lines = "\n".join(
+                f"• {name}: {item['sent']} ✅ / {item['failed']} ❌ / {item['retry_after']} ⏳, ожидание {item['avg_wait_ms']} мс"
+                for name, item in delivery.items() if isinstance(item, dict)
+            )
+            notifications = notification_planner.get_stats()
             
             stats_text = f"""
 📊 СТАТИСТИКА БОТА
@@ -130,6 +152,10 @@ class AdminPanel:
 • День 2: {users_by_day.get(2, 0)}
 • День 3: {users_by_day.get(3, 0)}
 
+📤 Доставка (в очереди: {delivery['queued']}):
+{delivery_lines}
+• Уведомления: {notifications['messages']} сообщений, объединено {notifications['merged']}, сверх бюджета {notifications['over_budget']}
+
 🕒 Последнее обновление: {datetime.now().strftime('%H:%M:%S')}
             """
             
@@ -150,8 +176,9 @@ class AdminPanel:
         """Показ упрощенной аналитики"""
         try:
             # Получаем базовую статистику
-            users_count = db.get_users_count()
-            premium_users = len([u for u in db.get_all_users() if u['is_premium']])
+            counters = db.get_dashboard_counters()
+            users_count = counters['total']
+            premium_users = counters['premium']
             
             analytics_text = f"""
 📊 <b>АНАЛИТИКА</b>
@@ -187,27 +214,51 @@ class AdminPanel:
     
     
     
-    async def show_users(self, query):
-        """Показ списка пользователей"""
+    def _parse_users_filter(self, filter_key: str) -> dict:
+        """Фильтр просмотра пользователей из ключа callback_data: all, prem, d1..d3, tz<индекс>"""
+        if filter_key == 'prem':
+            return {'is_premium': True}
+        if filter_key.startswith('d') and filter_key[1:].isdigit():
+            return {'current_day': int(filter_key[1:])}
+        if filter_key.startswith('tz') and filter_key[2:].isdigit():
+            timezones = Utils.get_common_timezones()
+            return {'timezone': timezones[int(filter_key[2:]) % len(timezones)]['value']}
+        return {}
+    
+    async def show_users(self, query, callback_data: str = 'admin_users'):
+        """Постраничный просмотр пользователей: admin_users_<фильтр>[_page_n<user_id>|_page_p<user_id>]"""
         try:
-            users = db.get_all_users()[:10]  # Показываем первых 10
+            prefix, _, cursor = callback_data.partition('_page_')
+            filter_key = prefix[len('admin_users_'):] if prefix.startswith('admin_users_') else 'all'
             
-            users_text = "👥 ПОЛЬЗОВАТЕЛИ (последние 10)\n\n"
+            filters = self._parse_users_filter(filter_key)
+            after_user_id = int(cursor[1:]) if cursor.startswith('n') else None
+            before_user_id = int(cursor[1:]) if cursor.startswith('p') else None
+            page = db.get_users_page(USERS_PAGE_SIZE, after_user_id=after_user_id,
+                                     before_user_id=before_user_id, **filters)
             
-            for user in users:
+            filter_title = ', '.join(f"{key}={value}" for key, value in filters.items()) or 'все'
+            users_text = f"👥 ПОЛЬЗОВАТЕЛИ (фильтр: {filter_title})\n\n"
+            
+            for user in page['users']:
                 status = "💎 Премиум" if user['is_premium'] else "👤 Обычный"
-                phone = user.get('phone', 'Не указан')
+                phone = user.get('phone') or 'Не указан'
                 users_text += f"• {user['first_name']} (@{user['username']}) - {status}\n"
                 users_text += f"  📱 Телефон: {phone}\n"
-                users_text += f"  День: {user['current_day']}, Регистрация: {user['registration_date'][:10]}\n\n"
+                users_text += f"  День: {user['current_day']}, Регистрация: {str(user['registration_date'])[:10]}\n\n"
             
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data='admin_menu')]
-            ]
+            if not page['users']:
+                users_text += "Пользователи не найдены"
+            
+            # Кнопка 🌍 перебирает часовые пояса по кругу
+            timezone_index = int(filter_key[2:]) + 1 if filter_key.startswith('tz') else 0
             
             await query.edit_message_text(
                 users_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=keyboards.users_browser_menu(
+                    filter_key, page['prev_cursor'], page['next_cursor'],
+                    next_timezone_key=f"tz{timezone_index % len(Utils.get_common_timezones())}"
+                ),
                 parse_mode=ParseMode.HTML
             )
             
@@ -218,6 +269,111 @@ class AdminPanel:
                 reply_markup=keyboards.admin_menu()
             )
     
+    async def reload_content(self, query):
+        """Принудительная перечитка файлов контента без перезапуска бота"""
+        try:
+            updated = await content_registry.reload(force=True)
+            versions = content_registry.get_versions()
+            
+            content_text = "🔄 <b>КОНТЕНТ</b>\n\n"
+            for name, version in versions.items():
+                mark = "✅" if name in updated else "•"
+                content_text += f"{mark} {name}: {'версия ' + str(version) if version else 'встроенный'}\n"
+            content_text += f"\nОбновлено разделов: {len(updated)}"
+            
+            await query.edit_message_text(
+                content_text,
+                reply_markup=keyboards.admin_menu(),
+                parse_mode=ParseMode.HTML
+            )
+            
+        except Exception as e:
+            logger.error(f"Ошибка обновления контента: {e}")
+            await query.edit_message_text(
+                "❌ Ошибка обновления контента.",
+                reply_markup=keyboards.admin_menu()
+            )
+    
+    async def show_scheduler_health(self, query):
+        """Состояние планировщика: опоздания, время выполнения, ошибки и пропуски задач"""
+        try:
+            from jobs import scheduler
+            health = scheduler.get_health()
+            
+            health_text = "🕒 <b>ПЛАНИРОВЩИК</b>\n\n"
+            health_text += f"{'✅ Работает' if health['running'] else '⛔ Остановлен'}, задач: {health['jobs']}, выполняется: {health['running_now']}\n"
+            if health['catch_up']:
+                health_text += f"Поставлено в очередь после запуска: {health['catch_up']['queued']} ({health['catch_up']['at']})\n"
+            
+            for name, item in health['groups'].items():
+                health_text += (
+                    f"\n<b>{name}</b>: {item['executed']} ✅ / {item['errors']} ❌ / "
+                    f"{item['missed']} пропущено / {item['skipped']} наложений\n"
+                    f"• опоздание {item['avg_lag_ms']} мс (макс. {item['max_lag_ms']})\n"
+                    f"• выполнение {item['avg_run_ms']} мс (макс. {item['max_run_ms']})\n"
+                )
+            
+            await query.edit_message_text(
+                health_text,
+                reply_markup=keyboards.admin_menu(),
+                parse_mode=ParseMode.HTML
+            )
+            
+        except Exception as e:
+            logger.error(f"Ошибка показа состояния планировщика: {e}")
+            await query.edit_message_text(
+                "❌ Ошибка получения состояния планировщика.",
+                reply_markup=keyboards.admin_menu()
+            )
+    
+    async def show_sql_trace(self, query):
+        """Самые затратные SQL-запросы и медленные запросы с полным сканированием"""
+        try:
+            if not sql_tracer.settings['enabled']:
+                await query.edit_message_text(
+                    "🐢 Трассировка SQL выключена. Для диагностики запустите бота с SQL_TRACE=1.",
+                    reply_markup=keyboards.admin_menu()
+                )
+                return
+            
+            report = sql_tracer.get_report(limit=8)
+            
+            header = f"🐢 <b>SQL-ЗАПРОСЫ</b> с {report['since']}\n\n"
+            entries = [
+                f"• {item['count']} × {item['avg_ms']} мс, p95 {item['p95_ms']} мс, всего {item['total_ms']} мс\n"
+                f"<code>{html.escape(item['sql'][:120])}</code>\n"
+                for item in report['queries']
+            ]
+            entries.append(
+                f"\n⏱ Медленнее {report['slow_ms']} мс: {len(report['slow_queries'])}"
+                f", с полным сканированием: {len(report['full_scans'])}\n"
+            )
+            for item in report['slow_queries'][-3:]:
+                plan = '; '.join(item.get('plan', []))
+                entries.append(
+                    f"• {item['ms']} мс <code>{html.escape(item['sql'][:100])}</code> {html.escape(plan[:100])}\n"
+                )
+            
+            # Записи добавляются целиком, пока текст помещается в сообщение, - обрезка не разрывает разметку
+            trace_text = header
+            for entry in entries:
+                if len(trace_text) + len(entry) > 4000:
+                    break
+                trace_text += entry
+            
+            await query.edit_message_text(
+                trace_text,
+                reply_markup=keyboards.admin_menu(),
+                parse_mode=ParseMode.HTML
+            )
+            
+        except Exception as e:
+            logger.error(f"Ошибка показа трассировки SQL: {e}")
+            await query.edit_message_text(
+                "❌ Ошибка получения статистики SQL.",
+                reply_markup=keyboards.admin_menu()
+            )
+    
     async def show_payments(self, query):
         """Показ статистики платежей"""
         try:
@@ -409,7 +565,7 @@ class AdminPanel:
 Сообщение:
 {message_text}
 
-📊 Будет отправлено: {db.get_users_count()} пользователям
+📊 Будет отправлено: {db.get_users_count(include_blocked=False)} пользователям
 
 Подтвердить рассылку?
             """
@@ -441,7 +597,7 @@ class AdminPanel:
     async def execute_broadcast(self, query, message_text: str):
         """Выполнение рассылки"""
         try:
-            users = db.get_all_users()
+            users = db.get_all_users(include_blocked=False)
             sent_count = 0
             failed_count = 0
             
@@ -452,16 +608,15 @@ class AdminPanel:
             
             for user in users:
                 try:
-                    await query.bot.send_message(
-                        chat_id=user['user_id'],
-                        text=message_text,
-                        parse_mode=ParseMode.HTML
-                    )
+                    # Темп рассылки задает шлюз: она уступает ответам пользователям и напоминаниям
+                    with outbound.priority('broadcast'):
+                        await query.get_bot().send_message(
+                            chat_id=user['user_id'],
+                            text=message_text,
+                            parse_mode=ParseMode.HTML
+                        )
                     sent_count += 1
                     
-                    # Небольшая задержка между сообщениями
-                    await asyncio.sleep(0.1)
-                    
                 except Exception as e:
                     failed_count += 1
                     logger.warning(f"Не удалось отправить сообщение пользователю {user['user_id']}: {e}")
@@ -493,43 +648,29 @@ class AdminPanel:
                 reply_markup=keyboards.admin_menu()
             )
     
-    async def export_database(self, query):
+    async def export_database(self, query, fmt: str = 'csv'):
         """Экспорт базы данных"""
         try:
-            # Создаем CSV файл с данными пользователей
-            users = db.get_all_users()
+            await query.edit_message_text("⏳ Экспорт базы данных...")
             
-            csv_data = io.StringIO()
-            writer = csv.writer(csv_data)
-            
-            # Заголовки
-            writer.writerow([
-                'user_id', 'username', 'first_name', 'last_name', 'email',
-                'timezone', 'current_day', 'registration_date', 'is_premium',
-                'total_referrals', 'total_purchases'
-            ])
-            
-            # Данные пользователей
-            for user in users:
-                writer.writerow([
-                    user['user_id'], user['username'], user['first_name'],
-                    user['last_name'], user['email'], user['timezone'],
-                    user['current_day'], user['registration_date'],
-                    user['is_premium'], user['total_referrals'],
-                    user['total_purchases']
-                ])
-            
-            # Отправляем файл
-            csv_data.seek(0)
-            await query.bot.send_document(
-                chat_id=query.from_user.id,
-                document=io.BytesIO(csv_data.getvalue().encode('utf-8')),
-                filename=f"users_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                caption=f"📊 Экспорт пользователей ({len(users)} записей)"
-            )
+            exported = {}
+            for table in EXPORT_QUERIES:
+                # Экспорт читает базу постранично и пишет сжатый файл - выполняем вне event loop
+                spool, rows_count, filename = await asyncio.to_thread(
+                    data_exporter.export_table, table, fmt
+                )
+                with spool:
+                    await query.get_bot().send_document(
+                        chat_id=query.from_user.id,
+                        document=spool,
+                        filename=filename,
+                        caption=f"📊 Экспорт {table} ({rows_count} записей)"
+                    )
+                exported[table] = rows_count
             
+            summary = "\n".join(f"• {table}: {count}" for table, count in exported.items())
             await query.edit_message_text(
-                f"✅ База данных экспортирована! Отправлено {len(users)} записей.",
+                f"✅ База данных экспортирована!\n\n{summary}",
                 reply_markup=keyboards.admin_menu()
             )
             
@@ -711,20 +852,18 @@ class AdminPanel:
             # Получаем список всех таблиц
             tables_to_clear = [
                 'users', 'analytics', 'payments', 'reviews', 
-                'training_feedback', 'analysis_requests', 'daily_stats', 'scheduled_jobs'
+                'training_feedback', 'analysis_requests', 'daily_stats', 'scheduled_jobs',
+                'user_tips', 'training_streaks', 'pending_unlocks'
             ]
             
             cleared_count = 0
             
             # Используем правильный способ работы с базой данных
-            import sqlite3
-            from config import DATABASE_PATH
-            
-            with sqlite3.connect(DATABASE_PATH) as conn:
+            with db.connect() as conn:
                 cursor = conn.cursor()
                 
                 # Получаем список существующих таблиц
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
                 existing_tables = [row[0] for row in cursor.fetchall()]
                 
                 for table in tables_to_clear:
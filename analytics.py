@@ -4,87 +4,192 @@
 """
 
 import logging
+import time
+from collections import Counter, OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
-import sqlite3
+from itertools import groupby
+from operator import itemgetter
+from typing import List, Dict, Optional, Any, Iterator, Tuple
 from database import db
 
 logger = logging.getLogger(__name__)
 
+# Время жизни кэша профиля (окно "последние N дней" сдвигается со временем)
+PROFILE_CACHE_TTL = 300
+# Сколько профилей держать в памяти (самые давно использованные вытесняются)
+PROFILE_CACHE_SIZE = 5000
+
+# Серии тренировок (gaps-and-islands): у подряд идущих дат разность
+# julianday(day) - ROW_NUMBER() постоянна, поэтому она и есть ключ серии
+STREAKS_QUERY = '''
+    WITH days AS (
+        SELECT DISTINCT user_id, DATE(timestamp) AS day
+        FROM analytics
+        WHERE event_type = 'training_completed'
+    ),
+    islands AS (
+        SELECT user_id, day,
+               julianday(day) - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day) AS grp
+        FROM days
+    ),
+    runs AS (
+        SELECT user_id, COUNT(*) AS length, MAX(day) AS last_day
+        FROM islands
+        GROUP BY user_id, grp
+    )
+'''
+
 class AdvancedAnalytics:
     """Расширенная система аналитики"""
     
     def __init__(self, database=None):
         self.db = database or db
+        # LRU-кэш профилей: (user_id, days) -> {'profile': ..., 'built_at': ...}
+        self._profile_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._profile_days = set()  # Значения days в кэше - для сброса без перебора всех ключей
+        self.db.add_event_listener(self.invalidate_profile)
+        self.db.add_event_listener(self.update_streak_on_event)
+    
+    def close(self):
+        """Отписывает экземпляр от событий базы (для временных экземпляров поверх общей базы)"""
+        self.db.remove_event_listener(self.invalidate_profile)
+        self.db.remove_event_listener(self.update_streak_on_event)
+        self._profile_cache.clear()
+        self._profile_days.clear()
     
     def get_user_engagement_metrics(self, user_id: int, days: int = 30) -> Dict[str, Any]:
         """Получает метрики вовлеченности пользователя"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
+            profile = self.get_user_profile(user_id, days)
+            return profile.get('engagement', {})
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения метрик вовлеченности: {e}")
+            return {}
+    
+    def get_user_profile(self, user_id: int, days: int = 30) -> Dict[str, Any]:
+        """Профиль пользователя (вовлеченность + тренировки) из кэша или за один проход"""
+        try:
+            cached = self._profile_cache.get((user_id, days))
+            if cached and time.monotonic() - cached['built_at'] < PROFILE_CACHE_TTL:
+                self._profile_cache.move_to_end((user_id, days))
+                return cached['profile']
             
-            with sqlite3.connect(self.db.db_path) as conn:
+            cutoff = str(datetime.now() - timedelta(days=days))
+            
+            with self.db.connect() as conn:
                 cursor = conn.cursor()
                 
-                # Общая активность
-                cursor.execute('''
-                    SELECT COUNT(*) as total_events
-                    FROM analytics 
-                    WHERE user_id = ? AND timestamp > ?
-                ''', (user_id, cutoff_date))
-                total_events = cursor.fetchone()[0]
-                
-                # Активность по дням
-                cursor.execute('''
-                    SELECT DATE(timestamp) as date, COUNT(*) as events
-                    FROM analytics 
-                    WHERE user_id = ? AND timestamp > ?
-                    GROUP BY DATE(timestamp)
-                    ORDER BY date DESC
-                ''', (user_id, cutoff_date))
-                daily_activity = cursor.fetchall()
-                
-                # Типы событий
+                # Один запрос по индексу пользователя: все события читаются потоково
                 cursor.execute('''
-                    SELECT event_type, COUNT(*) as count
+                    SELECT event_type, timestamp
                     FROM analytics 
-                    WHERE user_id = ? AND timestamp > ?
-                    GROUP BY event_type
-                    ORDER BY count DESC
-                ''', (user_id, cutoff_date))
-                event_types = cursor.fetchall()
-                
-                # Время активности (часы дня)
-                cursor.execute('''
-                    SELECT strftime('%H', timestamp) as hour, COUNT(*) as count
-                    FROM analytics 
-                    WHERE user_id = ? AND timestamp > ?
-                    GROUP BY strftime('%H', timestamp)
-                    ORDER BY count DESC
-                ''', (user_id, cutoff_date))
-                hourly_activity = cursor.fetchall()
-                
-                # Сессии (группировка событий по дням)
-                active_days = len(daily_activity)
-                avg_events_per_day = total_events / max(active_days, 1)
-                
-                # Самый активный час
-                most_active_hour = hourly_activity[0][0] if hourly_activity else None
-                
-                return {
-                    'total_events': total_events,
-                    'active_days': active_days,
-                    'avg_events_per_day': round(avg_events_per_day, 2),
-                    'daily_activity': daily_activity,
-                    'event_types': dict(event_types),
-                    'hourly_activity': dict(hourly_activity),
-                    'most_active_hour': most_active_hour,
-                    'engagement_score': self._calculate_engagement_score(total_events, active_days, days)
-                }
-                
+                    WHERE user_id = ?
+                ''', (user_id,))
+                profile = self._build_profile(cursor, cutoff, days)
+            
+            self._cache_profile(user_id, days, profile, time.monotonic())
+            return profile
+            
         except Exception as e:
-            logger.error(f"Ошибка получения метрик вовлеченности: {e}")
+            logger.error(f"Ошибка построения профиля пользователя: {e}")
             return {}
     
+    def build_all_profiles(self, days: int = 30) -> Dict[int, Dict[str, Any]]:
+        """Пакетное построение профилей всех пользователей за один проход по таблице"""
+        try:
+            profiles = dict(self.iter_all_profiles(days))
+            
+            # В кэш попадают только последние PROFILE_CACHE_SIZE профилей
+            built_at = time.monotonic()
+            for user_id, profile in profiles.items():
+                self._cache_profile(user_id, days, profile, built_at)
+            
+            return profiles
+            
+        except Exception as e:
+            logger.error(f"Ошибка пакетного построения профилей: {e}")
+            return {}
+    
+    def iter_all_profiles(self, days: int = 30) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Потоковая генерация профилей (user_id, profile) в порядке возрастания user_id"""
+        cutoff = str(datetime.now() - timedelta(days=days))
+        
+        conn = self.db.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT user_id, event_type, timestamp
+                FROM analytics 
+                ORDER BY user_id
+            ''')
+            
+            for user_id, rows in groupby(cursor, key=itemgetter(0)):
+                events = ((event_type, timestamp) for _, event_type, timestamp in rows)
+                yield user_id, self._build_profile(events, cutoff, days)
+        finally:
+            conn.close()
+    
+    def _cache_profile(self, user_id: int, days: int, profile: Dict[str, Any], built_at: float):
+        """Запись профиля в LRU-кэш с вытеснением самых давно использованных"""
+        self._profile_cache[(user_id, days)] = {'profile': profile, 'built_at': built_at}
+        self._profile_cache.move_to_end((user_id, days))
+        self._profile_days.add(days)
+        while len(self._profile_cache) > PROFILE_CACHE_SIZE:
+            self._profile_cache.popitem(last=False)
+    
+    def invalidate_profile(self, user_id: int, event_type: str = None):
+        """Сбрасывает кэш профиля пользователя (вызывается при новом событии)"""
+        for days in self._profile_days:
+            self._profile_cache.pop((user_id, days), None)
+    
+    def _build_profile(self, events, cutoff: str, days: int) -> Dict[str, Any]:
+        """Считает все метрики профиля за один проход по событиям (event_type, timestamp)"""
+        total_events = 0
+        daily = Counter()
+        types = Counter()
+        hourly = Counter()
+        training_hours = Counter()
+        training_dates = set()
+        
+        for event_type, timestamp in events:
+            timestamp = str(timestamp)
+            date, hour = timestamp[:10], timestamp[11:13]
+            
+            if event_type == 'training_completed':
+                training_hours[hour] += 1
+                training_dates.add(date)
+            
+            if timestamp > cutoff:
+                total_events += 1
+                daily[date] += 1
+                types[event_type] += 1
+                hourly[hour] += 1
+        
+        active_days = len(daily)
+        hourly_activity = hourly.most_common()
+        streaks = self._calculate_training_streaks(sorted(training_dates))
+        
+        return {
+            'engagement': {
+                'total_events': total_events,
+                'active_days': active_days,
+                'avg_events_per_day': round(total_events / max(active_days, 1), 2),
+                'daily_activity': sorted(daily.items(), reverse=True),
+                'event_types': dict(types.most_common()),
+                'hourly_activity': dict(hourly_activity),
+                'most_active_hour': hourly_activity[0][0] if hourly_activity else None,
+                'engagement_score': self._calculate_engagement_score(total_events, active_days, days)
+            },
+            'training': {
+                'completed_events': sum(training_hours.values()),
+                'training_times': dict(training_hours.most_common()),
+                'current_streak': streaks.get('current', 0),
+                'longest_streak': streaks.get('longest', 0),
+                'total_streaks': streaks.get('total', 0)
+            }
+        }
+    
     def _calculate_engagement_score(self, total_events: int, active_days: int, period_days: int) -> float:
         """Вычисляет оценку вовлеченности пользователя (0-100)"""
         try:
@@ -110,42 +215,20 @@ class AdvancedAnalytics:
     def get_training_analytics(self, user_id: int) -> Dict[str, Any]:
         """Аналитика тренировок пользователя"""
         try:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Статистика тренировок из таблицы users
-                user = self.db.get_user(user_id)
-                completed_trainings = user.get('training_count', 0) if user else 0
-                
-                # Время тренировок
-                cursor.execute('''
-                    SELECT strftime('%H', timestamp) as hour, COUNT(*) as count
-                    FROM analytics 
-                    WHERE user_id = ? AND event_type = 'training_completed'
-                    GROUP BY strftime('%H', timestamp)
-                    ORDER BY count DESC
-                ''', (user_id,))
-                training_times = cursor.fetchall()
-                
-                # Серии тренировок
-                cursor.execute('''
-                    SELECT DATE(timestamp) as date
-                    FROM analytics 
-                    WHERE user_id = ? AND event_type = 'training_completed'
-                    ORDER BY timestamp
-                ''', (user_id,))
-                training_dates = [row[0] for row in cursor.fetchall()]
-                
-                # Расчет серий
-                streaks = self._calculate_training_streaks(training_dates)
-                
-                return {
-                    'completed_trainings': completed_trainings,
-                    'training_times': dict(training_times),
-                    'current_streak': streaks.get('current', 0),
-                    'longest_streak': streaks.get('longest', 0),
-                    'total_streaks': streaks.get('total', 0)
-                }
+            # Статистика тренировок из таблицы users
+            user = self.db.get_user(user_id)
+            completed_trainings = user.get('training_count', 0) if user else 0
+            
+            # Время и серии тренировок берутся из общего профиля
+            training = self.get_user_profile(user_id).get('training', {})
+            
+            return {
+                'completed_trainings': completed_trainings,
+                'training_times': training.get('training_times', {}),
+                'current_streak': training.get('current_streak', 0),
+                'longest_streak': training.get('longest_streak', 0),
+                'total_streaks': training.get('total_streaks', 0)
+            }
                 
         except Exception as e:
             logger.error(f"Ошибка получения аналитики тренировок: {e}")
@@ -201,12 +284,148 @@ class AdvancedAnalytics:
             logger.error(f"Ошибка расчета серий тренировок: {e}")
             return {'current': 0, 'longest': 0, 'total': 0}
     
+    def compute_all_streaks(self) -> Dict[int, Dict[str, int]]:
+        """Пакетный расчет серий тренировок всех пользователей одним запросом"""
+        try:
+            with self.db.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(STREAKS_QUERY + '''
+                    SELECT user_id,
+                           MAX(CASE WHEN last_day >= DATE('now', '-1 day') THEN length ELSE 0 END),
+                           MAX(length),
+                           SUM(length > 1)
+                    FROM runs
+                    GROUP BY user_id
+                ''')
+                return {
+                    row[0]: {'current': row[1], 'longest': row[2], 'total': row[3]}
+                    for row in cursor.fetchall()
+                }
+                
+        except Exception as e:
+            logger.error(f"Ошибка пакетного расчета серий: {e}")
+            return {}
+    
+    def rebuild_streaks(self) -> int:
+        """Полностью пересчитывает таблицу training_streaks из событий аналитики"""
+        try:
+            with self.db.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM training_streaks')
+                # MAX(last_day) выбирает последнюю серию пользователя, length берется из той же строки
+                cursor.execute('''
+                    INSERT INTO training_streaks
+                    (user_id, current_streak, longest_streak, total_streaks, last_training_date)
+                ''' + STREAKS_QUERY + '''
+                    SELECT user_id, length, longest, total, last_day
+                    FROM (
+                        SELECT user_id, length, MAX(last_day) AS last_day
+                        FROM runs
+                        GROUP BY user_id
+                    )
+                    JOIN (
+                        SELECT user_id, MAX(length) AS longest, SUM(length > 1) AS total
+                        FROM runs
+                        GROUP BY user_id
+                    ) USING (user_id)
+                ''')
+                conn.commit()
+                return cursor.rowcount
+                
+        except Exception as e:
+            logger.error(f"Ошибка пересчета серий тренировок: {e}")
+            return 0
+    
+    def ensure_streaks(self) -> int:
+        """Первичное заполнение training_streaks: при пустой таблице серии пересчитываются из истории"""
+        try:
+            with self.db.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT EXISTS (SELECT 1 FROM training_streaks)')
+                if cursor.fetchone()[0]:
+                    return 0
+            
+            rebuilt = self.rebuild_streaks()
+            logger.info(f"Таблица серий тренировок заполнена из истории: {rebuilt} пользователей")
+            return rebuilt
+            
+        except Exception as e:
+            logger.error(f"Ошибка проверки таблицы серий тренировок: {e}")
+            return 0
+    
+    def update_streak_on_event(self, user_id: int, event_type: str):
+        """Инкрементально обновляет серию пользователя при новой тренировке"""
+        if event_type != 'training_completed':
+            return
+        
+        try:
+            with self.db.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT DATE('now'), DATE('now', '-1 day')")
+                today, yesterday = cursor.fetchone()
+                
+                cursor.execute('''
+                    SELECT current_streak, longest_streak, total_streaks, last_training_date
+                    FROM training_streaks WHERE user_id = ?
+                ''', (user_id,))
+                row = cursor.fetchone()
+                current, longest, total, last_date = row if row else (0, 0, 0, None)
+                
+                if last_date == today:
+                    return
+                if last_date == yesterday:
+                    current += 1
+                    if current == 2:
+                        total += 1
+                else:
+                    current = 1
+                longest = max(longest, current)
+                
+                cursor.execute('''
+                    INSERT OR REPLACE INTO training_streaks
+                    (user_id, current_streak, longest_streak, total_streaks, last_training_date, updated_at)
+                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (user_id, current, longest, total, today))
+                conn.commit()
+                
+        except Exception as e:
+            logger.error(f"Ошибка обновления серии тренировок: {e}")
+    
+    def get_streak_leaderboard(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Рейтинг пользователей по текущей серии тренировок"""
+        try:
+            with self.db.connect() as conn:
+                cursor = conn.cursor()
+                # Серия, не продленная вчера или сегодня, считается прерванной
+                cursor.execute('''
+                    SELECT s.user_id, u.first_name,
+                           CASE WHEN s.last_training_date >= DATE('now', '-1 day')
+                                THEN s.current_streak ELSE 0 END AS current,
+                           s.longest_streak
+                    FROM training_streaks s
+                    LEFT JOIN users u ON u.user_id = s.user_id
+                    ORDER BY current DESC, s.longest_streak DESC
+                    LIMIT ?
+                ''', (limit,))
+                return [
+                    {
+                        'user_id': row[0],
+                        'first_name': row[1],
+                        'current_streak': row[2],
+                        'longest_streak': row[3]
+                    } for row in cursor.fetchall()
+                ]
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения рейтинга серий: {e}")
+            return []
+    
     def get_retention_analysis(self, days: int = 30) -> Dict[str, Any]:
         """Анализ удержания пользователей"""
         try:
             cutoff_date = datetime.now() - timedelta(days=days)
             
-            with sqlite3.connect(self.db.db_path) as conn:
+            with self.db.connect() as conn:
                 cursor = conn.cursor()
                 
                 # Общее количество пользователей
@@ -267,7 +486,7 @@ class AdvancedAnalytics:
         try:
             cutoff_date = datetime.now() - timedelta(days=days)
             
-            with sqlite3.connect(self.db.db_path) as conn:
+            with self.db.connect() as conn:
                 cursor = conn.cursor()
                 
                 # Использование основных функций
@@ -328,7 +547,7 @@ class AdvancedAnalytics:
     def get_user_segments(self) -> Dict[str, Any]:
         """Сегментация пользователей"""
         try:
-            with sqlite3.connect(self.db.db_path) as conn:
+            with self.db.connect() as conn:
                 cursor = conn.cursor()
                 
                 # Сегменты по активности
@@ -394,7 +613,7 @@ class AdvancedAnalytics:
         try:
             cutoff_date = datetime.now() - timedelta(days=days)
             
-            with sqlite3.connect(self.db.db_path) as conn:
+            with self.db.connect() as conn:
                 cursor = conn.cursor()
                 
                 # Тренд регистраций
@@ -0,0 +1,191 @@
+"""
+💾 Резервное копирование базы данных бота DianaLisa
+Онлайн-снимки через SQLite backup API, сжатие, ротация, проверка и восстановление
+"""
+
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from config import DATABASE_PATH, BACKUP_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+class BackupManager:
+    """Класс для резервного копирования и восстановления базы данных"""
+
+    def __init__(self, db_path: str = DATABASE_PATH, backup_dir: str = None,
+                 keep_last: int = None):
+        self.db_path = db_path
+        self.backup_dir = Path(backup_dir or BACKUP_SETTINGS['directory'])
+        self.keep_last = keep_last if keep_last is not None else BACKUP_SETTINGS['keep_last']
+        self.pages_per_step = BACKUP_SETTINGS['pages_per_step']
+        self.step_sleep = BACKUP_SETTINGS['step_sleep']
+
+    def _copy_database(self, source_path: str, target_path: str):
+        """Постраничное копирование через backup API (писатели не блокируются на всё время копии)"""
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target, pages=self.pages_per_step, sleep=self.step_sleep)
+        finally:
+            target.close()
+            source.close()
+
+    def _check_integrity(self, path: str) -> bool:
+        """Проверка целостности файла базы данных"""
+        conn = sqlite3.connect(path)
+        try:
+            result = conn.execute('PRAGMA integrity_check').fetchone()
+            return result is not None and result[0] == 'ok'
+        finally:
+            conn.close()
+
+    def create_backup(self) -> Optional[str]:
+        """Создает сжатую резервную копию и возвращает путь к ней"""
+        try:
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+            stem = Path(self.db_path).stem
+            snapshot_path = self.backup_dir / f"{stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+            archive_path = snapshot_path.with_name(snapshot_path.name + '.gz')
+
+            self._copy_database(self.db_path, str(snapshot_path))
+
+            # Снимок базы в режиме WAL переводим в обычный журнал - копия будет одним файлом
+            conn = sqlite3.connect(str(snapshot_path))
+            try:
+                conn.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                conn.close()
+
+            if not self._check_integrity(str(snapshot_path)):
+                snapshot_path.unlink(missing_ok=True)
+                logger.error("Снимок базы данных не прошел проверку целостности")
+                return None
+
+            with open(snapshot_path, 'rb') as source, gzip.open(archive_path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            snapshot_path.unlink()
+
+            self.apply_retention()
+
+            logger.info(f"Резервная копия создана: {archive_path}")
+            return str(archive_path)
+
+        except Exception as e:
+            logger.error(f"Ошибка создания резервной копии: {e}")
+            return None
+
+    def list_backups(self) -> List[str]:
+        """Список резервных копий, от новых к старым"""
+        if not self.backup_dir.exists():
+            return []
+        stem = Path(self.db_path).stem
+        backups = sorted(self.backup_dir.glob(f"{stem}_*.db.gz"), reverse=True)
+        return [str(path) for path in backups]
+
+    def apply_retention(self) -> int:
+        """Удаляет старые копии сверх keep_last, возвращает количество удаленных"""
+        try:
+            removed = 0
+            for path in self.list_backups()[self.keep_last:]:
+                os.remove(path)
+                removed += 1
+
+            if removed:
+                logger.info(f"Удалено старых резервных копий: {removed}")
+            return removed
+
+        except Exception as e:
+            logger.error(f"Ошибка ротации резервных копий: {e}")
+            return 0
+
+    def _unpack(self, backup_path: str) -> str:
+        """Распаковывает копию во временный файл"""
+        fd, temp_path = tempfile.mkstemp(suffix='.db')
+        with os.fdopen(fd, 'wb') as target, gzip.open(backup_path, 'rb') as source:
+            shutil.copyfileobj(source, target)
+        return temp_path
+
+    def verify_backup(self, backup_path: str) -> bool:
+        """Проверяет, что копия распаковывается и проходит integrity_check"""
+        temp_path = None
+        try:
+            temp_path = self._unpack(backup_path)
+            return self._check_integrity(temp_path)
+
+        except Exception as e:
+            logger.error(f"Ошибка проверки резервной копии {backup_path}: {e}")
+            return False
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+
+    def restore_backup(self, backup_path: str) -> bool:
+        """Восстанавливает базу из копии через backup API (без замены файла под открытыми соединениями)"""
+        temp_path = None
+        try:
+            temp_path = self._unpack(backup_path)
+            if not self._check_integrity(temp_path):
+                logger.error(f"Резервная копия повреждена: {backup_path}")
+                return False
+
+            self._copy_database(temp_path, self.db_path)
+
+            logger.info(f"База данных восстановлена из {backup_path}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Ошибка восстановления из резервной копии: {e}")
+            return False
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+
+    async def run_backup(self) -> Optional[str]:
+        """Создание резервной копии вне event loop"""
+        return await asyncio.to_thread(self.create_backup)
+
+# Глобальный экземпляр резервного копирования
+backup_manager = BackupManager()
+
+def main():
+    """Командная строка: python backup.py create|list|verify|restore [файл]"""
+    parser = argparse.ArgumentParser(description="Резервное копирование базы DianaLisa")
+    parser.add_argument('command', choices=['create', 'list', 'verify', 'restore'])
+    parser.add_argument('backup', nargs='?', help="Файл копии (по умолчанию - последняя)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'create':
+        return 0 if backup_manager.create_backup() else 1
+
+    backups = backup_manager.list_backups()
+    if args.command == 'list':
+        for path in backups:
+            print(path)
+        return 0
+
+    backup_path = args.backup or (backups[0] if backups else None)
+    if not backup_path:
+        print("Резервные копии не найдены")
+        return 1
+
+    if args.command == 'verify':
+        ok = backup_manager.verify_backup(backup_path)
+        print(f"{backup_path}: {'OK' if ok else 'ПОВРЕЖДЕНА'}")
+        return 0 if ok else 1
+
+    return 0 if backup_manager.restore_backup(backup_path) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
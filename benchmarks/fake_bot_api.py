@@ -0,0 +1,425 @@
+"""
+🧪 Локальный фейковый Telegram Bot API для нагрузочного тестирования
+Реализует getUpdates, sendMessage, sendPhoto, editMessage*, answerCallbackQuery,
+sendInvoice и вебхуки; умеет добавлять задержку и отвечать 429 с retry_after.
+
+Запуск:
+    python benchmarks/fake_bot_api.py --port 8081 --latency 0.01:0.05 --rate-limit 0.02
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=123:fake python main.py
+    python benchmarks/virtual_users.py --api http://127.0.0.1:8081 --users 1000
+
+Служебные эндпоинты для драйвера виртуальных пользователей:
+    POST /_control/updates             - поставить update боту (JSON без update_id)
+    GET  /_control/chat/<id>?since=N&wait=S - исходящие сообщения бота в чат после seq N
+    GET  /_control/stats               - счетчики запросов
+"""
+
+import argparse
+import email
+import json
+import logging
+import random
+import threading
+import time
+import urllib.request
+from collections import defaultdict, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Optional, List
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {
+    'id': 100000001,
+    'is_bot': True,
+    'first_name': 'DianaLisa (fake)',
+    'username': 'DianaLisaFakeBot',
+    'can_join_groups': False,
+    'can_read_all_group_messages': False,
+    'supports_inline_queries': False
+}
+
+# Методы, которые могут получить искусственный 429
+RATE_LIMITED_PREFIXES = ('send', 'edit', 'delete', 'answer')
+
+class FakeTelegramState:
+    """Состояние фейкового сервера: очередь апдейтов, чаты и исходящие сообщения"""
+
+    def __init__(self, latency: tuple = (0.0, 0.0), rate_limit: float = 0.0,
+                 retry_after: int = 1, seed: int = None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+        self.lock = threading.Condition()
+        self.updates: deque = deque()
+        self.next_update_id = 1
+        self.webhook_url = ''
+
+        self.message_ids: Dict[int, int] = defaultdict(int)
+        self.messages: Dict[int, Dict[int, Dict[str, Any]]] = defaultdict(dict)
+        self.outbox: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        self.outbox_seq = 0
+
+        self.stats: Dict[str, int] = defaultdict(int)
+
+    # ------------------------------------------------------------------ апдейты
+
+    def push_update(self, update: Dict[str, Any]) -> int:
+        """Ставит update в очередь (или отправляет на вебхук)"""
+        with self.lock:
+            update = dict(update, update_id=self.next_update_id)
+            self.next_update_id += 1
+
+            # Сообщениям пользователя выдаем message_id из той же нумерации, что и боту
+            message = update.get('message')
+            if message is not None:
+                chat_id = message['chat']['id']
+                message['message_id'] = self._next_message_id(chat_id)
+                self.messages[chat_id][message['message_id']] = message
+
+            self.stats['updates_pushed'] += 1
+            webhook_url = self.webhook_url
+            if not webhook_url:
+                self.updates.append(update)
+                self.lock.notify_all()
+
+        if webhook_url:
+            threading.Thread(target=self._deliver_webhook, args=(webhook_url, update), daemon=True).start()
+        return update['update_id']
+
+    def _deliver_webhook(self, url: str, update: Dict[str, Any]):
+        """Отправка update на вебхук бота"""
+        try:
+            request = urllib.request.Request(
+                url, data=json.dumps(update).encode('utf-8'),
+                headers={'Content-Type': 'application/json'}
+            )
+            urllib.request.urlopen(request, timeout=10).read()
+            self._count('webhook_delivered')
+        except Exception as e:
+            self._count('webhook_failed')
+            logger.error(f"Ошибка доставки вебхука: {e}")
+
+    def get_updates(self, offset: int, limit: int, timeout: float) -> List[Dict[str, Any]]:
+        """Long polling getUpdates"""
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            # offset подтверждает все предыдущие апдейты
+            while self.updates and self.updates[0]['update_id'] < offset:
+                self.updates.popleft()
+
+            while not self.updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self.lock.wait(remaining)
+                while self.updates and self.updates[0]['update_id'] < offset:
+                    self.updates.popleft()
+
+            return list(self.updates)[:limit]
+
+    # ------------------------------------------------------------------ сообщения
+
+    def _next_message_id(self, chat_id: int) -> int:
+        self.message_ids[chat_id] += 1
+        return self.message_ids[chat_id]
+
+    def _count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def record_outgoing(self, method: str, chat_id: int, payload: Dict[str, Any],
+                        message: Optional[Dict[str, Any]]):
+        """Запоминает исходящее действие бота для драйвера"""
+        with self.lock:
+            self.outbox_seq += 1
+            self.outbox[chat_id].append({
+                'seq': self.outbox_seq,
+                'method': method,
+                'time': time.time(),
+                'payload': payload,
+                'message': message
+            })
+            self.lock.notify_all()
+
+    def wait_outbox(self, chat_id: int, since: int, wait: float) -> List[Dict[str, Any]]:
+        """Исходящие в чат после seq since; ждет до wait секунд"""
+        deadline = time.monotonic() + wait
+        with self.lock:
+            while True:
+                items = [item for item in self.outbox[chat_id] if item['seq'] > since]
+                remaining = deadline - time.monotonic()
+                if items or remaining <= 0:
+                    return items
+                self.lock.wait(remaining)
+
+    def make_message(self, chat_id: int, **fields) -> Dict[str, Any]:
+        """Создает сообщение бота в чате"""
+        with self.lock:
+            message = {
+                'message_id': self._next_message_id(chat_id),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                **{key: value for key, value in fields.items() if value is not None}
+            }
+            self.messages[chat_id][message['message_id']] = message
+            return message
+
+    def get_message(self, chat_id: int, message_id: int) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.messages[chat_id].get(message_id)
+
+    def last_bot_message(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Последнее сообщение бота в чате (к нему привязываются нажатия кнопок)"""
+        with self.lock:
+            for message_id in sorted(self.messages[chat_id], reverse=True):
+                message = self.messages[chat_id][message_id]
+                if message.get('from', {}).get('is_bot'):
+                    return message
+            return None
+
+class FakeBotApi:
+    """Обработка методов Bot API"""
+
+    def __init__(self, state: FakeTelegramState):
+        self.state = state
+
+    def call(self, method: str, params: Dict[str, Any]) -> tuple:
+        """Возвращает (HTTP статус, тело ответа)"""
+        state = self.state
+        state._count(f'method_{method}')
+
+        low, high = state.latency
+        if high > 0:
+            time.sleep(state.random.uniform(low, high))
+
+        if state.rate_limit and method.lower().startswith(RATE_LIMITED_PREFIXES) \
+                and state.random.random() < state.rate_limit:
+            state._count('rate_limited')
+            return 429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {state.retry_after}',
+                'parameters': {'retry_after': state.retry_after}
+            }
+
+        handler = getattr(self, f'_{method}', None)
+        if handler is None:
+            # Неизвестные методы (setMyCommands, sendChatAction, ...) просто подтверждаем
+            return 200, {'ok': True, 'result': True}
+
+        try:
+            return handler(params)
+        except (KeyError, ValueError) as e:
+            return 400, {'ok': False, 'error_code': 400, 'description': f'Bad Request: {e}'}
+
+    @staticmethod
+    def _ok(result) -> tuple:
+        return 200, {'ok': True, 'result': result}
+
+    @staticmethod
+    def _json_field(params: Dict[str, Any], name: str):
+        value = params.get(name)
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except ValueError:
+                return value
+        return value
+
+    def _send(self, method: str, params: Dict[str, Any], **fields) -> tuple:
+        chat_id = int(params['chat_id'])
+        reply_markup = self._json_field(params, 'reply_markup')
+        message = self.state.make_message(chat_id, reply_markup=reply_markup, **fields)
+        self.state.record_outgoing(method, chat_id, params, message)
+        return self._ok(message)
+
+    def _getMe(self, params):
+        return self._ok(BOT_USER)
+
+    def _getUpdates(self, params):
+        if self.state.webhook_url:
+            return 409, {'ok': False, 'error_code': 409,
+                         'description': "Conflict: can't use getUpdates method while webhook is active"}
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        return self._ok(self.state.get_updates(offset, limit, timeout))
+
+    def _setWebhook(self, params):
+        self.state.webhook_url = params.get('url', '')
+        return self._ok(True)
+
+    def _deleteWebhook(self, params):
+        self.state.webhook_url = ''
+        return self._ok(True)
+
+    def _getWebhookInfo(self, params):
+        return self._ok({'url': self.state.webhook_url, 'has_custom_certificate': False,
+                         'pending_update_count': len(self.state.updates)})
+
+    def _sendMessage(self, params):
+        return self._send('sendMessage', params, text=params.get('text', ''))
+
+    def _sendPhoto(self, params):
+        photo = [{'file_id': 'fake_photo', 'file_unique_id': 'fake_photo_u', 'width': 640, 'height': 480}]
+        return self._send('sendPhoto', params, photo=photo, caption=params.get('caption'))
+
+    def _sendDocument(self, params):
+        document = {'file_id': 'fake_document', 'file_unique_id': 'fake_document_u'}
+        return self._send('sendDocument', params, document=document, caption=params.get('caption'))
+
+    def _sendInvoice(self, params):
+        invoice = {
+            'title': params.get('title', ''),
+            'description': params.get('description', ''),
+            'start_parameter': params.get('start_parameter', ''),
+            'currency': params.get('currency', 'RUB'),
+            'total_amount': sum(price.get('amount', 0) for price in self._json_field(params, 'prices') or [])
+        }
+        return self._send('sendInvoice', params, invoice=invoice)
+
+    def _edit(self, method: str, params: Dict[str, Any], **fields) -> tuple:
+        if 'inline_message_id' in params:
+            return self._ok(True)
+        chat_id = int(params['chat_id'])
+        message = self.state.get_message(chat_id, int(params['message_id']))
+        if message is None:
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: message to edit not found'}
+        message.update({key: value for key, value in fields.items() if value is not None})
+        message['reply_markup'] = self._json_field(params, 'reply_markup')
+        message['edit_date'] = int(time.time())
+        self.state.record_outgoing(method, chat_id, params, message)
+        return self._ok(message)
+
+    def _editMessageText(self, params):
+        return self._edit('editMessageText', params, text=params.get('text'))
+
+    def _editMessageCaption(self, params):
+        return self._edit('editMessageCaption', params, caption=params.get('caption'))
+
+    def _editMessageMedia(self, params):
+        media = self._json_field(params, 'media') or {}
+        photo = [{'file_id': 'fake_photo', 'file_unique_id': 'fake_photo_u', 'width': 640, 'height': 480}]
+        return self._edit('editMessageMedia', params, photo=photo, caption=media.get('caption'))
+
+    def _editMessageReplyMarkup(self, params):
+        return self._edit('editMessageReplyMarkup', params)
+
+    def _deleteMessage(self, params):
+        chat_id = int(params['chat_id'])
+        with self.state.lock:
+            existed = self.state.messages[chat_id].pop(int(params['message_id']), None)
+        if existed is None:
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: message to delete not found'}
+        self.state.record_outgoing('deleteMessage', chat_id, params, None)
+        return self._ok(True)
+
+    def _answerCallbackQuery(self, params):
+        return self._ok(True)
+
+    def _answerPreCheckoutQuery(self, params):
+        return self._ok(True)
+
+def parse_body(content_type: str, body: bytes) -> Dict[str, Any]:
+    """Параметры запроса: JSON, form-urlencoded или multipart (файлы пропускаются)"""
+    if not body:
+        return {}
+    if content_type.startswith('application/json'):
+        return json.loads(body)
+    if content_type.startswith('multipart/form-data'):
+        message = email.message_from_bytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+        params = {}
+        for part in message.get_payload():
+            name = part.get_param('name', header='content-disposition')
+            if name and not part.get_filename():
+                params[name] = part.get_payload(decode=True).decode('utf-8')
+        return params
+    return {key: values[-1] for key, values in parse_qs(body.decode('utf-8')).items()}
+
+def make_handler(api: FakeBotApi):
+    """Класс HTTP-обработчика, привязанный к состоянию сервера"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, body: Dict[str, Any]):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            params.update(parse_body(self.headers.get('Content-Type', ''), body))
+
+            parts = url.path.strip('/').split('/')
+            if parts[0] == '_control':
+                return self._reply(*self._control(parts[1:], params))
+            if len(parts) == 2 and parts[0].startswith('bot'):
+                return self._reply(*api.call(parts[1], params))
+            self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+
+        def _control(self, parts: List[str], params: Dict[str, Any]) -> tuple:
+            state = api.state
+            if parts == ['updates']:
+                return 200, {'ok': True, 'result': state.push_update(params)}
+            if len(parts) == 2 and parts[0] == 'chat':
+                items = state.wait_outbox(int(parts[1]), int(params.get('since', 0)),
+                                          float(params.get('wait', 0)))
+                return 200, {'ok': True, 'result': items}
+            if parts == ['last_message'] and 'chat_id' in params:
+                return 200, {'ok': True, 'result': state.last_bot_message(int(params['chat_id']))}
+            if parts == ['stats']:
+                with state.lock:
+                    return 200, {'ok': True, 'result': dict(state.stats)}
+            return 404, {'ok': False, 'description': 'Unknown control endpoint'}
+
+        do_GET = _handle
+        do_POST = _handle
+
+    return Handler
+
+def create_server(host: str = '127.0.0.1', port: int = 8081, **state_options) -> ThreadingHTTPServer:
+    """Создает сервер (запуск - serve_forever, можно в отдельном потоке)"""
+    state = FakeTelegramState(**state_options)
+    server = ThreadingHTTPServer((host, port), make_handler(FakeBotApi(state)))
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Фейковый Telegram Bot API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', default='0:0', help="Задержка ответа, секунды: мин:макс")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Доля ответов 429 (0..1)")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    low, high = (float(value) for value in args.latency.split(':'))
+    server = create_server(args.host, args.port, latency=(low, high), rate_limit=args.rate_limit,
+                           retry_after=args.retry_after, seed=args.seed)
+    logger.info(f"Фейковый Bot API слушает http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
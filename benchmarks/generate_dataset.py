@@ -0,0 +1,266 @@
+"""
+🧬 Генератор синтетической базы данных бота DianaLisa продакшн-размера
+Заполняет users, analytics, payments, training_feedback и scheduled_jobs
+реалистичными распределениями: часовые пояса, воронка прохождения дней, суточный ритм событий.
+Вставка идет через executemany в одной транзакции.
+
+Запуск:
+    python benchmarks/generate_dataset.py --db /tmp/big.db --users 100000 --events-per-user 20
+"""
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Iterator, List, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.environ.setdefault('BOT_TOKEN', 'dataset_generator_token')
+
+# При импорте database создается глобальная база по DATABASE_PATH: при запуске скриптом она
+# не должна появиться в рабочем каталоге (run_benchmarks.py задает свой путь до импорта)
+WORK_DIR = None
+if 'DATABASE_PATH' not in os.environ:
+    WORK_DIR = tempfile.mkdtemp(prefix='dianalisa_dataset_')
+    os.environ['DATABASE_PATH'] = os.path.join(WORK_DIR, 'global.db')
+
+from database import Database
+from utils import Utils
+from payment import payment_system
+
+logger = logging.getLogger(__name__)
+
+# Доли пользователей по часовым поясам (в порядке Utils.get_common_timezones)
+TIMEZONE_WEIGHTS = [50, 10, 8, 6, 5, 5, 5, 4, 4, 3]
+
+# Воронка курса: доля пользователей, дошедших до дня
+DAY_FUNNEL = {1: 1.0, 2: 0.6, 3: 0.35}
+
+# Смесь событий аналитики
+EVENT_WEIGHTS = {
+    'button_click': 55,
+    'morning_motivation_sent': 10,
+    'evening_motivation_sent': 10,
+    'training_viewed': 12,
+    'training_completed': 8,
+    'rating_given': 3,
+    'payment_invoice_created': 2,
+}
+
+# Суточный ритм активности (вес для каждого часа 0..23)
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 10, 8, 6, 5, 6, 5, 4, 4, 5, 7, 9, 10, 9, 7, 4, 2]
+
+PREMIUM_SHARE = 0.08
+PREMIUM_DAYS = 40
+TRAINING_BUYER_SHARE = 0.04
+FAILED_PAYMENT_SHARE = 0.1
+FEEDBACK_SHARE = 0.5
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+class DatasetGenerator:
+    """Генерация синтетических строк для всех таблиц"""
+
+    def __init__(self, users: int, events_per_user: int = 20, days: int = 90,
+                 seed: int = 42, first_user_id: int = 1):
+        self.users = users
+        self.events_per_user = events_per_user
+        self.days = days
+        self.first_user_id = first_user_id
+        self.random = random.Random(seed)
+
+        # Время храним в секундах от полуночи начала истории: форматирование через кэш дат
+        # в разы быстрее datetime.strftime на миллионах строк
+        now = datetime.now().replace(microsecond=0)
+        self.origin = datetime.combine(now.date() - timedelta(days=days), datetime.min.time())
+        self.now_offset = int((now - self.origin).total_seconds())
+        self.day_prefixes = [(self.origin + timedelta(days=day)).strftime('%Y-%m-%d ') for day in range(days + 2)]
+        self.hour_cum_weights = list(accumulate(HOUR_WEIGHTS))
+
+        self.timezones = [tz['value'] for tz in Utils.get_common_timezones()]
+        self.event_types = list(EVENT_WEIGHTS)
+        self.event_cum_weights = list(accumulate(EVENT_WEIGHTS.values()))
+        self.day_labels = [f'day_{day}' for day in range(1, max(DAY_FUNNEL) + 1)]
+        self.course_price = payment_system.course_packages['basic']['price']
+        self.training_prices = {name: package['price'] for name, package in payment_system.training_packages.items()}
+
+        # Профиль пользователя нужен нескольким таблицам: (регистрация, день курса, премиум)
+        self.profiles: Dict[int, Tuple[int, int, bool]] = {}
+
+    def _format(self, offset: int) -> str:
+        """Секунды от начала истории -> 'YYYY-MM-DD HH:MM:SS'"""
+        seconds = offset % 86400
+        return f"{self.day_prefixes[offset // 86400]}{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+    def _registration_offset(self) -> int:
+        """Регистрации растут к текущему дню (больше свежих пользователей)"""
+        return int(self.now_offset * self.random.random() ** 0.6)
+
+    def _course_day(self, registered: int) -> int:
+        days_since = (self.now_offset - registered) // 86400
+        roll = self.random.random()
+        reached = max(day for day, share in DAY_FUNNEL.items() if roll <= share)
+        return min(reached, days_since + 1)
+
+    def _event_times(self, registered: int, count: int) -> List[str]:
+        """count моментов между регистрацией и текущим временем с суточным ритмом"""
+        first_day = registered // 86400
+        span_days = self.now_offset // 86400 - first_day + 1
+        hours = self.random.choices(range(24), cum_weights=self.hour_cum_weights, k=count)
+        rand = self.random.random
+        times = []
+        for hour in hours:
+            offset = (first_day + int(rand() * span_days)) * 86400 + hour * 3600 + int(rand() * 3600)
+            times.append(self._format(min(max(offset, registered), self.now_offset)))
+        return times
+
+    def users_rows(self) -> Iterator[tuple]:
+        for user_id in range(self.first_user_id, self.first_user_id + self.users):
+            registered = self._registration_offset()
+            current_day = self._course_day(registered)
+            is_premium = self.random.random() < PREMIUM_SHARE
+            self.profiles[user_id] = (registered, current_day, is_premium)
+
+            timezone = self.random.choices(self.timezones, TIMEZONE_WEIGHTS)[0]
+            last_activity = self._event_times(registered, 1)[0]
+            premium_expires = None
+            if is_premium:
+                premium_expires = (self.origin + timedelta(seconds=registered, days=PREMIUM_DAYS)).strftime(TIMESTAMP_FORMAT)
+            purchases = float(self.course_price) if is_premium else 0.0
+
+            yield (user_id, f'user{user_id}', f'Пользователь{user_id}', None,
+                   f'user{user_id}@example.com', f'+7999{user_id:07d}', timezone, current_day,
+                   self._format(registered), last_activity, is_premium, premium_expires,
+                   f'REF{user_id}', purchases, current_day > 1)
+
+    def analytics_rows(self) -> Iterator[tuple]:
+        for user_id, (registered, current_day, _) in self.profiles.items():
+            yield (user_id, 'registration_completed', None, self._format(registered))
+
+            count = max(1, int(self.random.expovariate(1 / self.events_per_user)))
+            types = self.random.choices(self.event_types, cum_weights=self.event_cum_weights, k=count)
+            times = self._event_times(registered, count)
+            for event_type, timestamp in zip(types, times):
+                yield (user_id, event_type, self.day_labels[int(self.random.random() * current_day)], timestamp)
+
+    def payments_rows(self) -> Iterator[tuple]:
+        for user_id, (registered, _, is_premium) in self.profiles.items():
+            purchases = []
+            if is_premium:
+                purchases.append(('course', self.course_price, 'completed'))
+            elif self.random.random() < TRAINING_BUYER_SHARE:
+                package = self.random.choice(list(self.training_prices))
+                purchases.append(('training', self.training_prices[package], 'completed'))
+            if purchases and self.random.random() < FAILED_PAYMENT_SHARE:
+                payment_type, amount, _ = purchases[0]
+                purchases.append((payment_type, amount, 'failed'))
+
+            for index, (payment_type, amount, status) in enumerate(purchases):
+                yield (user_id, amount, 'RUB', payment_type, status,
+                       f'tx_{user_id}_{index}', self._event_times(registered, 1)[0])
+
+    def feedback_rows(self) -> Iterator[tuple]:
+        for user_id, (registered, current_day, _) in self.profiles.items():
+            for day in range(1, current_day):
+                if self.random.random() < FEEDBACK_SHARE:
+                    yield (user_id, day, self.random.choices(range(1, 6), [5, 10, 30, 35, 20])[0],
+                           self.random.choices(range(1, 6), [2, 5, 15, 38, 40])[0], None,
+                           self._event_times(registered, 1)[0].replace(' ', 'T'))
+
+    def scheduled_jobs_rows(self) -> Iterator[tuple]:
+        today = self.day_prefixes[self.now_offset // 86400]
+        for user_id in self.profiles:
+            for job_type, hour in (('morning_motivation', 8), ('evening_motivation', 20), ('training_reminder', 18)):
+                yield (user_id, job_type, f'{today}{hour:02d}:00:00')
+
+def generate_dataset(db_path: str, users: int, events_per_user: int = 20, days: int = 90,
+                     seed: int = 42) -> Dict[str, int]:
+    """Заполняет базу синтетическими данными, возвращает количество строк по таблицам"""
+    db = Database(db_path)
+    generator = DatasetGenerator(users, events_per_user, days, seed)
+    counts = {}
+
+    conn = sqlite3.connect(db_path)
+    try:
+        # Синтетическую базу не нужно защищать от сбоев на время заливки
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('PRAGMA journal_mode = MEMORY')
+        cursor = conn.cursor()
+
+        cursor.executemany('''
+            INSERT INTO users
+            (user_id, username, first_name, last_name, email, phone, timezone, current_day,
+             registration_date, last_activity, is_premium, premium_expires, referral_code,
+             total_purchases, training_completed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', generator.users_rows())
+        counts['users'] = cursor.rowcount
+
+        counts['analytics'] = db.bulk_load_analytics(conn, generator.analytics_rows())
+
+        cursor.executemany('''
+            INSERT INTO payments (user_id, amount, currency, payment_type, status, transaction_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', generator.payments_rows())
+        counts['payments'] = cursor.rowcount
+
+        cursor.executemany('''
+            INSERT INTO training_feedback (user_id, day, difficulty_rating, clarity_rating, comments, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', generator.feedback_rows())
+        counts['training_feedback'] = cursor.rowcount
+
+        cursor.executemany('''
+            INSERT INTO scheduled_jobs (user_id, job_type, scheduled_time)
+            VALUES (?, ?, ?)
+        ''', generator.scheduled_jobs_rows())
+        counts['scheduled_jobs'] = cursor.rowcount
+
+        conn.commit()
+    finally:
+        conn.close()
+
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Генератор синтетической базы DianaLisaBot")
+    parser.add_argument('--db', required=True, help="Путь к создаваемой базе")
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--events-per-user', type=int, default=20, help="Среднее число событий на пользователя")
+    parser.add_argument('--days', type=int, default=90, help="Глубина истории в днях")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="Перезаписать существующий файл")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    if os.path.exists(args.db):
+        if not args.force:
+            print(f"Файл {args.db} уже существует (используйте --force)")
+            return 1
+        os.remove(args.db)
+
+    started = time.perf_counter()
+    counts = generate_dataset(args.db, args.users, args.events_per_user, args.days, args.seed)
+    duration = time.perf_counter() - started
+
+    total = sum(counts.values())
+    for table, count in counts.items():
+        print(f"  {table:20s} {count:>12}")
+    print(f"Всего {total} строк за {duration:.1f} с ({total / duration:.0f} строк/с)")
+    return 0
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(main())
+    finally:
+        if WORK_DIR:
+            shutil.rmtree(WORK_DIR, ignore_errors=True)
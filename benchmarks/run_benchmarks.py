@@ -0,0 +1,259 @@
+"""
+⏱ Бенчмарки горячих путей бота DianaLisa
+Микробенчмарки базы данных, диспетчеризации callback-ов, клавиатур, текста и аналитики.
+Работают офлайн на синтетической базе, результаты сохраняются в JSON и сравниваются с эталоном.
+
+Запуск:
+    python benchmarks/run_benchmarks.py                        # 10k пользователей
+    python benchmarks/run_benchmarks.py --sizes 10000,100000,1000000
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline --sizes 10000,100000,1000000
+
+Эталон baseline.json содержит все три размера (запись занимает около получаса, в основном на 1M);
+сравниваются только размеры, присутствующие в текущем прогоне.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT_DIR, 'benchmarks', 'baseline.json')
+
+# Бенчмарк не должен трогать рабочую базу и требовать настоящий токен
+WORK_DIR = tempfile.mkdtemp(prefix='dianalisa_bench_')
+os.environ['DATABASE_PATH'] = os.path.join(WORK_DIR, 'global.db')
+os.environ.setdefault('BOT_TOKEN', 'benchmark_token')
+sys.path.insert(0, ROOT_DIR)
+
+# Вывод логов в консоль исказил бы замеры
+logging.disable(logging.WARNING)
+
+import database
+from database import Database
+from analytics import AdvancedAnalytics
+from keyboards import Keyboards
+from utils import split_long_text
+from training import training_system
+from benchmarks.generate_dataset import generate_dataset
+
+# Допустимое замедление относительно эталона
+DEFAULT_THRESHOLD = 1.25
+
+def seed_database(db_path: str, users: int, events_per_user: int = 5) -> Database:
+    """Создает синтетическую базу заданного размера"""
+    generate_dataset(db_path, users, events_per_user=events_per_user)
+    return Database(db_path)
+
+def measure(func, iterations: int, repeat: int = 5) -> dict:
+    """Замер функции: медиана и p95 по времени каждого отдельного вызова (repeat проходов по iterations)"""
+    timings = []
+    for _ in range(repeat):
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    median = statistics.median(timings)
+    return {
+        'iterations': iterations,
+        'samples': len(timings),
+        'median_us': round(median * 1e6, 2),
+        'p95_us': round(timings[min(len(timings) - 1, math.ceil(len(timings) * 0.95) - 1)] * 1e6, 2),
+        'ops_per_sec': round(1 / median, 1) if median else None
+    }
+
+def merge_rounds(rounds: list) -> dict:
+    """Итог нескольких проходов: медиана медиан. Проходы разнесены во времени, поэтому всплеск нагрузки
+    на машину в одном из них не сдвигает итог (и эталон, и сравнение)"""
+    medians = [result['median_us'] for result in rounds]
+    median = statistics.median(medians)
+    return {
+        'iterations': rounds[0]['iterations'],
+        'rounds': len(rounds),
+        'samples': sum(result['samples'] for result in rounds),
+        'median_us': round(median, 2),
+        'p95_us': round(statistics.median(result['p95_us'] for result in rounds), 2),
+        'ops_per_sec': round(1e6 / median, 1) if median else None,
+        'round_medians_us': medians
+    }
+
+def make_callback_update(user_id: int, data: str):
+    """Фейковый update с callback_query для диспетчера"""
+    update = MagicMock()
+    query = AsyncMock()
+    query.data = data
+    query.from_user.id = user_id
+    query.from_user.first_name = 'Bench'
+    query.message.chat_id = user_id
+    update.callback_query = query
+    update.effective_user.id = user_id
+    return update
+
+def bench_size(users: int, quick: bool = False, rounds: int = 3) -> dict:
+    """Все бенчмарки на базе из users пользователей; набор прогоняется rounds раз подряд"""
+    db_path = os.path.join(WORK_DIR, f'bench_{users}.db')
+    started = time.perf_counter()
+    db = seed_database(db_path, users)
+    seed_seconds = time.perf_counter() - started
+
+    # Глобальные модули (callbacks, analytics) работают с database.db - подменяем путь
+    database.db.db_path = db_path
+    analytics = AdvancedAnalytics(db)
+    rng = random.Random(42)
+    scale = 0.2 if quick else 1.0
+
+    def n(count: int) -> int:
+        return max(1, int(count * scale))
+
+    # Имя -> (функция, итераций, повторов); замеры идут после регистрации всех бенчмарков
+    benches = {}
+
+    # --- База данных ---
+    benches['db.get_user'] = (lambda: db.get_user(rng.randint(1, users)), n(2000), 5)
+    benches['db.update_user'] = (
+        lambda: db.update_user(rng.randint(1, users), current_day=rng.randint(1, 3)), n(500), 5)
+    benches['db.add_analytics_event'] = (
+        lambda: db.add_analytics_event(rng.randint(1, users), 'button_click', 'bench'), n(500), 5)
+
+    # --- Диспетчеризация callback-ов ---
+    from callbacks import callback_handlers
+    loop = asyncio.new_event_loop()
+    context = MagicMock()
+    context.bot = AsyncMock()
+    for data in ('noop', 'rating_5', 'bench_unknown'):
+        # Моки создаются заранее, чтобы не мерить их конструирование
+        updates = [make_callback_update(rng.randint(1, users), data) for _ in range(50)]
+        benches[f'callbacks.process_callback[{data}]'] = (
+            lambda updates=updates: loop.run_until_complete(callback_handlers.process_callback(
+                rng.choice(updates), context)),
+            n(300), 5)
+
+    # --- Клавиатуры и текст ---
+    benches['keyboards.main_menu'] = (Keyboards.main_menu, n(5000), 5)
+    benches['keyboards.timezone_menu'] = (Keyboards.timezone_menu, n(5000), 5)
+    benches['keyboards.pagination_menu'] = (
+        lambda: Keyboards.pagination_menu('admin_users_all', 5, 10), n(5000), 5)
+    # Длинный текст тренировки, который не помещается в caption
+    training_text = '\n\n'.join(
+        [training_system.training_content[1]['title']]
+        + [exercise['name'] + '\n' + '\n'.join(exercise['exercises'])
+           for exercise in training_system.training_content[1]['exercises']] * 2
+        + ['🧘‍♀️ Заминка: растяжка 5 минут', '💡 Советы: пей воду и отдыхай']
+    )
+    assert len(training_text) > 1000
+    benches['utils.split_long_text'] = (lambda: split_long_text(training_text), n(5000), 5)
+
+    # --- Аналитика ---
+    def engagement():
+        user_id = rng.randint(1, users)
+        analytics.invalidate_profile(user_id)
+        analytics.get_user_engagement_metrics(user_id)
+
+    benches['analytics.get_user_engagement_metrics'] = (engagement, n(300), 5)
+    benches['analytics.generate_user_report'] = (
+        lambda: analytics.generate_user_report(rng.randint(1, users)), n(100), 5)
+    # Тяжелые отчеты повторяются проходами, а не внутри прохода
+    benches['analytics.get_retention_analysis'] = (analytics.get_retention_analysis, n(5), 1)
+    benches['analytics.get_feature_usage_analytics'] = (analytics.get_feature_usage_analytics, n(5), 1)
+    benches['analytics.compute_all_streaks'] = (analytics.compute_all_streaks, n(5), 1)
+
+    runs = {name: [] for name in benches}
+    for _ in range(rounds):
+        for name, (func, iterations, repeat) in benches.items():
+            runs[name].append(measure(func, iterations, repeat))
+    loop.close()
+    analytics.close()
+
+    results = {'seed_seconds': round(seed_seconds, 2)}
+    results.update((name, merge_rounds(measured)) for name, measured in runs.items())
+
+    os.remove(db_path)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Список регрессий: медиана хуже эталона больше чем в threshold раз, причем даже самый быстрый
+    проход медленнее самого медленного прохода эталона (дрейф скорости машины между проходами не считается)"""
+    regressions = []
+    for size, benches in results['sizes'].items():
+        base_benches = baseline.get('sizes', {}).get(size, {})
+        for name, result in benches.items():
+            base = base_benches.get(name)
+            if not isinstance(result, dict) or not isinstance(base, dict):
+                continue
+            ratio = result['median_us'] / max(base['median_us'], 1e-9)
+            overlap = min(result.get('round_medians_us') or [result['median_us']]) / max(
+                max(base.get('round_medians_us') or [base['median_us']]), 1e-9)
+            if ratio > threshold and overlap > threshold:
+                regressions.append(f"{size} {name}: {base['median_us']}us -> {result['median_us']}us (x{ratio:.2f})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки DianaLisaBot")
+    parser.add_argument('--sizes', default='10000', help="Размеры базы через запятую")
+    parser.add_argument('--output', default=None, help="Куда сохранить JSON с результатами")
+    parser.add_argument('--compare', default=None, help="JSON эталона для сравнения")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--save-baseline', action='store_true', help="Сохранить результаты как эталон")
+    parser.add_argument('--quick', action='store_true', help="Меньше итераций (для CI)")
+    parser.add_argument('--rounds', type=int, default=3, help="Проходов всего набора; в итоге медиана по проходам")
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'rounds': args.rounds,
+            'quick': args.quick
+        },
+        'sizes': {}
+    }
+
+    for size in (int(value) for value in args.sizes.split(',')):
+        print(f"Размер базы: {size} пользователей...")
+        results['sizes'][str(size)] = bench_size(size, quick=args.quick, rounds=args.rounds)
+        for name, result in results['sizes'][str(size)].items():
+            if isinstance(result, dict):
+                print(f"  {name:50s} {result['median_us']:>12.2f} us  {result['ops_per_sec']:>12} ops/s")
+
+    output = BASELINE_PATH if args.save_baseline else args.output
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Регрессии производительности:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("Регрессий нет")
+
+    return 0
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(main())
+    finally:
+        # Синтетические базы занимают сотни мегабайт на больших размерах
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
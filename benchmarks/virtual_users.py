@@ -0,0 +1,212 @@
+"""
+👥 Драйвер виртуальных пользователей для нагрузочного теста против fake_bot_api.py
+Каждый пользователь проходит регистрацию, первый день тренировок и оплату курса;
+в конце печатается пропускная способность (updates/s) и перцентили задержки ответа бота.
+
+Запуск:
+    python benchmarks/virtual_users.py --api http://127.0.0.1:8081 --users 1000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+# Сценарий: (действие, аргумент). click ищет кнопку по префиксу callback_data
+# в последнем сообщении бота; pay подтверждает последний выставленный счет.
+SCENARIO = [
+    ('command', '/start'),
+    ('click', 'start_registration'),
+    ('text', '{name}'),
+    ('text', '+7999{user_id:07d}'),
+    ('click', 'start_training'),
+    ('click', 'training_day_1'),
+    ('click', 'mark_training'),
+    ('click', 'feedback_like_'),
+    ('click', 'main_menu'),
+    ('click', 'full_course'),
+    ('click', 'buy_course'),
+    ('click', 'package_'),
+    ('pay', None),
+]
+
+NAMES = ['Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Ирина', 'Светлана', 'Дарья']
+
+class VirtualUser:
+    """Один виртуальный пользователь, проходящий сценарий"""
+
+    def __init__(self, client: httpx.AsyncClient, user_id: int, timeout: float, think_time: float):
+        self.client = client
+        self.user_id = user_id
+        self.timeout = timeout
+        self.think_time = think_time
+        self.name = random.choice(NAMES)
+        self.seen_seq = 0
+        self.invoice: Optional[Dict[str, Any]] = None
+        self.latencies: List[float] = []
+        self.timeouts = 0
+        self.updates_sent = 0
+
+    @property
+    def user(self) -> Dict[str, Any]:
+        return {'id': self.user_id, 'is_bot': False, 'first_name': self.name,
+                'username': f'vu{self.user_id}', 'language_code': 'ru'}
+
+    def _message(self, **fields) -> Dict[str, Any]:
+        return {'date': int(time.time()), 'chat': {'id': self.user_id, 'type': 'private', 'first_name': self.name},
+                'from': self.user, **fields}
+
+    async def _push(self, update: Dict[str, Any], expect_reply: bool = True):
+        """Отправляет update и ждет первый ответ бота в этот чат"""
+        sent_at = time.time()
+        await self.client.post('/_control/updates', json=update)
+        self.updates_sent += 1
+        if not expect_reply:
+            return
+
+        response = await self.client.get(
+            f'/_control/chat/{self.user_id}',
+            params={'since': self.seen_seq, 'wait': self.timeout},
+            timeout=self.timeout + 5
+        )
+        items = response.json()['result']
+        if not items:
+            self.timeouts += 1
+            return
+
+        self.latencies.append(items[0]['time'] - sent_at)
+        self.seen_seq = items[-1]['seq']
+        for item in items:
+            if item['method'] == 'sendInvoice':
+                self.invoice = item['payload']
+
+        # Бот часто отвечает несколькими сообщениями подряд - даем дослать остальные
+        await asyncio.sleep(0.05)
+        response = await self.client.get(f'/_control/chat/{self.user_id}', params={'since': self.seen_seq})
+        for item in response.json()['result']:
+            self.seen_seq = item['seq']
+            if item['method'] == 'sendInvoice':
+                self.invoice = item['payload']
+
+    async def _find_button(self, prefix: str) -> tuple:
+        """callback_data кнопки по префиксу в последнем сообщении бота"""
+        response = await self.client.get('/_control/last_message', params={'chat_id': self.user_id})
+        message = response.json()['result'] or {}
+        keyboard = (message.get('reply_markup') or {}).get('inline_keyboard', [])
+        for row in keyboard:
+            for button in row:
+                data = button.get('callback_data') or ''
+                if data.startswith(prefix):
+                    return data, message
+        return prefix, message
+
+    async def run(self):
+        for action, argument in SCENARIO:
+            if action == 'command':
+                await self._push({'message': self._message(
+                    text=argument, entities=[{'type': 'bot_command', 'offset': 0, 'length': len(argument)}]
+                )})
+            elif action == 'text':
+                text = argument.format(name=self.name, user_id=self.user_id)
+                await self._push({'message': self._message(text=text)})
+            elif action == 'click':
+                data, message = await self._find_button(argument)
+                await self._push({'callback_query': {
+                    'id': f'{self.user_id}{self.updates_sent}',
+                    'from': self.user,
+                    'chat_instance': str(self.user_id),
+                    'data': data,
+                    'message': message or self._message(message_id=1, text='')
+                }})
+            elif action == 'pay' and self.invoice:
+                await self._pay()
+
+            if self.think_time:
+                await asyncio.sleep(random.uniform(0, self.think_time))
+
+    async def _pay(self):
+        """Подтверждение оплаты: pre_checkout_query и сообщение successful_payment"""
+        payload = self.invoice.get('payload', '')
+        currency = self.invoice.get('currency', 'RUB')
+        prices = self.invoice.get('prices') or '[]'
+        prices = json.loads(prices) if isinstance(prices, str) else prices
+        amount = sum(price.get('amount', 0) for price in prices)
+
+        await self._push({'pre_checkout_query': {
+            'id': f'pcq{self.user_id}', 'from': self.user, 'currency': currency,
+            'total_amount': amount, 'invoice_payload': payload
+        }}, expect_reply=False)
+        await self._push({'message': self._message(successful_payment={
+            'currency': currency, 'total_amount': amount, 'invoice_payload': payload,
+            'telegram_payment_charge_id': f'tg_{payload}', 'provider_payment_charge_id': f'prov_{payload}'
+        })})
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+async def run_load(api: str, users: int, concurrency: int, first_user_id: int,
+                   timeout: float, think_time: float) -> Dict[str, Any]:
+    """Запускает users виртуальных пользователей не более concurrency одновременно"""
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=api, limits=limits, timeout=30) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        virtual_users = [VirtualUser(client, first_user_id + i, timeout, think_time) for i in range(users)]
+
+        async def run_one(virtual_user: VirtualUser):
+            async with semaphore:
+                await virtual_user.run()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_one(virtual_user) for virtual_user in virtual_users))
+        duration = time.perf_counter() - started
+
+        server_stats = (await client.get('/_control/stats')).json()['result']
+
+    latencies = [latency for user in virtual_users for latency in user.latencies]
+    updates = sum(user.updates_sent for user in virtual_users)
+    return {
+        'users': users,
+        'concurrency': concurrency,
+        'duration_s': round(duration, 2),
+        'updates_sent': updates,
+        'updates_per_s': round(updates / duration, 1) if duration else 0,
+        'replies': len(latencies),
+        'timeouts': sum(user.timeouts for user in virtual_users),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p95': round(percentile(latencies, 95) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+            'max': round(max(latencies, default=0) * 1000, 1),
+            'mean': round(statistics.mean(latencies) * 1000, 1) if latencies else 0
+        },
+        'server': server_stats
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Виртуальные пользователи DianaLisaBot")
+    parser.add_argument('--api', default='http://127.0.0.1:8081', help="Адрес fake_bot_api.py")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--first-user-id', type=int, default=500000000)
+    parser.add_argument('--timeout', type=float, default=10.0, help="Ожидание ответа бота, секунды")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Пауза между действиями, секунды")
+    parser.add_argument('--output', default=None, help="Сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args.api, args.users, args.concurrency, args.first_user_id,
+                                  args.timeout, args.think_time))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 """
 DianaLisa Bot Manager - Автоматическая настройка и запуск
+Супервизор процесса бота: готовность и живость по файлу сигналов, вычитывание вывода в лог,
+перезапуск с экспоненциальной задержкой, метрики перезапусков и корректная остановка по SIGTERM
 """
 
 import subprocess
@@ -9,8 +11,13 @@ import time
 import os
 import sys
 import signal
-import psutil
-from datetime import datetime, timedelta
+import json
+import queue
+import logging
+import logging.handlers
+import threading
+from collections import deque
+from datetime import datetime
 
 # Автоматическая настройка при импорте
 def auto_setup():
@@ -38,154 +45,284 @@ def auto_setup():
 # Выполняем автоматическую настройку
 auto_setup()
 
+LOG_FILE = os.path.join('logs', 'bot_manager.log')
+HEARTBEAT_FILE = os.path.join('logs', 'bot_heartbeat.json')
+METRICS_FILE = os.path.join('logs', 'bot_manager_metrics.json')
+
+SUPERVISOR_SETTINGS = {
+    'heartbeat_interval': 5,     # Как часто бот пишет сигнал живости, секунды
+    'ready_timeout': 60,         # Сколько ждать готовности после запуска
+    'liveness_timeout': 30,      # Сигнал живости старше - бот завис
+    'stop_timeout': 30,          # Ожидание корректной остановки после SIGTERM
+    'backoff_initial': 1,        # Первая задержка перед перезапуском
+    'backoff_max': 60,           # Потолок экспоненциальной задержки
+    'stable_uptime': 120,        # После такого времени работы задержка сбрасывается
+    'max_restarts': 10,          # Лимит перезапусков в окне - признак crash loop
+    'restart_window': 3600,
+    'output_tail': 200           # Последние строки вывода бота для диагностики падения
+}
+
+logger = logging.getLogger('bot_manager')
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Логи менеджера и вывод бота идут через очередь в logs/bot_manager.log и консоль"""
+    log_queue = queue.Queue()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
+    return listener
+
 class BotManager:
-    """Простой менеджер для управления ботом"""
+    """Супервизор процесса бота"""
     
-    def __init__(self):
+    def __init__(self, settings: dict = None):
+        self.settings = {**SUPERVISOR_SETTINGS, **(settings or {})}
         self.bot_process = None
         self.running = True
-        self.restart_count = 0
+        self.stop_event = threading.Event()
+        self.drain_thread = None
+        self.output_tail = deque(maxlen=self.settings['output_tail'])
+        self.backoff = self.settings['backoff_initial']
+        self.started_at = None
+        self.ready_at = None
         self.restart_times = []
-        self.max_restarts = 10
-        self.restart_window = 3600
+        self.metrics = {
+            'starts': 0,
+            'restarts': 0,
+            'crashes': 0,
+            'hangs': 0,
+            'ready_timeouts': 0,
+            'consecutive_failures': 0,
+            'last_exit_code': None,
+            'last_restart_reason': None,
+            'last_uptime_s': None,
+            'last_ready_s': None,
+            'crash_loop': False
+        }
         
         # Устанавливаем обработчики сигналов
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
     
-    def is_bot_running(self):
-        """Проверка, запущен ли бот"""
-        if self.bot_process is None:
-            return False
-        
-        if self.bot_process.poll() is not None:
-            return False
-        
+    def is_bot_running(self) -> bool:
+        """Проверка, что процесс бота существует"""
+        return self.bot_process is not None and self.bot_process.poll() is None
+    
+    def read_heartbeat(self) -> dict:
+        """Последний сигнал живости бота текущего процесса"""
         try:
-            if self.bot_process.pid:
-                proc = psutil.Process(self.bot_process.pid)
-                return proc.is_running()
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            with open(HEARTBEAT_FILE, encoding='utf-8') as f:
+                heartbeat = json.load(f)
+            if self.bot_process and heartbeat.get('pid') == self.bot_process.pid:
+                return heartbeat
+        except (OSError, ValueError):
             pass
-        
-        return False
+        return {}
     
-    def start_bot(self):
+    def drain_output(self, process: subprocess.Popen):
+        """Вычитывание вывода бота: без него заполненный буфер канала блокирует дочерний процесс"""
+        for line in process.stdout:
+            line = line.rstrip()
+            if line:
+                self.output_tail.append(line)
+                logger.info(f"[bot] {line}")
+        process.stdout.close()
+    
+    def start_bot(self) -> bool:
         """Запуск бота"""
         try:
-            print("Запуск DianaLisa Bot...")
+            logger.info("Запуск DianaLisa Bot...")
+            if os.path.exists(HEARTBEAT_FILE):
+                os.remove(HEARTBEAT_FILE)
             
+            env = {
+                **os.environ,
+                'BOT_HEARTBEAT_FILE': os.path.abspath(HEARTBEAT_FILE),
+                'BOT_HEARTBEAT_INTERVAL': str(self.settings['heartbeat_interval']),
+                'PYTHONUNBUFFERED': '1'
+            }
             self.bot_process = subprocess.Popen(
                 [sys.executable, 'main.py'],
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
-                encoding='utf-8'
+                encoding='utf-8',
+                errors='replace',
+                env=env
             )
+            self.drain_thread = threading.Thread(target=self.drain_output, args=(self.bot_process,), daemon=True)
+            self.drain_thread.start()
             
-            print(f"Бот запущен с PID: {self.bot_process.pid}")
+            self.started_at = time.monotonic()
+            self.ready_at = None
+            self.metrics['starts'] += 1
+            logger.info(f"Бот запущен с PID: {self.bot_process.pid}")
             return True
-            
+        
         except Exception as e:
-            print(f"Ошибка запуска бота: {e}")
+            logger.error(f"Ошибка запуска бота: {e}")
             return False
     
     def stop_bot(self):
-        """Остановка бота"""
+        """Остановка бота: SIGTERM запускает shutdown бота, kill - только по таймауту"""
         try:
-            if self.bot_process and self.is_bot_running():
-                print("Остановка бота...")
+            if self.is_bot_running():
+                logger.info("Остановка бота...")
                 self.bot_process.terminate()
                 
                 try:
-                    self.bot_process.wait(timeout=10)
+                    self.bot_process.wait(timeout=self.settings['stop_timeout'])
                 except subprocess.TimeoutExpired:
-                    print("Принудительное завершение процесса...")
+                    logger.warning("Бот не остановился вовремя, принудительное завершение процесса...")
                     self.bot_process.kill()
                     self.bot_process.wait()
                 
-                print("Бот остановлен")
+                logger.info(f"Бот остановлен (код {self.bot_process.returncode})")
             
-            # Убиваем все процессы main.py
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    if proc.info['cmdline'] and 'main.py' in ' '.join(proc.info['cmdline']):
-                        print(f"Завершение процесса {proc.info['pid']}")
-                        proc.kill()
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
-                    
+            if self.drain_thread:
+                self.drain_thread.join(timeout=5)
+        
         except Exception as e:
-            print(f"Ошибка остановки бота: {e}")
+            logger.error(f"Ошибка остановки бота: {e}")
     
-    def restart_bot(self):
-        """Перезапуск бота"""
-        current_time = datetime.now()
-        self.restart_times = [t for t in self.restart_times if current_time - t < timedelta(seconds=self.restart_window)]
+    def check_health(self) -> str:
+        """Проверка бота: None - все хорошо, иначе причина перезапуска"""
+        if not self.is_bot_running():
+            return 'crash'
         
-        if len(self.restart_times) >= self.max_restarts:
-            print(f"Превышен лимит перезапусков ({self.max_restarts} за час). Остановка.")
-            self.running = False
-            return False
+        now = time.monotonic()
+        heartbeat = self.read_heartbeat()
         
-        self.restart_times.append(current_time)
-        self.restart_count += 1
+        if self.ready_at is None:
+            if heartbeat.get('status') == 'ready':
+                self.ready_at = now
+                self.metrics['last_ready_s'] = round(now - self.started_at, 2)
+                logger.info(f"Бот готов к работе через {self.metrics['last_ready_s']} с")
+                self.save_metrics()
+            elif now - self.started_at > self.settings['ready_timeout']:
+                return 'ready_timeout'
+            return None
         
-        print(f"Перезапуск бота #{self.restart_count}")
+        # Время сигнала пишет бот, поэтому сравниваем с часами системы
+        if time.time() - heartbeat.get('time', 0) > self.settings['liveness_timeout']:
+            return 'hang'
         
+        # Бот проработал достаточно долго - задержка перезапуска и счетчик неудач сбрасываются
+        if now - self.started_at > self.settings['stable_uptime'] and self.metrics['consecutive_failures']:
+            self.metrics['consecutive_failures'] = 0
+            self.backoff = self.settings['backoff_initial']
+            self.save_metrics()
+        return None
+    
+    def restart_bot(self, reason: str) -> bool:
+        """Перезапуск бота с экспоненциальной задержкой"""
+        uptime = time.monotonic() - self.started_at if self.started_at else 0
         self.stop_bot()
-        time.sleep(5)
+        
+        self.metrics['last_exit_code'] = self.bot_process.returncode if self.bot_process else None
+        self.metrics['last_restart_reason'] = reason
+        self.metrics['last_uptime_s'] = round(uptime, 2)
+        self.metrics['consecutive_failures'] += 1
+        counter = {'crash': 'crashes', 'hang': 'hangs', 'ready_timeout': 'ready_timeouts'}[reason]
+        self.metrics[counter] += 1
+        
+        if reason == 'crash' and self.output_tail:
+            logger.error("Последние строки вывода бота:\n" + '\n'.join(list(self.output_tail)[-20:]))
+        
+        now = time.monotonic()
+        self.restart_times = [t for t in self.restart_times if now - t < self.settings['restart_window']]
+        if len(self.restart_times) >= self.settings['max_restarts']:
+            self.metrics['crash_loop'] = True
+            self.save_metrics()
+            logger.critical(
+                f"Crash loop: {len(self.restart_times)} перезапусков за {self.settings['restart_window']} с. Остановка."
+            )
+            self.running = False
+            return False
+        
+        self.restart_times.append(now)
+        self.metrics['restarts'] += 1
+        self.save_metrics()
+        
+        logger.warning(
+            f"Перезапуск бота #{self.metrics['restarts']} (причина: {reason}, код: {self.metrics['last_exit_code']}, "
+            f"аптайм: {self.metrics['last_uptime_s']} с), задержка {self.backoff} с"
+        )
+        if self.stop_event.wait(self.backoff):
+            return False
+        self.backoff = min(self.backoff * 2, self.settings['backoff_max'])
         return self.start_bot()
     
+    def save_metrics(self):
+        """Метрики перезапусков в logs/bot_manager_metrics.json"""
+        try:
+            metrics = {**self.metrics, 'restarts_in_window': len(self.restart_times),
+                       'backoff_s': self.backoff, 'updated_at': datetime.now().isoformat(timespec='seconds')}
+            with open(METRICS_FILE, 'w', encoding='utf-8') as f:
+                json.dump(metrics, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения метрик: {e}")
+    
     def monitor(self):
         """Мониторинг работы бота"""
-        print("Начинаем мониторинг бота...")
+        logger.info("Начинаем мониторинг бота...")
         
         while self.running:
             try:
-                if not self.is_bot_running():
-                    print("Бот не отвечает! Перезапуск...")
-                    if not self.restart_bot():
+                reason = self.check_health()
+                if reason:
+                    logger.warning(f"Бот неисправен ({reason})! Перезапуск...")
+                    if not self.restart_bot(reason):
                         break
                 else:
-                    time.sleep(30)
-                    
+                    self.stop_event.wait(1)
+            
             except KeyboardInterrupt:
-                print("Получен сигнал остановки...")
+                logger.info("Получен сигнал остановки...")
                 break
             except Exception as e:
-                print(f"Ошибка мониторинга: {e}")
-                time.sleep(10)
+                logger.error(f"Ошибка мониторинга: {e}")
+                self.stop_event.wait(10)
         
         self.stop_bot()
-        print("Bot Manager завершен")
+        self.save_metrics()
+        logger.info("Bot Manager завершен")
     
     def signal_handler(self, signum, frame):
-        """Обработчик сигналов"""
-        print(f"Получен сигнал {signum}")
+        """Обработчик сигналов: остановка мониторинга и передача SIGTERM боту"""
+        logger.info(f"Получен сигнал {signum}")
         self.running = False
+        self.stop_event.set()
 
 def main():
     """Основная функция - все уже настроено автоматически"""
-    print("DianaLisa Bot Manager")
-    print("=" * 50)
-    print(f"Папка: {os.getcwd()}")
+    listener = setup_logging()
+    logger.info("DianaLisa Bot Manager")
+    logger.info(f"Папка: {os.getcwd()}")
     
     manager = BotManager()
     
     try:
-        signal.signal(signal.SIGINT, manager.signal_handler)
-        signal.signal(signal.SIGTERM, manager.signal_handler)
-        
         if manager.start_bot():
             manager.monitor()
         else:
-            print("Не удалось запустить бота")
+            logger.error("Не удалось запустить бота")
             sys.exit(1)
-            
+    
     except Exception as e:
-        print(f"Критическая ошибка: {e}")
+        logger.critical(f"Критическая ошибка: {e}")
         sys.exit(1)
+    finally:
+        listener.stop()
 
 if __name__ == "__main__":
     main()
@@ -14,11 +14,10 @@ from telegram.ext import ContextTypes
 from config import MESSAGES, BUTTONS, ADMIN_IDS, IMAGES
 from keyboards import keyboards
 from database import db
-from admin import AdminPanel
+from notifications import notification_planner
 from utils import get_user_timezone, send_motivational_message
 from training import send_training_content
-from payment import create_payment_invoice
-from admin import handle_admin_actions
+from responder import responder
 
 # Создаем детальный логгер для callbacks
 callback_logger = logging.getLogger('callbacks')
@@ -149,9 +148,6 @@ class CallbackHandlers:
             'confirm_': self.handle_confirm,
             'cancel_action': self.handle_cancel,
             
-            # Пагинация
-            '_page_': self.handle_pagination,
-            
             # Заглушка
             'noop': self.handle_noop
         }
@@ -181,27 +177,17 @@ class CallbackHandlers:
                 await handler(update, context, callback_data)
             except Exception as e:
                 logger.error(f"Ошибка обработки callback {callback_data}: {e}")
-                # Удаляем сообщение и отправляем новое вместо edit_message_text
-                try:
-                    await query.delete_message()
-                except:
-                    pass
-                
-                await context.bot.send_message(
-                    chat_id=query.message.chat_id,
+                await responder.reply(
+                    bot=context.bot,
+                    query=query,
                     text="❌ Произошла ошибка. Попробуйте позже.",
                     reply_markup=keyboards.back_to_main()
                 )
         else:
             logger.warning(f"Неизвестный callback: {callback_data}")
-            # Удаляем сообщение и отправляем новое вместо edit_message_text
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=query.message.chat_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="❓ Неизвестная команда. Возвращаемся в главное меню.",
                 reply_markup=keyboards.main_menu()
             )
@@ -236,27 +222,17 @@ class CallbackHandlers:
                 logger.info(f"[MAIN_MENU] Пользователь в процессе регистрации")
                 state = registration_handler.registration_states[user_id]
                 if state['step'] == 'email':
-                    # Удаляем сообщение с картинкой и отправляем новое
-                    try:
-                        await query.delete_message()
-                    except:
-                        pass
-                    
-                    await context.bot.send_message(
-                        chat_id=user_id,
+                    await responder.reply(
+                        bot=context.bot,
+                        query=query,
                         text="❌ Пожалуйста, завершите регистрацию. Введите email:",
                         reply_markup=keyboards.email_input_keyboard()
                     )
                     return
                 elif state['step'] == 'timezone':
-                    # Удаляем сообщение с картинкой и отправляем новое
-                    try:
-                        await query.delete_message()
-                    except:
-                        pass
-                    
-                    await context.bot.send_message(
-                        chat_id=user_id,
+                    await responder.reply(
+                        bot=context.bot,
+                        query=query,
                         text="❌ Пожалуйста, завершите регистрацию. Выберите часовой пояс:",
                         reply_markup=keyboards.timezone_menu()
                     )
@@ -299,20 +275,9 @@ class CallbackHandlers:
                 """
                 enhanced_logger.log_user_action(user_id, 'welcome_new_message')
             
-            logger.info(f"[MAIN_MENU] Удаляем предыдущее сообщение")
-            # Удаляем предыдущее сообщение и отправляем новое с изображением
-            try:
-                await query.delete_message()
-                enhanced_logger.log_user_action(user_id, 'message_deleted')
-                logger.info(f"[MAIN_MENU] Сообщение удалено")
-            except Exception as e:
-                logger.error(f"[MAIN_MENU] Ошибка удаления сообщения: {e}")
-                enhanced_logger.log_error(e, {'user_id': user_id, 'action': 'delete_message'})
-            
             # Отправляем изображение с приветствием
             logger.info(f"[MAIN_MENU] Отправляем изображение с приветствием")
             try:
-                from utils import send_image_with_text
                 enhanced_logger.log_user_action(user_id, 'sending_welcome_image')
                 
                 # Проверяем, является ли пользователь админом
@@ -323,9 +288,9 @@ class CallbackHandlers:
                 menu_keyboard = keyboards.admin_main_menu() if is_admin else keyboards.main_menu()
                 logger.info(f"[MAIN_MENU] Клавиатура подготовлена, is_admin={is_admin}")
                 
-                await send_image_with_text(
+                await responder.reply(
                     bot=context.bot,
-                    chat_id=user_id,
+                    query=query,
                     image_path="DianaLisa1.jpg",
                     text=welcome_text,
                     reply_markup=menu_keyboard,
@@ -382,6 +347,7 @@ class CallbackHandlers:
                     await query.delete_message()
                 except:
                     pass
+                responder.forget(user_id)
                 
                 # Завершаем регистрацию
                 await registration_handler.complete_registration(update, context, user_id)
@@ -406,14 +372,9 @@ class CallbackHandlers:
         
         if not user:
             logger.warning(f"Пользователь {user_id} не найден в БД!")
-            # Удаляем предыдущее сообщение и отправляем новое
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="❌ Сначала нужно зарегистрироваться. Используйте /start",
                 reply_markup=keyboards.back_to_main()
             )
@@ -421,12 +382,6 @@ class CallbackHandlers:
         
         current_day = user['current_day']
         
-        # Удаляем предыдущее сообщение и отправляем новое с изображением
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
         training_text = f"""<b>Выберите тренировку</b>
 
 Ваш текущий прогресс: <b>День {current_day}</b>
@@ -439,10 +394,9 @@ class CallbackHandlers:
 Выберите доступную тренировку:"""
         
         # Отправляем изображение с меню тренировок
-        from utils import send_image_with_text
-        await send_image_with_text(
+        await responder.reply(
             bot=context.bot,
-            chat_id=user_id,
+            query=query,
             image_path="DianaLisa2.jpg",
             text=training_text,
             reply_markup=keyboards.training_menu(current_day),
@@ -457,17 +411,10 @@ class CallbackHandlers:
         # Отправляем FAQ с изображением
         faq_text = MESSAGES['faq']
         
-        # Удаляем предыдущее сообщение и отправляем новое с изображением
-        try:
-            await query.delete_message()
-        except:
-            pass  # Игнорируем ошибки удаления
-        
         # Отправляем изображение с FAQ
-        from utils import send_image_with_text
-        await send_image_with_text(
+        await responder.reply(
             bot=context.bot,
-            chat_id=user_id,
+            query=query,
             image_path="DianaLisa2.jpg",
             text=faq_text,
             reply_markup=keyboards.back_to_main(),
@@ -519,17 +466,10 @@ class CallbackHandlers:
 💰 Оплатить курс:
         """
         
-        # Удаляем предыдущее сообщение и отправляем новое с изображением
-        try:
-            await query.delete_message()
-        except:
-            pass  # Игнорируем ошибки удаления
-        
         # Отправляем изображение с информацией о курсах
-        from utils import send_image_with_text
-        await send_image_with_text(
+        await responder.reply(
             bot=context.bot,
-            chat_id=user_id,
+            query=query,
             image_path="DianaLisa2.jpg",
             text=course_text,
             reply_markup=keyboards.course_packages(),
@@ -584,17 +524,10 @@ class CallbackHandlers:
 💰 Выберите пакет:
         """
         
-        # Удаляем предыдущее сообщение и отправляем новое с изображением
-        try:
-            await query.delete_message()
-        except:
-            pass  # Игнорируем ошибки удаления
-        
         # Отправляем изображение с информацией о тренировках
-        from utils import send_image_with_text
-        await send_image_with_text(
+        await responder.reply(
             bot=context.bot,
-            chat_id=user_id,
+            query=query,
             image_path="DianaLisa2.jpg",
             text=training_text,
             reply_markup=keyboards.training_packages(),
@@ -620,17 +553,10 @@ class CallbackHandlers:
 ❓ Частые вопросы смотрите в FAQ
         """
         
-        # Удаляем предыдущее сообщение и отправляем новое с изображением
-        try:
-            await query.delete_message()
-        except:
-            pass  # Игнорируем ошибки удаления
-        
         # Отправляем изображение с информацией о поддержке
-        from utils import send_image_with_text
-        await send_image_with_text(
+        await responder.reply(
             bot=context.bot,
-            chat_id=user_id,
+            query=query,
             image_path="DianaLisa2.jpg",
             text=support_text,
             reply_markup=keyboards.back_to_main(),
@@ -669,11 +595,20 @@ class CallbackHandlers:
             # Логируем действие пользователя
             enhanced_logger.log_user_action(user_id, 'mark_training_clicked')
 
-            # Получаем пользователя из БД
+            # Чтение пользователя и все записи отметки - одна транзакция с одной фиксацией
+            training_tip = "Регулярные тренировки ускоряют метаболизм на 24 часа!"
             try:
-                user = db.get_user(user_id)
+                with db.transaction() as uow:
+                    user = uow.get_user(user_id)
+                    if user and not user.get('training_completed', False):
+                        new_state = not user.get('training_completed', False)
+                        uow.update_user(user_id, training_completed=new_state)
+                        uow.add_analytics_event(user_id, 'training_toggled', f'state_{new_state}')
+                        if new_state:
+                            # Добавляем совет в коллекцию
+                            uow.add_tip(user_id, 'training', training_tip)
             except Exception as db_error:
-                logger.error(f"Ошибка получения пользователя: {db_error}")
+                logger.error(f"Ошибка сохранения отметки тренировки: {db_error}")
                 await context.bot.send_message(
                     chat_id=query.message.chat_id,
                     text="❌ Ошибка получения данных пользователя"
@@ -693,18 +628,13 @@ class CallbackHandlers:
                 current_day = day_from_callback if day_from_callback else user.get('current_day', 1)
                 logger.info(f"Используем день для обратной связи: {current_day}")
                 
-                # Удаляем предыдущее сообщение
-                try:
-                    await query.delete_message()
-                except:
-                    pass
-                
                 # Отправляем сообщение с кнопками оценки
                 keyboard = keyboards.like_dislike_menu(current_day)
                 message_text = f"🎯 Тренировка День {current_day} завершена!\n\nКак прошла тренировка?"
                 
-                await context.bot.send_message(
-                    chat_id=user_id,
+                await responder.reply(
+                    bot=context.bot,
+                    query=query,
                     text=message_text,
                     reply_markup=keyboard
                 )
@@ -712,46 +642,24 @@ class CallbackHandlers:
                 enhanced_logger.log_user_action(user_id, 'training_feedback_requested')
                 return
 
-            # Переключаем состояние
-            new_state = not user.get('training_completed', False)
-            try:
-                db.update_user(user_id, training_completed=new_state)
-                db.add_analytics_event(user_id, 'training_toggled', f'state_{new_state}')
-            except Exception as update_error:
-                logger.error(f"Ошибка обновления пользователя: {update_error}")
-                # Продолжаем выполнение
-
             # Обновляем данные пользователя для клавиатуры
             user['training_completed'] = new_state
 
             if new_state:
-                # Добавляем совет в коллекцию
-                training_tip = "Регулярные тренировки ускоряют метаболизм на 24 часа!"
-                try:
-                    db.add_tip_to_collection(user_id, 'training', training_tip)
-                except Exception as tip_error:
-                    logger.error(f"Ошибка добавления совета: {tip_error}")
-                    # Продолжаем выполнение
-                
                 # Получаем текущий день тренировки - используем день из callback если есть
                 current_day = day_from_callback if day_from_callback else user.get('current_day', 1)
                 logger.info(f"Отправляем обратную связь для дня: {current_day}")
                 
-                # Удаляем предыдущее сообщение и показываем обратную связь
-                try:
-                    await query.delete_message()
-                except:
-                    pass
-                
                 try:
-                    await self.start_training_feedback(user_id, current_day, context)
+                    await self.start_training_feedback(user_id, current_day, context, query)
                     enhanced_logger.log_user_action(user_id, 'training_marked_completed')
                 except Exception as feedback_error:
                     logger.error(f"Ошибка отправки обратной связи: {feedback_error}")
                     # Fallback - отправляем простое сообщение
                     try:
-                        await context.bot.send_message(
-                            chat_id=user_id,
+                        await responder.reply(
+                            bot=context.bot,
+                            query=query,
                             text=f"🎯 Тренировка День {current_day} завершена!\n\nКак прошла тренировка?",
                             reply_markup=keyboards.like_dislike_menu(current_day)
                         )
@@ -763,18 +671,11 @@ class CallbackHandlers:
                 message = "❌ Тренировка отмечена как не выполненная"
                 enhanced_logger.log_user_action(user_id, 'training_marked_incomplete')
                 
-                # Удаляем предыдущее сообщение и отправляем новое с изображением
-                try:
-                    await query.delete_message()
-                except:
-                    pass
-                
                 # Отправляем изображение с сообщением
                 try:
-                    from utils import send_image_with_text
-                    await send_image_with_text(
+                    await responder.reply(
                         bot=context.bot,
-                        chat_id=user_id,
+                        query=query,
                         image_path="DianaLisa2.jpg",
                         text=message,
                         reply_markup=keyboards.main_menu(),
@@ -795,14 +696,9 @@ class CallbackHandlers:
 
         except Exception as e:
             logger.error(f"Ошибка обработки отметки тренировки: {e}")
-            # Удаляем предыдущее сообщение и отправляем новое
-            try:
-                await query.delete_message()
-            except:
-                pass  # Игнорируем ошибки удаления
-            
-            await context.bot.send_message(
-                chat_id=query.message.chat_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="❌ Произошла ошибка при обработке запроса"
             )
     
@@ -825,14 +721,9 @@ class CallbackHandlers:
         """Обработка покупки курса"""
         query = update.callback_query
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text="💎 Выберите пакет курса:",
             reply_markup=keyboards.course_packages()
         )
@@ -841,14 +732,9 @@ class CallbackHandlers:
         """Обработка покупки тренировок"""
         query = update.callback_query
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text="💻 Выберите пакет тренировок:",
             reply_markup=keyboards.training_packages()
         )
@@ -861,6 +747,7 @@ class CallbackHandlers:
         package_type = callback_data.replace('package_', '')
         
         # Создаем инвойс для оплаты
+        from payment import create_payment_invoice
         await create_payment_invoice(query, package_type, 'course')
     
     async def handle_training_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
@@ -871,6 +758,7 @@ class CallbackHandlers:
         training_type = callback_data.replace('training_', '')
         
         # Создаем инвойс для оплаты
+        from payment import create_payment_invoice
         await create_payment_invoice(query, training_type, 'training')
     
     # ============================================================================
@@ -883,6 +771,7 @@ class CallbackHandlers:
             # Для кнопки админ-панели вызываем команду /admin
             await self.handle_admin_command(update, context)
         else:
+            from admin import handle_admin_actions
             await handle_admin_actions(update, context, callback_data)
     
     async def handle_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -896,12 +785,6 @@ class CallbackHandlers:
             await query.answer("❌ У вас нет прав доступа к админ-панели.")
             return
         
-        # Удаляем предыдущее сообщение
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
         # Показываем админ-панель напрямую
         admin_text = """
 🛠 <b>Админ-панель DianaLisa Bot</b>
@@ -920,8 +803,9 @@ class CallbackHandlers:
 🎯 Выберите действие:
         """
         
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text=admin_text,
             reply_markup=keyboards.admin_menu(),
             parse_mode=ParseMode.HTML
@@ -935,14 +819,9 @@ class CallbackHandlers:
         rating = int(callback_data.replace('rating_', ''))
         db.add_analytics_event(user_id, 'rating_given', str(rating))
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text=f"⭐ Спасибо за оценку {rating}/5! Ваше мнение очень важно для нас!",
             reply_markup=keyboards.back_to_main()
         )
@@ -954,14 +833,9 @@ class CallbackHandlers:
         
         db.add_analytics_event(user_id, 'yes_clicked')
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text="✅ Отлично! Продолжаем!",
             reply_markup=keyboards.main_menu()
         )
@@ -973,14 +847,9 @@ class CallbackHandlers:
         
         db.add_analytics_event(user_id, 'no_clicked')
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text="❌ Понятно. Возвращаемся в главное меню.",
             reply_markup=keyboards.main_menu()
         )
@@ -993,14 +862,9 @@ class CallbackHandlers:
         action = callback_data.replace('confirm_', '')
         db.add_analytics_event(user_id, 'action_confirmed', action)
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text=f"✅ Действие '{action}' подтверждено!",
             reply_markup=keyboards.back_to_main()
         )
@@ -1012,30 +876,13 @@ class CallbackHandlers:
         
         db.add_analytics_event(user_id, 'action_cancelled')
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text="❌ Действие отменено.",
             reply_markup=keyboards.main_menu()
         )
     
-    async def handle_pagination(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
-        """Обработка пагинации"""
-        query = update.callback_query
-        
-        # Здесь можно реализовать логику пагинации
-        await context.bot.edit_message_text(
-                    chat_id=query.message.chat_id,
-                    message_id=query.message.message_id,
-                    text="📄 Пагинация будет реализована в следующих версиях.",
-                    reply_markup=keyboards.back_to_main()
-        )
-    
     async def handle_confirm_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
         """Обработка подтверждения рассылки"""
         query = update.callback_query
@@ -1099,8 +946,8 @@ class CallbackHandlers:
         """Заглушка для кнопок без действия"""
         pass
     
-    async def start_training_feedback(self, user_id: int, day: int, context: ContextTypes.DEFAULT_TYPE):
-        """Автоматический запуск оценки тренировки"""
+    async def start_training_feedback(self, user_id: int, day: int, context: ContextTypes.DEFAULT_TYPE, query=None):
+        """Автоматический запуск оценки тренировки (при нажатии кнопки - в том же сообщении)"""
         try:
             # Создаем клавиатуру
             keyboard = keyboards.like_dislike_menu(day)
@@ -1109,6 +956,15 @@ class CallbackHandlers:
             message_text = f"🎯 Тренировка День {day} завершена!\n\nКак прошла тренировка?"
             
             # Отправляем простое сообщение без изображения
+            if query:
+                await responder.reply(
+                    bot=context.bot,
+                    query=query,
+                    text=message_text,
+                    reply_markup=keyboard
+                )
+                return
+            
             await context.bot.send_message(
                 chat_id=user_id,
                 text=message_text,
@@ -1142,13 +998,9 @@ class CallbackHandlers:
             day = int(parts[2])
             logger.info(f"Пользователь {user_id} начал оценку тренировки дня {day}")
             
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text=f"📝 Оценка тренировки День {day}\n\n"
                      "Насколько сложной была для тебя эта тренировка?",
                 reply_markup=keyboards.difficulty_rating_menu(day)
@@ -1156,13 +1008,9 @@ class CallbackHandlers:
             
         except Exception as e:
             logger.error(f"Ошибка обработки оценки тренировки: {e}")
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="❌ Произошла ошибка при обработке запроса"
             )
     
@@ -1185,13 +1033,9 @@ class CallbackHandlers:
             
             logger.info(f"Пользователь {user_id} оценил сложность тренировки дня {day}: {rating}")
             
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text=f"📝 Оценка тренировки День {day}\n\n"
                      "Насколько понятными были инструкции?",
                 reply_markup=keyboards.clarity_rating_menu(day)
@@ -1199,13 +1043,9 @@ class CallbackHandlers:
             
         except Exception as e:
             logger.error(f"Ошибка обработки оценки сложности: {e}")
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="❌ Произошла ошибка при обработке запроса"
             )
     
@@ -1228,13 +1068,9 @@ class CallbackHandlers:
             
             logger.info(f"Пользователь {user_id} оценил понятность тренировки дня {day}: {rating}")
             
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text=f"📝 Оценка тренировки День {day}\n\n"
                      "Хочешь добавить комментарий к тренировке?",
                 reply_markup=keyboards.comments_menu(day)
@@ -1242,13 +1078,9 @@ class CallbackHandlers:
             
         except Exception as e:
             logger.error(f"Ошибка обработки оценки понятности: {e}")
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="❌ Произошла ошибка при обработке запроса"
             )
     
@@ -1296,13 +1128,9 @@ class CallbackHandlers:
                 
         except Exception as e:
             logger.error(f"Ошибка завершения оценки: {e}")
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="❌ Произошла ошибка при обработке запроса"
             )
     
@@ -1388,14 +1216,9 @@ class CallbackHandlers:
         """Обработка статистики админки"""
         query = update.callback_query
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text="📊 Статистика бота",
             reply_markup=keyboards.admin_menu()
         )
@@ -1404,14 +1227,9 @@ class CallbackHandlers:
         """Обработка управления пользователями"""
         query = update.callback_query
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text="👥 Управление пользователями",
             reply_markup=keyboards.admin_menu()
         )
@@ -1420,14 +1238,9 @@ class CallbackHandlers:
         """Обработка платежей"""
         query = update.callback_query
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text="💳 Управление платежами",
             reply_markup=keyboards.admin_menu()
         )
@@ -1436,14 +1249,9 @@ class CallbackHandlers:
         """Обработка отзывов"""
         query = update.callback_query
         
-        # Удаляем сообщение и отправляем новое вместо edit_message_text
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
-        await context.bot.send_message(
-            chat_id=query.message.chat_id,
+        await responder.reply(
+            bot=context.bot,
+            query=query,
             text="⭐ Управление отзывами",
             reply_markup=keyboards.admin_menu()
         )
@@ -1461,7 +1269,7 @@ class CallbackHandlers:
         await query.answer()
         
         # Вызываем функцию показа отзывов о тренировках
-        admin_panel = AdminPanel()
+        from admin import admin_panel
         await admin_panel.show_training_feedback(query)
     
     async def handle_admin_analytics(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
@@ -1655,14 +1463,9 @@ class CallbackHandlers:
         # Проверяем, есть ли пользователь в базе
         user = db.get_user(user_id)
         if user:
-            # Удаляем предыдущее сообщение и отправляем новое
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="✅ Вы уже зарегистрированы! Добро пожаловать обратно!",
                 reply_markup=keyboards.main_menu()
             )
@@ -1671,17 +1474,10 @@ class CallbackHandlers:
         # Начинаем процесс регистрации
         from registration import registration_handler
         
-        # Удаляем предыдущее сообщение
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
         # Отправляем сообщение с запросом имени и картинкой
-        from utils import send_image_with_text
-        await send_image_with_text(
+        await responder.reply(
             bot=context.bot,
-            chat_id=user_id,
+            query=query,
             image_path="DianaLisa1.jpg",
             text=MESSAGES['name_request'],
             reply_markup=keyboards.name_input_keyboard(),
@@ -1699,30 +1495,18 @@ class CallbackHandlers:
         # Проверяем, есть ли пользователь в базе
         user = db.get_user(user_id)
         if user:
-            # Удаляем предыдущее сообщение и отправляем новое
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="✅ Вы уже зарегистрированы! Добро пожаловать обратно!",
                 reply_markup=keyboards.main_menu()
             )
             return
         
-        # Удаляем предыдущее сообщение
-        try:
-            await query.delete_message()
-        except:
-            pass
-        
         # Отправляем начальное сообщение регистрации с картинкой
-        from utils import send_image_with_text
-        await send_image_with_text(
+        await responder.reply(
             bot=context.bot,
-            chat_id=user_id,
+            query=query,
             image_path="DianaLisa1.jpg",
             text=MESSAGES['start_registration_welcome'],
             reply_markup=keyboards.start_registration_menu(),
@@ -1755,27 +1539,19 @@ class CallbackHandlers:
             if current_day < 3:
                 logger.info(f"[FEEDBACK_LIKE] Планируем день {current_day + 1}")
                 try:
-                    await self.schedule_next_day_opening(user_id, current_day + 1, context)
+                    await self.schedule_next_day_opening(user_id, current_day + 1)
                     enhanced_logger.log_user_action(user_id, 'day_scheduled', {'day': current_day + 1, 'time': '06:00'})
                 except Exception as e:
                     logger.error(f"[FEEDBACK_LIKE] Ошибка планирования: {e}")
             
-            # Удаляем сообщение
-            logger.info(f"[FEEDBACK_LIKE] Удаляем сообщение")
-            try:
-                await query.delete_message()
-            except Exception as e:
-                logger.error(f"[FEEDBACK_LIKE] Ошибка удаления: {e}")
-            
             # Формируем текст
             next_day_text = f"День {current_day + 1}" if current_day < 3 else "завершение курса"
             logger.info(f"[FEEDBACK_LIKE] Отправляем ответ")
             
             # Отправляем ответ
-            from utils import send_image_with_text
-            await send_image_with_text(
+            await responder.reply(
                 bot=context.bot,
-                chat_id=user_id,
+                query=query,
                 image_path="DianaLisa2.jpg",
                 text=f"😊 Отлично! Спасибо за положительную обратную связь!\n\n"
                      f"🎯 Следующая тренировка ({next_day_text}) будет доступна завтра в 6:00!\n\n"
@@ -1805,14 +1581,9 @@ class CallbackHandlers:
         day = int(callback_data.split('_')[-1])
         
         try:
-            # Удаляем предыдущее сообщение и отправляем новое
-            try:
-                await query.delete_message()
-            except:
-                pass  # Игнорируем ошибки удаления
-            
-            await context.bot.send_message(
-                chat_id=query.message.chat_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text=f"😞 Мне очень жаль, что тренировка День {day} не понравилась.\n\n"
                      "Что именно не понравилось? Пожалуйста, опишите подробнее:",
                 reply_markup=keyboards.text_input_menu(),
@@ -1824,14 +1595,9 @@ class CallbackHandlers:
             
         except Exception as e:
             logger.error(f"Ошибка обработки отрицательной обратной связи: {e}")
-            # Удаляем предыдущее сообщение и отправляем новое
-            try:
-                await query.delete_message()
-            except:
-                pass  # Игнорируем ошибки удаления
-            
-            await context.bot.send_message(
-                chat_id=query.message.chat_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="❌ Произошла ошибка. Попробуйте еще раз.",
                 reply_markup=keyboards.main_menu()
             )
@@ -1864,76 +1630,67 @@ class CallbackHandlers:
         except Exception as e:
             logger.error(f"Ошибка записи обратной связи: {e}")
     
-    async def schedule_next_day_opening(self, user_id: int, next_day: int, context: ContextTypes.DEFAULT_TYPE):
-        """Планирование открытия следующего дня тренировки в 6:00"""
+    async def schedule_next_day_opening(self, user_id: int, next_day: int):
+        """Планирование открытия следующего дня тренировки в 6:00 (таймер в pending_unlocks переживает перезапуск)"""
         try:
             logger.info(f"[SCHEDULE] Начало планирования Дня {next_day} для пользователя {user_id}")
             
-            from jobs import scheduler
-            from datetime import datetime, timedelta
-            import pytz
+            from unlocks import unlock_timers
             
             # Получаем пользователя для определения часового пояса
             user = db.get_user(user_id)
             if not user:
                 logger.error(f"[SCHEDULE] Пользователь {user_id} не найден в БД")
                 return
-                
-            user_timezone = user.get('timezone') or 'Europe/Moscow'  # Защита от None
-            if user_timezone is None:
-                user_timezone = 'Europe/Moscow'
-            logger.info(f"[SCHEDULE] Часовой пояс пользователя: {user_timezone}")
-            
-            # Планируем открытие на завтра в 6:00
-            tz = pytz.timezone(user_timezone)
-            now = datetime.now(tz)
-            tomorrow_6am = (now + timedelta(days=1)).replace(hour=6, minute=0, second=0, microsecond=0)
-            logger.info(f"[SCHEDULE] Запланированное время: {tomorrow_6am}")
-            
-            # Проверяем доступность планировщика
-            if not hasattr(scheduler, 'scheduler'):
-                logger.error(f"[SCHEDULE] Планировщик не доступен!")
-                return
             
-            # Добавляем задачу в планировщик
-            job_id = f"open_day_{next_day}_{user_id}"
-            logger.info(f"[SCHEDULE] Добавляем задачу с ID: {job_id}")
-            
-            scheduler.scheduler.add_job(
-                func=self.open_next_training_day,
-                trigger='date',
-                run_date=tomorrow_6am,
-                args=[user_id, next_day, context],
-                id=job_id,
-                replace_existing=True
-            )
+            # Планируем открытие на завтра в 6:00 по времени пользователя
+            tomorrow_6am = unlock_timers.next_unlock_time(user.get('timezone'))
+            logger.info(f"[SCHEDULE] Запланированное время: {tomorrow_6am}")
             
-            logger.info(f"[SCHEDULE] [OK] Успешно запланировано открытие Дня {next_day} для пользователя {user_id} на {tomorrow_6am}")
+            if unlock_timers.schedule(user_id, next_day, tomorrow_6am.timestamp()):
+                logger.info(f"[SCHEDULE] [OK] Успешно запланировано открытие Дня {next_day} для пользователя {user_id} на {tomorrow_6am}")
+            else:
+                logger.error(f"[SCHEDULE] [FAIL] Таймер открытия Дня {next_day} для пользователя {user_id} не сохранен")
             
         except Exception as e:
             logger.error(f"[SCHEDULE] [FAIL] Ошибка планирования открытия следующего дня: {e}", exc_info=True)
     
-    async def open_next_training_day(self, user_id: int, day: int, context: ContextTypes.DEFAULT_TYPE):
-        """Открытие следующего дня тренировки"""
+    async def open_next_training_day(self, user_id: int, day: int) -> bool:
+        """Открытие следующего дня тренировки (по таймеру из unlocks); False - день не открыт, таймер нужно повторить"""
         try:
+            user = db.get_user(user_id)
+            if not user or (user.get('current_day') or 1) >= day:
+                # День уже открыт (повтор после перезапуска или ежедневная прогрессия)
+                return True
+            
+            # Без приложения пользователь не узнает об открытии - день не открываем до повтора
+            import main
+            application = main.application
+            if not application:
+                logger.warning("Приложение не инициализировано")
+                return False
+            
             # Обновляем current_day пользователя
-            db.update_user(user_id, current_day=day)
+            if not db.update_user(user_id, current_day=day):
+                return False
             enhanced_logger.log_user_action(user_id, 'day_opened_scheduled', {'day': day, 'time': '06:00'})
             
             # Отправляем уведомление пользователю
-            await context.bot.send_message(
-                chat_id=user_id,
-                text=f"🌅 Доброе утро!\n\n"
-                     f"🎯 Тренировка День {day} теперь доступна!\n\n"
-                     f"Время начинать новый день тренировок! 💪",
+            await notification_planner.notify(
+                user_id, 'unlock',
+                f"🌅 Доброе утро!\n\n"
+                f"🎯 Тренировка День {day} теперь доступна!\n\n"
+                f"Время начинать новый день тренировок! 💪",
                 reply_markup=keyboards.main_menu(),
                 parse_mode=ParseMode.HTML
             )
             
             logger.info(f"Открыт День {day} для пользователя {user_id}")
+            return True
             
         except Exception as e:
             logger.error(f"Ошибка открытия следующего дня: {e}")
+            return False
     
     async def handle_leave_review(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback_data: str):
         """Обработка оставления отзыва"""
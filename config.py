@@ -49,6 +49,9 @@ MAILGUN_DOMAIN = os.getenv('MAILGUN_DOMAIN', '')
 WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
 WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
 
+# Адрес Bot API (пусто - api.telegram.org); для нагрузочных тестов - локальный фейковый сервер
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '').rstrip('/')
+
 # 📱 Изображения и медиа
 IMAGES = {
     'welcome': 'https://example.com/welcome.jpg',
@@ -247,12 +250,91 @@ BUTTONS = {
 SCHEDULER_SETTINGS = {
     'morning_time': '08:00',
     'evening_time': '20:00',
-    'timezone': 'Europe/Moscow'
+    'timezone': 'Europe/Moscow',
+    'restore_batch_size': 50,  # Пользователей, чьи задачи восстанавливаются за один шаг event loop
+    'smoothing': True,         # Разносить напоминания 8:00/18:00/20:00 по окну с постоянным сдвигом для каждого пользователя
+    'smoothing_spread': 600,   # Сдвиг до ±10 минут от часа слота
+    'smoothing_rate_share': 0.5,  # Доля общего лимита шлюза для напоминаний слота
+    'smoothing_capacity': 15000,  # Расчетное число пользователей: окно расширяется, если они не укладываются в долю лимита
+    'merge_hours': (8,),          # Слоты в час прогрессии дней: сдвиг от 0 до доли окна NOTIFICATION_SETTINGS['window']
+    'merge_window_share': 0.5,    # Остаток окна - запас на саму прогрессию (транзакция и рассылка уведомлений)
+    'fanout_concurrency': 20,     # Одновременных уведомлений при прогрессии дней и досылке пропущенных
+    'misfire_grace_time': 300,    # Насколько задача может опоздать (перегрузка event loop) и все же выполниться, секунды
+    'coalesce': True,             # Несколько пропущенных запусков одной задачи выполняются один раз
+    'catch_up_hours': {           # Сколько часов после слота пропущенное (бот не работал) напоминание еще уместно
+        'morning': 4,
+        'training': 3,
+        'evening': 2
+    }
 }
 
 # 📊 Настройки аналитики
 ANALYTICS = {
     'track_events': True,
     'save_user_actions': True,
-    'log_level': 'INFO'
+    'log_level': 'INFO',
+    'retention_days': 90,          # Срок хранения событий (партиции удаляются помесячно)
+    'archive_partitions': True     # Сохранять удаляемые партиции в архив
+}
+
+# 💾 Настройки резервного копирования
+BACKUP_SETTINGS = {
+    'directory': os.getenv('BACKUP_DIR', 'backups'),
+    'keep_last': int(os.getenv('BACKUP_KEEP_LAST', '7')),
+    'pages_per_step': 256,   # Страниц за шаг backup API
+    'step_sleep': 0.05       # Пауза между шагами, чтобы не блокировать запись
+}
+
+# 🗂 Контент с горячей перезагрузкой (см. content.py)
+CONTENT_SETTINGS = {
+    'directory': os.getenv('CONTENT_DIR', 'content'),
+    'reload_interval': int(os.getenv('CONTENT_RELOAD_INTERVAL', '5'))  # Проверка mtime файлов, секунды
+}
+
+# ❤️ Сигналы живости для bot_manager.py (файл задает супервизор через окружение)
+HEARTBEAT_SETTINGS = {
+    'file': os.getenv('BOT_HEARTBEAT_FILE', ''),
+    'interval': float(os.getenv('BOT_HEARTBEAT_INTERVAL', '5'))
+}
+
+# ⏰ Таймеры открытия следующего дня: колесо таймеров в памяти держит только ближайшее окно
+UNLOCK_SETTINGS = {
+    'tick': 1.0,              # Шаг колеса, секунды
+    'wheel_slots': (60, 60),  # Ячеек на уровнях колеса: окно 60 x 60 шагов = 1 час
+    'open_hour': 6,           # Час открытия следующего дня по времени пользователя
+    'retry_delay': 300        # Повтор неудавшегося открытия дня, секунды (меньше окна колеса)
+}
+
+# ✏️ Ответы редактированием сообщения: реестр последних сообщений бота по чатам
+RESPONDER_SETTINGS = {
+    'max_chats': 10000  # Сколько чатов помнить (самые давние вытесняются)
+}
+
+# 🚦 Исходящий шлюз Bot API: лимиты Telegram ~30 сообщений/с на бота, ~1/с в чат, 20/мин в группу
+GATEWAY_SETTINGS = {
+    'global_rate': 25.0,      # Запросов в секунду на весь бот (с запасом до лимита)
+    'global_burst': 30,       # Размер всплеска
+    'chat_rate': 1.0,         # Запросов в секунду в личный чат
+    'group_rate': 20 / 60,    # Запросов в секунду в группу
+    'chat_burst': 3,          # Всплеск в один чат (ответ на нажатие: правка + уведомление)
+    'max_chats': 10000,       # Сколько по-чатовых ведер держать в памяти
+    'max_retries': 3          # Повторов после RetryAfter
+}
+
+# 📬 Планировщик уведомлений: сообщения одному пользователю за короткое окно объединяются в одно
+NOTIFICATION_SETTINGS = {
+    'window': 90.0,                               # Сколько секунд собирать сообщения пользователя перед отправкой
+    'daily_budget': 3,                            # Сообщений по расписанию на пользователя в сутки
+    'essential': ('new_day', 'unlock', 'training')  # Виды, которые отправляются и сверх бюджета
+}
+
+# 🐢 Трассировка SQL: статистика по отпечаткам запросов, журнал медленных запросов с планом
+SQL_TRACE_SETTINGS = {
+    'enabled': os.getenv('SQL_TRACE', '0') == '1',  # Включается на время диагностики: SQL_TRACE=1
+    'slow_ms': float(os.getenv('SQL_SLOW_MS', '50')),  # Порог медленного запроса, мс
+    'samples': 256,            # Последних выполнений на отпечаток для p95 (кольцевой буфер)
+    'max_fingerprints': 500,   # Сколько разных запросов помнить (самые давние вытесняются)
+    'slow_log_size': 100,      # Последних медленных запросов в журнале
+    'dump_path': os.path.join('logs', 'sql_trace.json'),
+    'dump_interval': 300       # Периодическая запись отчета в JSON, секунды
 }
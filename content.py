@@ -0,0 +1,152 @@
+"""
+🗂 Реестр контента бота DianaLisa
+Тексты, FAQ, пакеты и программа тренировок из версионируемых файлов content/*.json.
+Изменения определяются по mtime и подменяются в памяти без перезапуска бота.
+
+Формат файла: {"version": 2, "data": {...}} - ключи data переопределяют встроенные значения.
+Выгрузить текущий контент в файлы: python content.py dump
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import CONTENT_SETTINGS, MESSAGES
+
+logger = logging.getLogger(__name__)
+
+class ContentSection:
+    """Раздел контента: встроенные значения, файл и функция применения"""
+
+    def __init__(self, name: str, path: str, default: dict, apply: Callable[[dict], None],
+                 normalize: Optional[Callable[[dict], dict]] = None):
+        self.name = name
+        self.path = path
+        self.default = default
+        self.apply = apply
+        self.normalize = normalize
+        self.version = 0  # 0 - встроенный контент, файл не загружен
+        self.mtime = None
+
+class ContentRegistry:
+    """Класс для загрузки и горячей замены контента"""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or CONTENT_SETTINGS['directory']
+        self.sections: Dict[str, ContentSection] = {}
+
+    def register(self, name: str, default: dict, apply: Callable[[dict], None],
+                 normalize: Callable[[dict], dict] = None):
+        """Регистрация раздела; если файл уже есть, контент из него применяется сразу"""
+        path = os.path.join(self.directory, f"{name}.json")
+        self.sections[name] = ContentSection(name, path, default, apply, normalize)
+        self.check_for_updates(names=[name])
+
+    def _read_section(self, section: ContentSection) -> Tuple[int, dict]:
+        """Чтение и проверка файла раздела; итоговые данные - встроенные значения с переопределениями"""
+        with open(section.path, encoding='utf-8') as f:
+            content = json.load(f)
+
+        version = content.get('version') if isinstance(content, dict) else None
+        data = content.get('data') if isinstance(content, dict) else None
+        if not isinstance(version, int) or not isinstance(data, dict):
+            raise ValueError("ожидается объект {\"version\": <int>, \"data\": {...}}")
+
+        if section.normalize:
+            data = section.normalize(data)
+        return version, {**section.default, **data}
+
+    def read_changes(self, names: List[str] = None, force: bool = False) -> List[tuple]:
+        """Изменившиеся файлы (по mtime): список (раздел, версия, mtime, данные). Не трогает текущий контент"""
+        changes = []
+        for section in self.sections.values():
+            if names and section.name not in names:
+                continue
+            try:
+                mtime = os.stat(section.path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+
+            if mtime == section.mtime and not force:
+                continue
+
+            try:
+                version, data = self._read_section(section)
+                changes.append((section, version, mtime, data))
+            except Exception as e:
+                # Ошибочный файл не применяется - остается предыдущий контент
+                logger.error(f"Ошибка загрузки контента {section.path}: {e}")
+                section.mtime = mtime
+
+        return changes
+
+    def apply_changes(self, changes: List[tuple]) -> List[str]:
+        """Подмена контента: каждый раздел заменяется целиком уже подготовленным объектом"""
+        updated = []
+        for section, version, mtime, data in changes:
+            try:
+                section.apply(data)
+                logger.info(f"Контент {section.name} обновлен: версия {section.version} -> {version}")
+                section.version = version
+                section.mtime = mtime
+                updated.append(section.name)
+            except Exception as e:
+                logger.error(f"Ошибка применения контента {section.name}: {e}")
+        return updated
+
+    def check_for_updates(self, names: List[str] = None, force: bool = False) -> List[str]:
+        """Синхронная проверка и применение изменений"""
+        return self.apply_changes(self.read_changes(names, force))
+
+    async def reload(self, force: bool = False) -> List[str]:
+        """Файлы читаются в потоке, а подмена идет в event loop - обработчики не видят промежуточного состояния"""
+        changes = await asyncio.to_thread(self.read_changes, None, force)
+        return self.apply_changes(changes)
+
+    def get_versions(self) -> Dict[str, int]:
+        """Версии загруженного контента по разделам (0 - встроенный)"""
+        return {name: section.version for name, section in self.sections.items()}
+
+    def dump(self, version: int = 1) -> List[str]:
+        """Выгрузка текущих встроенных значений в файлы для редактирования"""
+        os.makedirs(self.directory, exist_ok=True)
+        written = []
+        for section in self.sections.values():
+            if os.path.exists(section.path):
+                continue
+            with open(section.path, 'w', encoding='utf-8') as f:
+                json.dump({'version': version, 'data': section.default}, f, ensure_ascii=False, indent=2)
+            written.append(section.path)
+        return written
+
+def apply_messages(data: dict):
+    """MESSAGES импортирован по имени во многих модулях, поэтому обновляется на месте"""
+    MESSAGES.update(data)
+
+# Глобальный реестр контента
+content_registry = ContentRegistry()
+content_registry.register('messages', dict(MESSAGES), apply_messages)
+
+def main():
+    """Командная строка: python content.py dump|versions"""
+    parser = argparse.ArgumentParser(description="Контент DianaLisa")
+    parser.add_argument('command', choices=['dump', 'versions'])
+    args = parser.parse_args()
+
+    # Разделы регистрируют модули, которым они принадлежат (в реестре модуля content, а не __main__)
+    import info, payment, training  # noqa: F401
+    from content import content_registry as registry
+
+    if args.command == 'dump':
+        for path in registry.dump():
+            print(path)
+    else:
+        for name, version in registry.get_versions().items():
+            print(f"{name}: {version}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
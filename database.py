@@ -5,27 +5,226 @@
 
 import sqlite3
 import logging
+import csv
+import gzip
+import json
+import os
+import time
+from contextlib import contextmanager
 from enhanced_logger import get_logger
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Iterator, Tuple
 from config import DATABASE_PATH
+from sqltrace import sql_tracer
 
 logger = logging.getLogger(__name__)
 enhanced_logger = get_logger("database")
 
+# Префикс помесячных партиций аналитики: analytics_pYYYYMM
+ANALYTICS_PARTITION_PREFIX = 'analytics_p'
+
+# Время жизни кэша счетчиков админ-панели, секунды
+DASHBOARD_CACHE_TTL = 30
+# Поля пользователя, от которых зависят счетчики админ-панели
+DASHBOARD_FIELDS = {'current_day', 'is_premium'}
+
+# Счетчики пользователя, изменяемые через Database.increment
+COUNTER_FIELDS = {'total_referrals', 'total_purchases'}
+
+# Индексы для keyset-пагинации пользователей: каждая страница - диапазонное чтение индекса
+USER_PAGE_INDEXES = {
+    'idx_users_registration': 'registration_date, user_id',
+    'idx_users_premium_registration': 'is_premium, registration_date, user_id',
+    'idx_users_day_registration': 'current_day, registration_date, user_id',
+    'idx_users_timezone_registration': 'timezone, registration_date, user_id',
+}
+
+# Колонки users, добавленные после первой версии схемы: имя -> определение для ALTER TABLE
+USER_ADDED_COLUMNS = {
+    'is_blocked': 'BOOLEAN DEFAULT FALSE',
+    'blocked_at': 'TIMESTAMP',
+}
+
+class UnitOfWork:
+    """Единица работы: чтения и записи обработчика на одном соединении с одной фиксацией.
+    Создается через Database.transaction(); методы не перехватывают ошибки - любая ошибка откатывает все записи"""
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.events: List[Tuple[int, str]] = []  # События аналитики - подписчики оповещаются после фиксации
+    
+    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Пользователь (видны и записи этой же транзакции)"""
+        cursor = self.conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        columns = [description[0] for description in cursor.description]
+        user_data = dict(zip(columns, row))
+        
+        # Конвертируем булевые поля из SQLite (1/0) в Python (True/False)
+        if 'training_completed' in user_data:
+            user_data['training_completed'] = bool(user_data['training_completed'])
+        return user_data
+    
+    def user_exists(self, user_id: int) -> bool:
+        """Проверка существования пользователя"""
+        return self.conn.execute('SELECT 1 FROM users WHERE user_id = ?', (user_id,)).fetchone() is not None
+    
+    def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None,
+                 email: str = None, phone: str = None, timezone: str = 'Europe/Moscow',
+                 referral_code: str = None, referred_by: int = None):
+        """Добавление (замена) пользователя"""
+        # Генерируем уникальный реферальный код
+        if not referral_code:
+            referral_code = f"REF{user_id}{datetime.now().strftime('%Y%m%d')}"
+        
+        self.conn.execute('''
+            INSERT OR REPLACE INTO users
+            (user_id, username, first_name, last_name, email, phone, timezone, referral_code, referred_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, username, first_name, last_name, email, phone, timezone, referral_code, referred_by))
+    
+    def update_user(self, user_id: int, **fields) -> bool:
+        """Обновление полей пользователя; False - пользователя нет"""
+        set_clause = ', '.join([f"{key} = ?" for key in fields.keys()])
+        cursor = self.conn.execute(
+            f'UPDATE users SET {set_clause} WHERE user_id = ?', list(fields.values()) + [user_id]
+        )
+        return cursor.rowcount > 0
+    
+    def increment(self, user_id: int, field: str, delta: float = 1) -> bool:
+        """Изменение счетчика пользователя одним UPDATE (без чтения строки)"""
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f"Поле {field} не является счетчиком пользователя")
+        cursor = self.conn.execute(
+            f'UPDATE users SET {field} = COALESCE({field}, 0) + ? WHERE user_id = ?', (delta, user_id)
+        )
+        return cursor.rowcount > 0
+    
+    def set_blocked(self, user_id: int, blocked: bool) -> bool:
+        """Статус доставки в чат пользователя; False - статус уже такой или пользователя нет"""
+        cursor = self.conn.execute(
+            'UPDATE users SET is_blocked = ?, blocked_at = ? WHERE user_id = ? AND is_blocked != ?',
+            (blocked, datetime.now() if blocked else None, user_id, blocked)
+        )
+        return cursor.rowcount > 0
+    
+    def advance_day(self, user_id: int, from_day: int, new_day: int) -> bool:
+        """Переход на следующий день со сбросом тренировки; False - день уже изменился (открыт таймером)"""
+        cursor = self.conn.execute(
+            'UPDATE users SET current_day = ?, training_completed = FALSE WHERE user_id = ? AND current_day = ?',
+            (new_day, user_id, from_day)
+        )
+        return cursor.rowcount > 0
+    
+    def add_analytics_event(self, user_id: int, event_type: str, event_data: str = None):
+        """Событие аналитики"""
+        self.conn.execute('''
+            INSERT INTO analytics (user_id, event_type, event_data)
+            VALUES (?, ?, ?)
+        ''', (user_id, event_type, event_data))
+        self.events.append((user_id, event_type))
+    
+    def add_tip(self, user_id: int, tip_type: str, tip_text: str) -> bool:
+        """Совет в коллекцию пользователя; False - совет уже есть или пользователя нет"""
+        cursor = self.conn.execute('''
+            INSERT OR IGNORE INTO user_tips (user_id, tip_type, tip_text, collected_at)
+            SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM users WHERE user_id = ?)
+        ''', (user_id, tip_type, tip_text, datetime.now().isoformat(), user_id))
+        return cursor.rowcount > 0
+    
+    def add_payment(self, user_id: int, amount: float, currency: str,
+                    payment_type: str, status: str, transaction_id: str):
+        """Платеж; для завершенного сразу увеличивается сумма покупок пользователя"""
+        self.conn.execute('''
+            INSERT INTO payments (user_id, amount, currency, payment_type, status, transaction_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, amount, currency, payment_type, status, transaction_id))
+        if status == 'completed':
+            self.increment(user_id, 'total_purchases', amount)
+    
+    def add_scheduled_job(self, user_id: int, job_type: str, scheduled_time: datetime):
+        """Задача планировщика"""
+        self.conn.execute('''
+            INSERT INTO scheduled_jobs (user_id, job_type, scheduled_time)
+            VALUES (?, ?, ?)
+        ''', (user_id, job_type, scheduled_time))
+
 class Database:
     """Класс для работы с базой данных SQLite"""
     
     def __init__(self, db_path: str = DATABASE_PATH):
         self.db_path = db_path
+        # Подписчики на новые события аналитики (инвалидация кэшей)
+        self._event_listeners: List[Callable[[int, str], None]] = []
+        self._dashboard_cache: Optional[Dict[str, Any]] = None
+        self._dashboard_cache_time = 0.0
         self.init_database()
     
+    def connect(self, **kwargs) -> sqlite3.Connection:
+        """Соединение с базой; запросы учитываются трассировкой SQL (sqltrace.py)"""
+        return sql_tracer.connect(self.db_path, **kwargs)
+    
+    def add_event_listener(self, listener: Callable[[int, str], None]):
+        """Подписка на добавление событий аналитики: listener(user_id, event_type)"""
+        if listener not in self._event_listeners:
+            self._event_listeners.append(listener)
+    
+    def remove_event_listener(self, listener: Callable[[int, str], None]):
+        """Отписка от событий аналитики"""
+        if listener in self._event_listeners:
+            self._event_listeners.remove(listener)
+    
+    def _notify_event_listeners(self, user_id: int, event_type: str):
+        """Оповещение подписчиков о новом событии аналитики"""
+        for listener in self._event_listeners:
+            try:
+                listener(user_id, event_type)
+            except Exception as e:
+                logger.error(f"Ошибка обработчика события аналитики: {e}")
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Соединение: фиксация при успехе, откат при ошибке и закрытие в любом случае"""
+        conn = self.connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @contextmanager
+    def transaction(self) -> Iterator[UnitOfWork]:
+        """with db.transaction() as uow: - чтения и записи обработчика на одном соединении, один COMMIT.
+        BEGIN IMMEDIATE сразу берет блокировку записи, поэтому чтение с последующей записью не упрется в SQLITE_BUSY.
+        Ошибка внутри блока откатывает все записи и пробрасывается дальше"""
+        conn = self.connect(isolation_level=None)
+        uow = UnitOfWork(conn)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            yield uow
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        
+        for user_id, event_type in uow.events:
+            self._notify_event_listeners(user_id, event_type)
+    
     def init_database(self):
         """Инициализация базы данных и создание таблиц"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 
+                # Для новой базы: место от удаленных партиций можно вернуть incremental_vacuum
+                cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                
                 # Таблица пользователей
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS users (
@@ -47,10 +246,29 @@ class Database:
                         total_purchases REAL DEFAULT 0.0,
                         training_completed BOOLEAN DEFAULT FALSE,
                         collected_tips TEXT DEFAULT '[]',
+                        is_blocked BOOLEAN DEFAULT FALSE,
+                        blocked_at TIMESTAMP,
                         FOREIGN KEY (referred_by) REFERENCES users(user_id)
                     )
                 ''')
                 
+                # Колонки, появившиеся после создания таблицы, добавляются в существующую базу
+                self._add_missing_columns(cursor, 'users', USER_ADDED_COLUMNS)
+                
+                # Чаты, куда доставка невозможна (бот заблокирован, аккаунт удален), исключаются из рассылок
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_users_blocked ON users (is_blocked, user_id)
+                ''')
+                
+                # Покрывающий индекс для счетчиков админ-панели (агрегат без чтения строк users)
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_users_day_premium ON users (current_day, is_premium)
+                ''')
+                
+                # Индексы постраничного просмотра пользователей (по дате регистрации с фильтрами)
+                for name, columns in USER_PAGE_INDEXES.items():
+                    cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON users ({columns})')
+                
                 # Таблица задач планировщика
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS scheduled_jobs (
@@ -64,17 +282,27 @@ class Database:
                     )
                 ''')
                 
-                # Таблица статистики
+                # Активные задачи пользователя ищутся при каждом перепланировании и восстановлении
                 cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS analytics (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER,
-                        event_type TEXT,
-                        event_data TEXT,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    CREATE INDEX IF NOT EXISTS idx_scheduled_jobs_user_active ON scheduled_jobs (user_id, is_active)
+                ''')
+                
+                # Отложенное открытие следующего дня: одна запись на пользователя, время срабатывания в UTC (unix)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS pending_unlocks (
+                        user_id INTEGER PRIMARY KEY,
+                        day INTEGER NOT NULL,
+                        fire_at REAL NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         FOREIGN KEY (user_id) REFERENCES users(user_id)
                     )
                 ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_pending_unlocks_fire_at ON pending_unlocks (fire_at)
+                ''')
+                
+                # Таблица статистики: помесячные партиции за представлением analytics
+                self._init_analytics_partitions(cursor)
                 
                 # Таблица оценок тренировок
                 cursor.execute('''
@@ -118,6 +346,44 @@ class Database:
                     )
                 ''')
                 
+                # Таблица серий тренировок (поддерживается инкрементально)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS training_streaks (
+                        user_id INTEGER PRIMARY KEY,
+                        current_streak INTEGER DEFAULT 0,
+                        longest_streak INTEGER DEFAULT 0,
+                        total_streaks INTEGER DEFAULT 0,
+                        last_training_date TEXT,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (user_id) REFERENCES users(user_id)
+                    )
+                ''')
+                
+                # Собранные советы: одна строка на совет, повтор отсекается уникальным ключом
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS user_tips (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        tip_type TEXT NOT NULL,
+                        tip_text TEXT,
+                        collected_at TEXT,
+                        UNIQUE (user_id, tip_type),
+                        FOREIGN KEY (user_id) REFERENCES users(user_id)
+                    )
+                ''')
+                self._migrate_collected_tips(cursor)
+                
+                # Сумма покупок поддерживается в add_payment; для старых баз считаем ее один раз
+                cursor.execute('''
+                    UPDATE users SET total_purchases = (
+                        SELECT SUM(amount) FROM payments
+                        WHERE payments.user_id = users.user_id AND status = 'completed'
+                    )
+                    WHERE COALESCE(total_purchases, 0) = 0 AND user_id IN (
+                        SELECT user_id FROM payments WHERE status = 'completed' AND amount > 0
+                    )
+                ''')
+                
                 conn.commit()
                 logger.info("База данных успешно инициализирована")
                 
@@ -125,6 +391,283 @@ class Database:
             logger.error(f"Ошибка инициализации базы данных: {e}")
             raise
     
+    def _migrate_collected_tips(self, cursor):
+        """Перенос советов из JSON-колонки users.collected_tips в таблицу user_tips"""
+        cursor.execute('''
+            SELECT user_id, collected_tips FROM users
+            WHERE collected_tips IS NOT NULL AND collected_tips NOT IN ('', '[]')
+        ''')
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        
+        tips = []
+        migrated = []
+        for user_id, collected_tips in rows:
+            try:
+                user_tips = [(user_id, tip['type'], tip.get('text'), tip.get('timestamp'))
+                             for tip in json.loads(collected_tips)]
+            except (ValueError, TypeError, KeyError) as e:
+                # Строка остается в колонке как есть - ее можно исправить вручную, миграция повторится при запуске
+                logger.error(f"Советы пользователя {user_id} не перенесены, ошибка разбора: {e}")
+                continue
+            tips.extend(user_tips)
+            migrated.append((user_id,))
+        
+        cursor.executemany('''
+            INSERT OR IGNORE INTO user_tips (user_id, tip_type, tip_text, collected_at)
+            VALUES (?, ?, ?, ?)
+        ''', tips)
+        # Очищаются только полностью разобранные строки
+        cursor.executemany("UPDATE users SET collected_tips = '[]' WHERE user_id = ?", migrated)
+        logger.info(f"Советы перенесены в user_tips: {len(tips)} для {len(migrated)} из {len(rows)} пользователей")
+    
+    def _add_missing_columns(self, cursor, table: str, columns: Dict[str, str]):
+        """Миграция: ALTER TABLE ADD COLUMN для колонок, которых нет в существующей таблице"""
+        existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+                logger.info(f"В таблицу {table} добавлена колонка {name}")
+    
+    def _init_analytics_partitions(self, cursor):
+        """Создание партиций аналитики и перенос данных из старой таблицы analytics"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analytics_seq (value INTEGER NOT NULL)
+        ''')
+        cursor.execute('''
+            INSERT INTO analytics_seq (value)
+            SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM analytics_seq)
+        ''')
+        
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = 'analytics'")
+        row = cursor.fetchone()
+        if row and row[0] == 'table':
+            # Одноразовая миграция: раскладываем события по месяцам и удаляем старую таблицу
+            cursor.execute('''
+                SELECT DISTINCT COALESCE(strftime('%Y%m', timestamp), strftime('%Y%m', 'now'))
+                FROM analytics
+            ''')
+            for (month,) in cursor.fetchall():
+                partition = f"{ANALYTICS_PARTITION_PREFIX}{month}"
+                self._create_analytics_partition(cursor, partition)
+                cursor.execute(f'''
+                    INSERT INTO {partition} (id, user_id, event_type, event_data, timestamp)
+                    SELECT id, user_id, event_type, event_data, timestamp
+                    FROM analytics
+                    WHERE COALESCE(strftime('%Y%m', timestamp), strftime('%Y%m', 'now')) = ?
+                ''', (month,))
+            cursor.execute('''
+                UPDATE analytics_seq SET value = (SELECT COALESCE(MAX(id), 0) FROM analytics)
+            ''')
+            cursor.execute('DROP TABLE analytics')
+            logger.info("Таблица analytics перенесена в помесячные партиции")
+        
+        self._ensure_current_partition(cursor)
+    
+    def _create_analytics_partition(self, cursor, partition: str):
+        """Создание партиции аналитики за месяц"""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {partition} (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER,
+                event_type TEXT,
+                event_data TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )
+        ''')
+        # Индекс для выборки событий пользователя (профили аналитики)
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{partition}_user_time
+            ON {partition} (user_id, timestamp)
+        ''')
+    
+    def _list_analytics_partitions(self, cursor) -> List[str]:
+        """Список партиций аналитики по возрастанию месяца"""
+        cursor.execute('''
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name GLOB ?
+            ORDER BY name
+        ''', (f"{ANALYTICS_PARTITION_PREFIX}[0-9][0-9][0-9][0-9][0-9][0-9]",))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _current_partition_name(self, cursor) -> str:
+        """Партиция текущего месяца (по UTC, как CURRENT_TIMESTAMP)"""
+        cursor.execute("SELECT strftime('%Y%m', 'now')")
+        return f"{ANALYTICS_PARTITION_PREFIX}{cursor.fetchone()[0]}"
+    
+    def _next_partition_name(self, cursor) -> str:
+        """Партиция следующего месяца (создается заранее, чтобы вставки после полуночи 1-го числа не ждали ротации)"""
+        cursor.execute("SELECT strftime('%Y%m', 'now', 'start of month', '+1 month')")
+        return f"{ANALYTICS_PARTITION_PREFIX}{cursor.fetchone()[0]}"
+    
+    def _ensure_current_partition(self, cursor, force: bool = False) -> bool:
+        """Создает партиции текущего и следующего месяца и включает их в триггер; True, если было изменение"""
+        current = self._current_partition_name(cursor)
+        upcoming = self._next_partition_name(cursor)
+        
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'analytics_insert'")
+        row = cursor.fetchone()
+        if not force and row and all(f"INSERT INTO {name} " in row[0] for name in (current, upcoming)):
+            return False
+        
+        self._create_analytics_partition(cursor, current)
+        self._create_analytics_partition(cursor, upcoming)
+        self._rebuild_analytics_view(cursor, current)
+        return True
+    
+    def _rebuild_analytics_view(self, cursor, current: str):
+        """Пересоздает представление analytics и триггеры записи поверх всех партиций"""
+        partitions = self._list_analytics_partitions(cursor)
+        
+        cursor.execute('DROP VIEW IF EXISTS analytics')
+        cursor.execute('CREATE VIEW analytics AS ' + ' UNION ALL '.join(
+            f"SELECT id, user_id, event_type, event_data, timestamp FROM {partition}"
+            for partition in partitions
+        ))
+        
+        # Вставка идет в партицию месяца самого события (как при миграции и bulk_load_analytics),
+        # события месяцев без партиции - в партицию текущего месяца; id - из общей последовательности
+        month = "COALESCE(strftime('%Y%m', NEW.timestamp), strftime('%Y%m', 'now'))"
+        months = [partition[len(ANALYTICS_PARTITION_PREFIX):] for partition in partitions]
+        routes = [(partition, f"{month} = '{partition_month}'")
+                  for partition, partition_month in zip(partitions, months)]
+        routes.append((current, f"{month} NOT IN ({', '.join(repr(m) for m in months)})"))
+        cursor.execute('''
+            CREATE TRIGGER analytics_insert INSTEAD OF INSERT ON analytics
+            BEGIN
+                UPDATE analytics_seq SET value = MAX(value + 1, COALESCE(NEW.id, 0));
+        ''' + ''.join(f'''
+                INSERT INTO {partition} (id, user_id, event_type, event_data, timestamp)
+                SELECT COALESCE(NEW.id, (SELECT value FROM analytics_seq)),
+                       NEW.user_id, NEW.event_type, NEW.event_data,
+                       COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)
+                WHERE {condition};
+        ''' for partition, condition in routes) + '''
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER analytics_delete INSTEAD OF DELETE ON analytics
+            BEGIN
+        ''' + ''.join(
+            f"DELETE FROM {partition} WHERE id = OLD.id;\n" for partition in partitions
+        ) + '''
+            END
+        ''')
+    
+    def ensure_analytics_partitions(self) -> bool:
+        """Создание партиции следующего месяца заранее и включение ее в триггер вставки (вызывается планировщиком)"""
+        try:
+            with self.connect() as conn:
+                changed = self._ensure_current_partition(conn.cursor())
+                conn.commit()
+            
+            if changed:
+                logger.info("Партиции аналитики текущего и следующего месяца подготовлены")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Ошибка создания партиции аналитики: {e}")
+            return False
+    
+    def get_analytics_partitions(self) -> List[str]:
+        """Список партиций аналитики"""
+        try:
+            with self.connect() as conn:
+                return self._list_analytics_partitions(conn.cursor())
+        except Exception as e:
+            logger.error(f"Ошибка получения партиций аналитики: {e}")
+            return []
+    
+    def drop_old_analytics_partitions(self, retention_days: int, archive_dir: str = None) -> List[str]:
+        """
+        Удаляет партиции аналитики целиком старше срока хранения (с точностью до месяца).
+        При archive_dir партиция перед удалением сохраняется в сжатый CSV.
+        """
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT strftime('%Y%m', 'now', ?)", (f'-{int(retention_days)} days',))
+                cutoff = f"{ANALYTICS_PARTITION_PREFIX}{cursor.fetchone()[0]}"
+                
+                # DROP TABLE вне явной транзакции фиксируется сразу: ошибка на середине должна откатить все удаления
+                cursor.execute('BEGIN')
+                dropped = []
+                expired = [p for p in self._list_analytics_partitions(cursor) if p < cutoff]
+                for partition in expired:
+                    if archive_dir:
+                        self._archive_partition(partition, archive_dir)
+                    cursor.execute(f'DROP TABLE {partition}')
+                    dropped.append(partition)
+                
+                if dropped:
+                    self._ensure_current_partition(cursor, force=True)
+                conn.commit()
+                
+                if dropped:
+                    # Возвращаем освободившиеся страницы (работает при auto_vacuum = INCREMENTAL)
+                    cursor.execute('PRAGMA incremental_vacuum').fetchall()
+            
+            if dropped:
+                logger.info(f"Удалены партиции аналитики: {', '.join(dropped)}")
+            return dropped
+            
+        except Exception as e:
+            logger.error(f"Ошибка удаления старых партиций аналитики: {e}")
+            return []
+    
+    def bulk_load_analytics(self, conn, rows, batch_size: int = 10000) -> int:
+        """
+        Массовая загрузка событий (user_id, event_type, event_data, timestamp) напрямую
+        в партиции по месяцу события, минуя триггер представления. Транзакцией управляет вызывающий.
+        """
+        cursor = conn.cursor()
+        next_id = cursor.execute('SELECT value FROM analytics_seq').fetchone()[0]
+        start_id = next_id
+        created = set(self._list_analytics_partitions(cursor))
+        buckets: Dict[str, list] = {}
+        
+        def flush(partition: str):
+            cursor.executemany(f'''
+                INSERT INTO {partition} (id, user_id, event_type, event_data, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', buckets.pop(partition))
+        
+        for user_id, event_type, event_data, timestamp in rows:
+            next_id += 1
+            partition = f"{ANALYTICS_PARTITION_PREFIX}{timestamp[:4]}{timestamp[5:7]}"
+            if partition not in created:
+                self._create_analytics_partition(cursor, partition)
+                created.add(partition)
+            bucket = buckets.setdefault(partition, [])
+            bucket.append((next_id, user_id, event_type, event_data, timestamp))
+            if len(bucket) >= batch_size:
+                flush(partition)
+        
+        for partition in list(buckets):
+            flush(partition)
+        
+        cursor.execute('UPDATE analytics_seq SET value = ?', (next_id,))
+        self._ensure_current_partition(cursor, force=True)
+        return next_id - start_id
+    
+    def _archive_partition(self, partition: str, archive_dir: str):
+        """Сохраняет партицию в сжатый CSV перед удалением"""
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_path = os.path.join(archive_dir, f"{partition}.csv.gz")
+        
+        with gzip.open(archive_path, 'wt', encoding='utf-8', newline='') as archive:
+            writer = csv.writer(archive)
+            header_written = False
+            for columns, rows in self.iter_query(f'SELECT * FROM {partition} ORDER BY id'):
+                if not header_written:
+                    writer.writerow(columns)
+                    header_written = True
+                writer.writerows(rows)
+        
+        logger.info(f"Партиция {partition} сохранена в архив: {archive_path}")
+    
     def add_user(self, user_id: int, username: str = None, first_name: str = None,
                 last_name: str = None, email: str = None, phone: str = None, timezone: str = 'Europe/Moscow',
                 referral_code: str = None, referred_by: int = None) -> bool:
@@ -148,43 +691,25 @@ class Database:
                 }
             )
 
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-
-                # Генерируем уникальный реферальный код
-                if not referral_code:
-                    referral_code = f"REF{user_id}{datetime.now().strftime('%Y%m%d')}"
-
-                cursor.execute('''
-                    INSERT OR REPLACE INTO users
-                    (user_id, username, first_name, last_name, email, phone, timezone, referral_code, referred_by)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (user_id, username, first_name, last_name, email, phone, timezone, referral_code, referred_by))
-
-                conn.commit()
-                logger.info(f"Пользователь {user_id} добавлен в базу данных")
-
-                # Проверяем, что пользователь действительно добавлен
-                cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-                result = cursor.fetchone()
-                if result:
-                    logger.info(f"Проверка: пользователь {user_id} найден в базе данных")
-                else:
-                    logger.error(f"Проверка: пользователь {user_id} НЕ найден в базе данных!")
+            with self.transaction() as uow:
+                uow.add_user(user_id, username, first_name, last_name, email, phone, timezone,
+                             referral_code, referred_by)
+            self.invalidate_dashboard_cache()
+            logger.info(f"Пользователь {user_id} добавлен в базу данных")
 
-                # Логируем производительность
-                duration = (datetime.now() - start_time).total_seconds()
-                enhanced_logger.log_performance('add_user', duration, {'user_id': user_id})
-                
-                # Логируем действие пользователя
-                enhanced_logger.log_user_action(user_id, 'user_registered', {
-                    'username': username,
-                    'first_name': first_name,
-                    'email': email,
-                    'timezone': timezone
-                })
+            # Логируем производительность
+            duration = (datetime.now() - start_time).total_seconds()
+            enhanced_logger.log_performance('add_user', duration, {'user_id': user_id})
+            
+            # Логируем действие пользователя
+            enhanced_logger.log_user_action(user_id, 'user_registered', {
+                'username': username,
+                'first_name': first_name,
+                'email': email,
+                'timezone': timezone
+            })
 
-                return True
+            return True
 
         except Exception as e:
             duration = (datetime.now() - start_time).total_seconds()
@@ -199,23 +724,8 @@ class Database:
     def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получение информации о пользователе"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-                row = cursor.fetchone()
-                
-                if row:
-                    columns = [description[0] for description in cursor.description]
-                    user_data = dict(zip(columns, row))
-                    
-                    # Конвертируем булевые поля из SQLite (1/0) в Python (True/False)
-                    boolean_fields = ['training_completed']
-                    for field in boolean_fields:
-                        if field in user_data:
-                            user_data[field] = bool(user_data[field])
-                    
-                    return user_data
-                return None
+            with self.connection() as conn:
+                return UnitOfWork(conn).get_user(user_id)
                 
         except Exception as e:
             logger.error(f"Ошибка получения пользователя {user_id}: {e}")
@@ -224,23 +734,55 @@ class Database:
     def update_user(self, user_id: int, **kwargs) -> bool:
         """Обновление информации о пользователе"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Формируем запрос обновления
-                set_clause = ', '.join([f"{key} = ?" for key in kwargs.keys()])
-                values = list(kwargs.values()) + [user_id]
+            with self.transaction() as uow:
+                uow.update_user(user_id, **kwargs)
+            if DASHBOARD_FIELDS.intersection(kwargs):
+                self.invalidate_dashboard_cache()
+            
+            logger.info(f"Пользователь {user_id} обновлен")
+            return True
                 
-                cursor.execute(f'UPDATE users SET {set_clause} WHERE user_id = ?', values)
-                conn.commit()
+        except Exception as e:
+            logger.error(f"Ошибка обновления пользователя {user_id}: {e}")
+            return False
+    
+    def increment(self, user_id: int, field: str, delta: float = 1) -> bool:
+        """Атомарное изменение счетчика пользователя одним UPDATE (без чтения строки)"""
+        try:
+            with self.transaction() as uow:
+                return uow.increment(user_id, field, delta)
                 
-                logger.info(f"Пользователь {user_id} обновлен")
-                return True
+        except Exception as e:
+            logger.error(f"Ошибка изменения счетчика {field} пользователя {user_id}: {e}")
+            return False
+    
+    def set_chat_blocked(self, user_id: int, blocked: bool, reason: str = None) -> bool:
+        """Отметка чата недоступным для доставки (или снова доступным); True - статус изменился"""
+        try:
+            with self.transaction() as uow:
+                changed = uow.set_blocked(user_id, blocked)
+                if changed:
+                    uow.add_analytics_event(user_id, 'chat_blocked' if blocked else 'chat_unblocked', reason)
+            return changed
                 
         except Exception as e:
-            logger.error(f"Ошибка обновления пользователя {user_id}: {e}")
+            logger.error(f"Ошибка изменения статуса доставки пользователя {user_id}: {e}")
             return False
     
+    def advance_user_days(self, advances: List[Tuple[int, int, int]]) -> List[int]:
+        """Перевод пользователей на следующий день одной транзакцией: список (user_id, текущий день, новый день).
+        Возвращает пользователей, которые действительно переведены"""
+        try:
+            with self.transaction() as uow:
+                advanced = [user_id for user_id, from_day, new_day in advances if uow.advance_day(user_id, from_day, new_day)]
+            if advanced:
+                self.invalidate_dashboard_cache()
+            return advanced
+                
+        except Exception as e:
+            logger.error(f"Ошибка перевода пользователей на следующий день: {e}")
+            return []
+    
     def update_user_day(self, user_id: int, day: int) -> bool:
         """Обновление дня пользователя"""
         return self.update_user(user_id, current_day=day, last_activity=datetime.now())
@@ -259,14 +801,9 @@ class Database:
     def add_scheduled_job(self, user_id: int, job_type: str, scheduled_time: datetime) -> bool:
         """Добавление задачи в планировщик"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO scheduled_jobs (user_id, job_type, scheduled_time)
-                    VALUES (?, ?, ?)
-                ''', (user_id, job_type, scheduled_time))
-                conn.commit()
-                return True
+            with self.transaction() as uow:
+                uow.add_scheduled_job(user_id, job_type, scheduled_time)
+            return True
         except Exception as e:
             logger.error(f"Ошибка добавления задачи: {e}")
             return False
@@ -274,7 +811,7 @@ class Database:
     def get_scheduled_jobs(self, user_id: int = None) -> List[Dict[str, Any]]:
         """Получение задач планировщика"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 
                 if user_id:
@@ -290,10 +827,92 @@ class Database:
             logger.error(f"Ошибка получения задач: {e}")
             return []
     
+    def get_users_with_scheduled_jobs(self) -> List[Dict[str, Any]]:
+        """Пользователи с активными задачами и их часовые пояса (один запрос для восстановления при запуске)"""
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT DISTINCT j.user_id, u.timezone
+                    FROM scheduled_jobs j JOIN users u ON u.user_id = j.user_id
+                    WHERE j.is_active = TRUE AND u.is_blocked = FALSE
+                ''')
+                return [{'user_id': row[0], 'timezone': row[1]} for row in cursor.fetchall()]
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения пользователей с задачами: {e}")
+            return []
+    
+    def get_last_events(self, event_types: List[str], since: datetime) -> Dict[Tuple[int, str], str]:
+        """Время последнего события каждого типа по пользователям начиная с since (UTC, как CURRENT_TIMESTAMP)"""
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                placeholders = ', '.join('?' for _ in event_types)
+                cursor.execute(f'''
+                    SELECT user_id, event_type, MAX(timestamp)
+                    FROM analytics
+                    WHERE event_type IN ({placeholders}) AND timestamp >= ?
+                    GROUP BY user_id, event_type
+                ''', (*event_types, since.strftime('%Y-%m-%d %H:%M:%S')))
+                return {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения последних событий: {e}")
+            return {}
+    
+    def add_pending_unlock(self, user_id: int, day: int, fire_at: float) -> bool:
+        """Сохранение таймера открытия дня (заменяет предыдущий таймер пользователя)"""
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO pending_unlocks (user_id, day, fire_at)
+                    VALUES (?, ?, ?)
+                ''', (user_id, day, fire_at))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения таймера открытия дня: {e}")
+            return False
+    
+    def get_pending_unlocks(self, until: float, since: float = None) -> List[Dict[str, Any]]:
+        """Таймеры со временем срабатывания в окне [since, until); без since - включая просроченные"""
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                if since is None:
+                    cursor.execute('''
+                        SELECT user_id, day, fire_at FROM pending_unlocks
+                        WHERE fire_at < ? ORDER BY fire_at
+                    ''', (until,))
+                else:
+                    cursor.execute('''
+                        SELECT user_id, day, fire_at FROM pending_unlocks
+                        WHERE fire_at >= ? AND fire_at < ? ORDER BY fire_at
+                    ''', (since, until))
+                return [{'user_id': row[0], 'day': row[1], 'fire_at': row[2]} for row in cursor.fetchall()]
+                
+        except Exception as e:
+            logger.error(f"Ошибка получения таймеров открытия дней: {e}")
+            return []
+    
+    def delete_pending_unlock(self, user_id: int, day: int) -> bool:
+        """Удаление сработавшего таймера; более новый таймер пользователя (другой день) не трогается"""
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM pending_unlocks WHERE user_id = ? AND day = ?', (user_id, day))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка удаления таймера открытия дня: {e}")
+            return False
+    
     def deactivate_job(self, job_id: int) -> bool:
         """Деактивация задачи"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('UPDATE scheduled_jobs SET is_active = FALSE WHERE id = ?', (job_id,))
                 conn.commit()
@@ -305,22 +924,35 @@ class Database:
     def add_analytics_event(self, user_id: int, event_type: str, event_data: str = None) -> bool:
         """Добавление события аналитики"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO analytics (user_id, event_type, event_data)
-                    VALUES (?, ?, ?)
-                ''', (user_id, event_type, event_data))
-                conn.commit()
-                return True
+            with self.transaction() as uow:
+                uow.add_analytics_event(user_id, event_type, event_data)
+            return True
         except Exception as e:
             logger.error(f"Ошибка добавления события: {e}")
             return False
     
+    def iter_query(self, query: str, params: tuple = (), batch_size: int = 1000) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """Постраничное чтение результата запроса: (колонки, строки) без загрузки всего в память"""
+        conn = self.connect()
+        try:
+            cursor = conn.execute(query, params)
+            columns = [description[0] for description in cursor.description]
+            
+            # Первая страница отдается всегда, чтобы колонки были известны и для пустой таблицы
+            rows = cursor.fetchmany(batch_size)
+            yield columns, rows
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield columns, rows
+        finally:
+            conn.close()
+    
     def get_user_stats(self, user_id: int) -> Dict[str, Any]:
         """Получение статистики пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 
                 # Основная информация о пользователе
@@ -337,31 +969,31 @@ class Database:
                 ''', (user_id,))
                 events = dict(cursor.fetchall())
                 
-                # Статистика платежей
+                # Статистика платежей: сумма покупок хранится в users.total_purchases
                 cursor.execute('''
-                    SELECT COUNT(*) as payments_count, SUM(amount) as total_amount
-                    FROM payments 
+                    SELECT COUNT(*) FROM payments 
                     WHERE user_id = ? AND status = 'completed'
                 ''', (user_id,))
-                payment_stats = cursor.fetchone()
+                payments_count = cursor.fetchone()[0]
                 
                 return {
                     'user': user,
                     'events': events,
-                    'payments_count': payment_stats[0] if payment_stats[0] else 0,
-                    'total_spent': payment_stats[1] if payment_stats[1] else 0.0
+                    'payments_count': payments_count,
+                    'total_spent': user.get('total_purchases') or 0.0
                 }
                 
         except Exception as e:
             logger.error(f"Ошибка получения статистики: {e}")
             return {}
     
-    def get_all_users(self) -> List[Dict[str, Any]]:
-        """Получение всех пользователей"""
+    def get_all_users(self, include_blocked: bool = True) -> List[Dict[str, Any]]:
+        """Получение всех пользователей (для рассылок - без недоступных чатов)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM users ORDER BY registration_date DESC')
+                where = '' if include_blocked else 'WHERE is_blocked = FALSE '
+                cursor.execute(f'SELECT * FROM users {where}ORDER BY registration_date DESC')
                 rows = cursor.fetchall()
                 columns = [description[0] for description in cursor.description]
                 return [dict(zip(columns, row)) for row in rows]
@@ -369,29 +1001,120 @@ class Database:
             logger.error(f"Ошибка получения пользователей: {e}")
             return []
     
-    def get_users_count(self) -> int:
+    def get_users_page(self, limit: int = 10, after_user_id: int = None, before_user_id: int = None,
+                       is_premium: bool = None, current_day: int = None,
+                       timezone: str = None) -> Dict[str, Any]:
+        """
+        Страница пользователей от новых к старым (keyset по registration_date, user_id).
+        Курсор - user_id последней (after) или первой (before) строки соседней страницы.
+        """
+        try:
+            conditions = []
+            params: list = []
+            if is_premium is not None:
+                conditions.append('is_premium = ?')
+                params.append(bool(is_premium))
+            if current_day is not None:
+                conditions.append('current_day = ?')
+                params.append(current_day)
+            if timezone is not None:
+                conditions.append('timezone = ?')
+                params.append(timezone)
+            
+            backward = before_user_id is not None
+            cursor_user_id = before_user_id if backward else after_user_id
+            if cursor_user_id is not None:
+                comparison = '>' if backward else '<'
+                conditions.append(f'''
+                    (registration_date, user_id) {comparison}
+                    (SELECT registration_date, user_id FROM users WHERE user_id = ?)
+                ''')
+                params.append(cursor_user_id)
+            
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            order = 'ASC' if backward else 'DESC'
+            
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                # Лишняя строка показывает, есть ли страница дальше в направлении чтения
+                cursor.execute(f'''
+                    SELECT * FROM users {where}
+                    ORDER BY registration_date {order}, user_id {order}
+                    LIMIT ?
+                ''', params + [limit + 1])
+                rows = cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+            
+            has_more = len(rows) > limit
+            users = [dict(zip(columns, row)) for row in rows[:limit]]
+            if backward:
+                users.reverse()
+            
+            has_next = has_more if not backward else True
+            has_prev = has_more if backward else after_user_id is not None
+            return {
+                'users': users,
+                'next_cursor': users[-1]['user_id'] if users and has_next else None,
+                'prev_cursor': users[0]['user_id'] if users and has_prev else None
+            }
+        
+        except Exception as e:
+            logger.error(f"Ошибка получения страницы пользователей: {e}")
+            return {'users': [], 'next_cursor': None, 'prev_cursor': None}
+    
+    def get_users_count(self, include_blocked: bool = True) -> int:
         """Получение количества пользователей"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT COUNT(*) FROM users')
+                if include_blocked:
+                    cursor.execute('SELECT COUNT(*) FROM users')
+                else:
+                    cursor.execute('SELECT COUNT(*) FROM users WHERE is_blocked = FALSE')
                 return cursor.fetchone()[0]
         except Exception as e:
             logger.error(f"Ошибка подсчета пользователей: {e}")
             return 0
     
-    def add_payment(self, user_id: int, amount: float, currency: str, 
-                   payment_type: str, status: str, transaction_id: str) -> bool:
-        """Добавление платежа"""
+    def invalidate_dashboard_cache(self):
+        """Сброс кэша счетчиков админ-панели после изменения пользователей"""
+        self._dashboard_cache = None
+    
+    def get_dashboard_counters(self) -> Dict[str, Any]:
+        """Счетчики админ-панели одним агрегатным запросом: всего, премиум, распределение по дням"""
+        if self._dashboard_cache and time.monotonic() - self._dashboard_cache_time < DASHBOARD_CACHE_TTL:
+            return self._dashboard_cache
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT INTO payments (user_id, amount, currency, payment_type, status, transaction_id)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (user_id, amount, currency, payment_type, status, transaction_id))
-                conn.commit()
-                return True
+                    SELECT current_day, COUNT(*), SUM(CASE WHEN is_premium THEN 1 ELSE 0 END)
+                    FROM users
+                    GROUP BY current_day
+                ''')
+                
+                counters = {'total': 0, 'premium': 0, 'users_by_day': {}}
+                for day, count, premium in cursor.fetchall():
+                    counters['total'] += count
+                    counters['premium'] += premium or 0
+                    counters['users_by_day'][day] = count
+                
+                self._dashboard_cache = counters
+                self._dashboard_cache_time = time.monotonic()
+                return counters
+        
+        except Exception as e:
+            logger.error(f"Ошибка получения счетчиков админ-панели: {e}")
+            return {'total': 0, 'premium': 0, 'users_by_day': {}}
+
+    def add_payment(self, user_id: int, amount: float, currency: str, 
+                   payment_type: str, status: str, transaction_id: str) -> bool:
+        """Добавление платежа (сумма покупок пользователя обновляется в той же транзакции)"""
+        try:
+            with self.transaction() as uow:
+                uow.add_payment(user_id, amount, currency, payment_type, status, transaction_id)
+            return True
         except Exception as e:
             logger.error(f"Ошибка добавления платежа: {e}")
             return False
@@ -399,7 +1122,7 @@ class Database:
     def add_review(self, user_id: int, rating: int, review_text: str) -> bool:
         """Добавление отзыва"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO reviews (user_id, rating, review_text)
@@ -414,7 +1137,7 @@ class Database:
     def get_reviews(self, approved_only: bool = True) -> List[Dict[str, Any]]:
         """Получение отзывов"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 
                 if approved_only:
@@ -445,7 +1168,7 @@ class Database:
                             clarity_rating: int, comments: str = None) -> bool:
         """Добавление оценки тренировки"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO training_feedback 
@@ -463,7 +1186,7 @@ class Database:
     def get_all_training_feedback(self) -> List[Dict[str, Any]]:
         """Получение всех оценок тренировок для админ панели"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT tf.*, u.first_name, u.username 
@@ -522,32 +1245,12 @@ class Database:
             return {}
     
     def add_tip_to_collection(self, user_id: int, tip_type: str, tip_text: str) -> bool:
-        """Добавление совета в коллекцию пользователя"""
+        """Добавление совета в коллекцию пользователя (повторный совет игнорируется)"""
         try:
-            import json
-            
-            user = self.get_user(user_id)
-            if not user:
-                return False
-            
-            # Получаем текущие советы
-            collected_tips = json.loads(user.get('collected_tips', '[]'))
-            
-            # Проверяем, нет ли уже такого совета
-            tip_exists = any(tip['type'] == tip_type for tip in collected_tips)
-            if tip_exists:
-                return True  # Совет уже есть
-            
-            # Добавляем новый совет
-            new_tip = {
-                'type': tip_type,
-                'text': tip_text,
-                'timestamp': datetime.now().isoformat()
-            }
-            collected_tips.append(new_tip)
-            
-            # Сохраняем обновленные советы
-            self.update_user(user_id, collected_tips=json.dumps(collected_tips, ensure_ascii=False))
+            with self.transaction() as uow:
+                if not uow.add_tip(user_id, tip_type, tip_text):
+                    # Совет уже есть, либо пользователя нет
+                    return uow.user_exists(user_id)
             
             logger.info(f"Совет {tip_type} добавлен в коллекцию пользователя {user_id}")
             return True
@@ -559,14 +1262,17 @@ class Database:
     def get_collected_tips(self, user_id: int) -> List[Dict[str, str]]:
         """Получение собранных советов пользователя"""
         try:
-            import json
-            
-            user = self.get_user(user_id)
-            if not user:
-                return []
-            
-            collected_tips = json.loads(user.get('collected_tips', '[]'))
-            return collected_tips
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT tip_type, tip_text, collected_at FROM user_tips
+                    WHERE user_id = ?
+                    ORDER BY id
+                ''', (user_id,))
+                return [
+                    {'type': tip_type, 'text': tip_text, 'timestamp': collected_at}
+                    for tip_type, tip_text, collected_at in cursor.fetchall()
+                ]
             
         except Exception as e:
             logger.error(f"Ошибка получения собранных советов: {e}")
@@ -575,7 +1281,10 @@ class Database:
     def clear_collected_tips(self, user_id: int) -> bool:
         """Очистка собранных советов пользователя"""
         try:
-            self.update_user(user_id, collected_tips='[]')
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM user_tips WHERE user_id = ?', (user_id,))
+                conn.commit()
             logger.info(f"Советы пользователя {user_id} очищены")
             return True
             
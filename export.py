@@ -0,0 +1,153 @@
+"""
+📤 Потоковый экспорт данных для бота DianaLisa
+Постраничное чтение таблиц и запись сжатых файлов без загрузки всей таблицы в память
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import tempfile
+from datetime import datetime
+from typing import Any, Tuple, Iterator, List
+
+from database import db
+from analytics import advanced_analytics
+
+logger = logging.getLogger(__name__)
+
+# Размер страницы при чтении из базы
+EXPORT_BATCH_SIZE = 1000
+# До этого размера файл держится в памяти, дальше сбрасывается на диск
+EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Таблицы экспорта: имя -> запрос (порядок по ключу, чтобы экспорт был стабильным)
+EXPORT_QUERIES = {
+    'users': '''
+        SELECT user_id, username, first_name, last_name, email, timezone,
+               current_day, registration_date, is_premium, total_referrals,
+               total_purchases
+        FROM users
+        ORDER BY user_id
+    ''',
+    'analytics': '''
+        SELECT id, user_id, event_type, event_data, timestamp
+        FROM analytics
+        ORDER BY id
+    ''',
+    'payments': '''
+        SELECT id, user_id, amount, currency, payment_type, status,
+               transaction_id, created_at
+        FROM payments
+        ORDER BY id
+    ''',
+    'training_feedback': '''
+        SELECT feedback_id, user_id, day, difficulty_rating, clarity_rating,
+               comments, timestamp
+        FROM training_feedback
+        ORDER BY feedback_id
+    '''
+}
+
+# Колонки вовлеченности, добавляемые к экспорту пользователей
+PROFILE_COLUMNS = ['total_events_30d', 'active_days_30d', 'engagement_score', 'longest_streak']
+
+class DataExporter:
+    """Потоковый экспорт таблиц в сжатые CSV или колоночные файлы"""
+
+    def __init__(self, database=None, analytics=None, batch_size: int = EXPORT_BATCH_SIZE):
+        self.db = database or db
+        self.analytics = analytics or advanced_analytics
+        self.batch_size = batch_size
+
+    def export_table(self, table: str, fmt: str = 'csv') -> Tuple[Any, int, str]:
+        """
+        Экспортирует таблицу в сжатый временный файл.
+        fmt='csv' - CSV в gzip, fmt='columns' - gzip JSON Lines, где каждая строка -
+        группа строк таблицы в колоночном виде {колонка: [значения]}.
+        Возвращает (файл, количество строк, имя файла).
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE, mode='w+b')
+        try:
+            with gzip.GzipFile(fileobj=spool, mode='wb') as gz:
+                text = io.TextIOWrapper(gz, encoding='utf-8', newline='')
+                if fmt == 'columns':
+                    rows_count = self._write_columns(text, self._iter_batches(table))
+                    extension = 'jsonl.gz'
+                else:
+                    rows_count = self._write_csv(text, self._iter_batches(table))
+                    extension = 'csv.gz'
+                text.flush()
+                text.detach()
+
+            spool.seek(0)
+            filename = f"{table}_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+            return spool, rows_count, filename
+
+        except Exception:
+            spool.close()
+            raise
+
+    def _iter_batches(self, table: str) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """Страницы строк таблицы; к пользователям присоединяются профили вовлеченности"""
+        batches = self.db.iter_query(EXPORT_QUERIES[table], batch_size=self.batch_size)
+        if table != 'users':
+            return batches
+        return self._join_profiles(batches)
+
+    def _join_profiles(self, batches) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """Слияние пользователей и профилей: оба потока упорядочены по user_id"""
+        profiles = self.analytics.iter_all_profiles()
+        profile_id, profile = next(profiles, (None, None))
+
+        for columns, rows in batches:
+            joined = []
+            for row in rows:
+                user_id = row[0]
+                while profile_id is not None and profile_id < user_id:
+                    profile_id, profile = next(profiles, (None, None))
+
+                if profile_id == user_id:
+                    engagement = profile['engagement']
+                    extra = (
+                        engagement['total_events'], engagement['active_days'],
+                        engagement['engagement_score'], profile['training']['longest_streak']
+                    )
+                else:
+                    extra = (0, 0, 0.0, 0)
+                joined.append(tuple(row) + extra)
+
+            yield columns + PROFILE_COLUMNS, joined
+
+    def _write_csv(self, text, batches) -> int:
+        """Запись страниц в CSV"""
+        writer = csv.writer(text)
+        rows_count = 0
+        header_written = False
+
+        for columns, rows in batches:
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            writer.writerows(rows)
+            rows_count += len(rows)
+
+        return rows_count
+
+    def _write_columns(self, text, batches) -> int:
+        """Запись страниц в колоночном виде: одна группа строк на строку файла"""
+        rows_count = 0
+
+        for columns, rows in batches:
+            if not rows:
+                continue
+            group = {column: list(values) for column, values in zip(columns, zip(*rows))}
+            text.write(json.dumps(group, ensure_ascii=False, default=str))
+            text.write('\n')
+            rows_count += len(rows)
+
+        return rows_count
+
+# Глобальный экземпляр экспорта
+data_exporter = DataExporter()
@@ -0,0 +1,236 @@
+"""
+🚦 Исходящий шлюз Bot API для бота DianaLisa
+Все запросы бота проходят через один ограничитель (rate_limiter Application):
+общее и по-чатовое ведро токенов, классы приоритета и повтор после RetryAfter.
+Чаты, куда доставка невозможна (Forbidden, chat not found), отмечаются в базе.
+
+Приоритет задается для блока кода:
+    with outbound.priority('reminder'):
+        await bot.send_message(...)
+или для одного вызова: bot.send_message(..., rate_limit_args={'priority': 'broadcast'}).
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import GATEWAY_SETTINGS
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета: чем меньше число, тем раньше запрос получает токен
+PRIORITIES = {
+    'interactive': 0,
+    'payment': 1,
+    'reminder': 2,
+    'broadcast': 3
+}
+
+_current_priority = contextvars.ContextVar('outbound_priority', default='interactive')
+
+class TokenBucket:
+    """Ведро токенов с резервированием: take возвращает, сколько ждать до своего токена"""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Время до появления токена (0 - токен есть)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        """Резервирование токена; очередь ожидающих выражается отрицательным остатком"""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class OutboundGateway(BaseRateLimiter):
+    """Класс для ограничения и приоритизации исходящих запросов бота"""
+
+    def __init__(self, settings: dict = None, database=None):
+        self.settings = {**GATEWAY_SETTINGS, **(settings or {})}
+        self.db = database or db
+        now = time.monotonic()
+        self.global_bucket = TokenBucket(self.settings['global_rate'], self.settings['global_burst'], now)
+        self.chat_buckets: "OrderedDict[Any, TokenBucket]" = OrderedDict()
+        self.queue = []  # (приоритет, порядковый номер, future) - ожидающие общий токен
+        self.sequence = itertools.count()
+        self.paused_until = 0.0
+        self.wakeup: Optional[asyncio.Event] = None
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.metrics = {name: defaultdict(float) for name in PRIORITIES}
+
+    @contextmanager
+    def priority(self, name: str):
+        """Приоритет для всех запросов внутри блока (в том числе во вложенных функциях)"""
+        token = _current_priority.set(name if name in PRIORITIES else 'interactive')
+        try:
+            yield
+        finally:
+            _current_priority.reset(token)
+
+    async def initialize(self) -> None:
+        """Запуск диспетчера очереди в event loop бота"""
+        self.wakeup = asyncio.Event()
+        self.dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def shutdown(self) -> None:
+        """Остановка диспетчера; ожидающие запросы завершаются отменой"""
+        if self.dispatcher:
+            self.dispatcher.cancel()
+            self.dispatcher = None
+        for _, _, future in self.queue:
+            if not future.done():
+                future.cancel()
+        self.queue = []
+        logger.info(f"Шлюз исходящих запросов остановлен: {self.get_stats()}")
+
+    def _chat_bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            # Группы Telegram ограничивает сильнее, чем личные чаты
+            is_group = (isinstance(chat_id, int) and chat_id < 0) or isinstance(chat_id, str)
+            rate = self.settings['group_rate'] if is_group else self.settings['chat_rate']
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate, self.settings['chat_burst'], now)
+        self.chat_buckets.move_to_end(chat_id)
+        while len(self.chat_buckets) > self.settings['max_chats']:
+            self.chat_buckets.popitem(last=False)
+        return bucket
+
+    async def _acquire(self, priority: str, chat_id):
+        """Ожидание токена чата, затем общего токена в порядке приоритета"""
+        if chat_id is not None:
+            now = time.monotonic()
+            wait = self._chat_bucket(chat_id, now).take(now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        now = time.monotonic()
+        if not self.queue and now >= self.paused_until and self.global_bucket.delay(now) == 0:
+            self.global_bucket.take(now)
+            return
+
+        if self.dispatcher is None:
+            # Ограничитель используется без Application (тесты, скрипты) - ждем токен сами
+            await asyncio.sleep(max(self.paused_until - now, self.global_bucket.take(now)))
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (PRIORITIES[priority], next(self.sequence), future))
+        self.wakeup.set()
+        await future
+
+    async def _dispatch(self):
+        """Выдача общих токенов ожидающим: всегда запросу с высшим приоритетом"""
+        while True:
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            delay = max(self.paused_until - now, self.global_bucket.delay(now))
+            if delay > 0:
+                # За время ожидания в очередь могут встать более срочные запросы
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, future = heapq.heappop(self.queue)
+            if future.done():
+                continue
+            self.global_bucket.take(now)
+            future.set_result(None)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ):
+        """Запрос проходит ведра токенов; при RetryAfter отправка останавливается и запрос повторяется"""
+        priority = (rate_limit_args or {}).get('priority') or _current_priority.get()
+        if priority not in PRIORITIES:
+            priority = 'interactive'
+        metrics = self.metrics[priority]
+        chat_id = data.get('chat_id')
+
+        for attempt in range(self.settings['max_retries'] + 1):
+            started = time.monotonic()
+            await self._acquire(priority, chat_id)
+            waited = time.monotonic() - started
+            metrics['attempts'] += 1
+            metrics['wait_total'] += waited
+            metrics['wait_max'] = max(metrics['wait_max'], waited)
+
+            try:
+                result = await callback(*args, **kwargs)
+                metrics['sent'] += 1
+                return result
+            except RetryAfter as e:
+                metrics['retry_after'] += 1
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else float(e.retry_after)
+                # Лимит превышен для всего бота - новые токены не выдаются до конца паузы
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                logger.warning(f"RetryAfter {retry_after}с на {endpoint} ({priority}), попытка {attempt + 1}")
+                if attempt == self.settings['max_retries']:
+                    metrics['failed'] += 1
+                    raise
+            except (Forbidden, BadRequest) as e:
+                metrics['failed'] += 1
+                # Бот заблокирован, аккаунт удален или чата нет - чат исключается из рассылок до /start
+                if isinstance(e, Forbidden) or 'chat not found' in str(e).lower():
+                    metrics['undeliverable'] += 1
+                    await self.mark_undeliverable(chat_id, str(e))
+                raise
+            except Exception:
+                metrics['failed'] += 1
+                raise
+
+    async def mark_undeliverable(self, chat_id, reason: str):
+        """Отметка чата пользователя в базе (группы и каналы в users не хранятся)"""
+        if not isinstance(chat_id, int) or chat_id <= 0:
+            return
+        # Запись в SQLite - в отдельном потоке: при массовой рассылке блокировки не останавливают event loop
+        if await asyncio.to_thread(self.db.set_chat_blocked, chat_id, True, reason):
+            logger.info(f"Чат {chat_id} отмечен недоступным: {reason}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики доставки по классам приоритета"""
+        stats = {}
+        for name, metrics in self.metrics.items():
+            sent = int(metrics['sent'])
+            stats[name] = {
+                'sent': sent,
+                'failed': int(metrics['failed']),
+                'retry_after': int(metrics['retry_after']),
+                'undeliverable': int(metrics['undeliverable']),
+                'avg_wait_ms': round(metrics['wait_total'] / max(metrics['attempts'], 1) * 1000, 1),
+                'max_wait_ms': round(metrics['wait_max'] * 1000, 1)
+            }
+        stats['queued'] = len(self.queue)
+        stats['paused_for'] = round(max(self.paused_until - time.monotonic(), 0.0), 1)
+        return stats
+
+# Глобальный экземпляр шлюза
+outbound = OutboundGateway()
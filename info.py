@@ -12,6 +12,7 @@ from config import MESSAGES, BUTTONS
 from keyboards import Keyboards
 keyboards = Keyboards()
 from database import db
+from content import content_registry
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,19 @@ class InfoSystem:
         self.faq_data = self.load_faq_data()
         self.course_info = self.load_course_info()
         self.support_info = self.load_support_info()
+        
+        # Тексты можно менять файлом content/info.json без перезапуска
+        content_registry.register('info', {
+            'faq': self.faq_data,
+            'course_info': self.course_info,
+            'support_info': self.support_info
+        }, self.apply_content)
+    
+    def apply_content(self, content: dict):
+        """Подмена информационных текстов из реестра контента"""
+        self.faq_data = content['faq']
+        self.course_info = content['course_info']
+        self.support_info = content['support_info']
     
     def load_faq_data(self) -> dict:
         """Загрузка данных FAQ"""
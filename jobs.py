@@ -5,7 +5,16 @@
 
 import logging
 import asyncio
+import hashlib
+import math
+import os
+import time
 from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+from collections import defaultdict
+from apscheduler.events import (
+    EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
+)
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
@@ -13,19 +22,45 @@ from apscheduler.triggers.interval import IntervalTrigger
 from pytz import timezone
 import pytz
 
-from config import SCHEDULER_SETTINGS, MESSAGES
+from config import (
+    SCHEDULER_SETTINGS, MESSAGES, ANALYTICS, BACKUP_SETTINGS, CONTENT_SETTINGS, GATEWAY_SETTINGS, SQL_TRACE_SETTINGS,
+    NOTIFICATION_SETTINGS
+)
 from database import db
+from notifications import notification_planner
 from utils import get_user_timezone
 from training import training_system
+from content import content_registry
+from unlocks import unlock_timers
+from sqltrace import sql_tracer
 
 logger = logging.getLogger(__name__)
 
+# Слоты напоминаний пользователя: (группа задач, час, метод, событие аналитики об отправке)
+REMINDER_SLOTS = (
+    ('morning', 8, 'send_morning_motivation', 'morning_motivation_sent'),
+    ('training', 18, 'send_training_reminder', 'training_reminder_sent'),
+    ('evening', 20, 'send_evening_motivation', 'evening_motivation_sent')
+)
+
 class JobScheduler:
     """Класс для управления планировщиком задач"""
     
     def __init__(self):
-        self.scheduler = AsyncIOScheduler()
+        # Опоздавшая из-за перегрузки задача выполняется в пределах misfire_grace_time, пропущенные запуски схлопываются
+        self.scheduler = AsyncIOScheduler(job_defaults={
+            'misfire_grace_time': SCHEDULER_SETTINGS['misfire_grace_time'],
+            'coalesce': SCHEDULER_SETTINGS['coalesce']
+        })
+        self.scheduler.add_listener(
+            self._on_job_event,
+            EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+        )
+        self.job_stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))  # группа задач -> счетчики
+        self._running: Dict[str, float] = {}  # id задачи -> время запуска (monotonic)
+        self.catch_up_stats: Dict[str, Any] = {}
         self.job_ids = {}  # Хранение ID задач для каждого пользователя
+        self._cron_triggers = {}  # Общие триггеры по (секунда суток, часовой пояс): CronTrigger не меняется после создания
         self._started = False
     
     def schedule_user_jobs(self, user_id: int, user_timezone: str = 'Europe/Moscow'):
@@ -34,48 +69,7 @@ class JobScheduler:
             # Удаляем старые задачи пользователя
             self.remove_user_jobs(user_id)
             
-            # Получаем часовой пояс пользователя
-            tz = timezone(user_timezone)
-            
-            # Утреннее мотивационное сообщение (8:00)
-            morning_job_id = f"morning_{user_id}"
-            self.scheduler.add_job(
-                func=self.send_morning_motivation,
-                trigger=CronTrigger(hour=8, minute=0, timezone=tz),
-                args=[user_id],
-                id=morning_job_id,
-                replace_existing=True,
-                max_instances=1
-            )
-            
-            # Вечерняя мотивация (20:00)
-            evening_job_id = f"evening_{user_id}"
-            self.scheduler.add_job(
-                func=self.send_evening_motivation,
-                trigger=CronTrigger(hour=20, minute=0, timezone=tz),
-                args=[user_id],
-                id=evening_job_id,
-                replace_existing=True,
-                max_instances=1
-            )
-            
-            # Напоминание о тренировке (18:00)
-            training_job_id = f"training_{user_id}"
-            self.scheduler.add_job(
-                func=self.send_training_reminder,
-                trigger=CronTrigger(hour=18, minute=0, timezone=tz),
-                args=[user_id],
-                id=training_job_id,
-                replace_existing=True,
-                max_instances=1
-            )
-            
-            # Сохраняем ID задач
-            self.job_ids[user_id] = {
-                'morning': morning_job_id,
-                'evening': evening_job_id,
-                'training': training_job_id
-            }
+            self.add_user_jobs(user_id, user_timezone)
             
             # Сохраняем задачи в базу данных
             db.add_scheduled_job(user_id, 'morning_motivation', datetime.now().replace(hour=8, minute=0))
@@ -87,6 +81,138 @@ class JobScheduler:
         except Exception as e:
             logger.error(f"Ошибка планирования задач для пользователя {user_id}: {e}")
     
+    def add_user_jobs(self, user_id: int, user_timezone: str = 'Europe/Moscow'):
+        """Задачи пользователя только в планировщике, без записи в базу (задачи уже сохранены)"""
+        # Утреннее мотивационное сообщение (8:00)
+        morning_job_id = f"morning_{user_id}"
+        self.scheduler.add_job(
+            func=self.send_morning_motivation,
+            trigger=self.get_cron_trigger(8, user_timezone, user_id),
+            args=[user_id],
+            id=morning_job_id,
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        # Вечерняя мотивация (20:00)
+        evening_job_id = f"evening_{user_id}"
+        self.scheduler.add_job(
+            func=self.send_evening_motivation,
+            trigger=self.get_cron_trigger(20, user_timezone, user_id),
+            args=[user_id],
+            id=evening_job_id,
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        # Напоминание о тренировке (18:00)
+        training_job_id = f"training_{user_id}"
+        self.scheduler.add_job(
+            func=self.send_training_reminder,
+            trigger=self.get_cron_trigger(18, user_timezone, user_id),
+            args=[user_id],
+            id=training_job_id,
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        # Сохраняем ID задач
+        self.job_ids[user_id] = {
+            'morning': morning_job_id,
+            'evening': evening_job_id,
+            'training': training_job_id
+        }
+    
+    def get_cron_trigger(self, hour: int, user_timezone: str, user_id: int = None) -> CronTrigger:
+        """Ежедневный триггер на заданный час в часовом поясе пользователя (со сдвигом пользователя)"""
+        seconds = (hour * 3600 + self.slot_offset(user_id, hour)) % 86400 if user_id is not None else hour * 3600
+        key = (seconds, user_timezone)
+        if key not in self._cron_triggers:
+            self._cron_triggers[key] = CronTrigger(
+                hour=seconds // 3600, minute=seconds // 60 % 60, second=seconds % 60,
+                timezone=timezone(user_timezone)
+            )
+        return self._cron_triggers[key]
+    
+    def slot_spread(self) -> int:
+        """Полуширина окна рассылки слота: не меньше настройки и достаточная, чтобы расчетное число пользователей
+        укладывалось в долю общего лимита исходящего шлюза. Зависит только от настроек: сдвиг пользователя не меняется
+        с регистрацией новых, и уже созданные триггеры совпадают с расчетом досылки пропущенных напоминаний"""
+        rate = GATEWAY_SETTINGS['global_rate'] * SCHEDULER_SETTINGS['smoothing_rate_share']
+        return max(SCHEDULER_SETTINGS['smoothing_spread'], math.ceil(SCHEDULER_SETTINGS['smoothing_capacity'] / rate / 2))
+    
+    def slot_offset(self, user_id: int, hour: int) -> int:
+        """Детерминированный сдвиг пользователя в секундах (от -spread до +spread) для слота hour.
+        Напоминания всех пользователей не срабатывают в одну секунду: нагрузка на базу и Bot API равномерна"""
+        if not SCHEDULER_SETTINGS['smoothing']:
+            return 0
+        value = int.from_bytes(hashlib.sha1(f"{user_id}:{hour}".encode()).digest()[:8], 'big')
+        if hour in SCHEDULER_SETTINGS['merge_hours']:
+            # Слот совпадает с прогрессией дней: сдвиг только вперед и внутри окна планировщика уведомлений,
+            # чтобы утренняя мотивация объединилась с сообщением о новом дне и тренировкой
+            return value % max(1, int(NOTIFICATION_SETTINGS['window'] * SCHEDULER_SETTINGS['merge_window_share']))
+        spread = self.slot_spread()
+        return value % (2 * spread + 1) - spread
+    
+    @staticmethod
+    def job_group(job_id: str) -> str:
+        """Группа задачи: morning_123 -> morning (счетчики не растут с числом пользователей)"""
+        prefix, _, suffix = job_id.rpartition('_')
+        return prefix if prefix and suffix.isdigit() else job_id
+    
+    def _on_job_event(self, event):
+        """Слушатель APScheduler: опоздание запуска, время выполнения, ошибки и пропуски по группам задач"""
+        try:
+            stats = self.job_stats[self.job_group(event.job_id)]
+            
+            if event.code == EVENT_JOB_SUBMITTED:
+                lag = (datetime.now(pytz.utc) - event.scheduled_run_times[-1]).total_seconds()
+                stats['submitted'] += 1
+                stats['lag_total'] += lag
+                stats['lag_max'] = max(stats['lag_max'], lag)
+                self._running[event.job_id] = time.monotonic()
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                # Предыдущий запуск еще не закончился - этот пропускается
+                stats['skipped'] += 1
+                logger.warning(f"Задача {event.job_id} пропущена: предыдущий запуск еще выполняется")
+            elif event.code == EVENT_JOB_MISSED:
+                stats['missed'] += 1
+                self._running.pop(event.job_id, None)
+                logger.warning(f"Задача {event.job_id} пропущена: опоздание больше misfire_grace_time")
+            else:
+                started = self._running.pop(event.job_id, None)
+                if started is not None:
+                    duration = time.monotonic() - started
+                    stats['run_total'] += duration
+                    stats['run_max'] = max(stats['run_max'], duration)
+                stats['errors' if event.code == EVENT_JOB_ERROR else 'executed'] += 1
+                
+        except Exception as e:
+            logger.error(f"Ошибка учета события планировщика: {e}")
+    
+    def get_health(self) -> Dict[str, Any]:
+        """Состояние планировщика для админ-панели"""
+        groups = {}
+        for name, stats in sorted(self.job_stats.items()):
+            finished = stats['executed'] + stats['errors']
+            groups[name] = {
+                'executed': int(stats['executed']),
+                'errors': int(stats['errors']),
+                'missed': int(stats['missed']),
+                'skipped': int(stats['skipped']),
+                'avg_lag_ms': round(stats['lag_total'] / max(stats['submitted'], 1) * 1000, 1),
+                'max_lag_ms': round(stats['lag_max'] * 1000, 1),
+                'avg_run_ms': round(stats['run_total'] / max(finished, 1) * 1000, 1),
+                'max_run_ms': round(stats['run_max'] * 1000, 1)
+            }
+        return {
+            'running': self._started,
+            'jobs': len(self.scheduler.get_jobs()) if self._started else 0,
+            'running_now': len(self._running),
+            'groups': groups,
+            'catch_up': self.catch_up_stats
+        }
+    
     def remove_user_jobs(self, user_id: int):
         """Удаление задач пользователя"""
         try:
@@ -124,7 +250,8 @@ class JobScheduler:
             keyboards = Keyboards()
             
             user = db.get_user(user_id)
-            if not user:
+            # Чат недоступен (бот заблокирован) - не тратим запрос до следующего /start
+            if not user or user.get('is_blocked'):
                 return
             
             # Выбираем случайное мотивационное сообщение
@@ -143,16 +270,13 @@ class JobScheduler:
 🎯 Помни: каждый день приближает тебя к цели!
             """
             
-            await application.bot.send_message(
-                chat_id=user_id,
-                text=message_text,
-                reply_markup=keyboards.training_menu(user['current_day'])
+            await notification_planner.notify(
+                user_id, 'morning', message_text,
+                reply_markup=keyboards.training_menu(user['current_day']),
+                event_type='morning_motivation_sent'
             )
             
-            # Добавляем событие в аналитику
-            db.add_analytics_event(user_id, 'morning_motivation_sent')
-            
-            logger.info(f"Утреннее мотивационное сообщение отправлено пользователю {user_id}")
+            logger.info(f"Утреннее мотивационное сообщение поставлено в очередь пользователю {user_id}")
             
         except Exception as e:
             logger.error(f"Ошибка отправки утреннего мотивационного сообщения: {e}")
@@ -169,7 +293,7 @@ class JobScheduler:
                 return
             
             user = db.get_user(user_id)
-            if not user:
+            if not user or user.get('is_blocked'):
                 return
             
             motivation_text = f"""
@@ -180,16 +304,14 @@ class JobScheduler:
 💪 Ты молодец! Продолжай в том же духе!
             """
             
-            await application.bot.send_message(
-                chat_id=user_id,
-                text=motivation_text,
-                reply_markup=keyboards.main_menu()
+            from keyboards import Keyboards
+            await notification_planner.notify(
+                user_id, 'evening', motivation_text,
+                reply_markup=Keyboards().main_menu(),
+                event_type='evening_motivation_sent'
             )
             
-            # Добавляем событие в аналитику
-            db.add_analytics_event(user_id, 'evening_motivation_sent')
-            
-            logger.info(f"Вечерняя мотивация отправлена пользователю {user_id}")
+            logger.info(f"Вечерняя мотивация поставлена в очередь пользователю {user_id}")
             
         except Exception as e:
             logger.error(f"Ошибка отправки вечерней мотивации: {e}")
@@ -198,7 +320,7 @@ class JobScheduler:
         """Отправка напоминания о тренировке"""
         try:
             user = db.get_user(user_id)
-            if not user:
+            if not user or user.get('is_blocked'):
                 return
             
             # Проверяем, не выполнил ли пользователь уже тренировку
@@ -278,46 +400,66 @@ class JobScheduler:
             logger.error(f"Ошибка планирования прогрессии дней: {e}")
     
     async def progress_user_days(self):
-        """Прогрессия дней курса для пользователей"""
+        """Прогрессия дней курса: набор переходов считается сразу, фиксируется одной транзакцией,
+        затем уведомления рассылаются параллельно с ограничением числа одновременных отправок"""
         try:
-            users = db.get_all_users()
-            progressed_count = 0
+            started = time.monotonic()
+            users = await asyncio.to_thread(db.get_all_users, False)
+            advances = []
             
             for user in users:
                 # Проверяем, нужно ли перевести пользователя на следующий день
                 if self.should_progress_day(user):
                     new_day = min(user['current_day'] + 1, 3)  # Максимум 3 дня для базового курса
-                    
-                    # Определяем причину перехода
-                    last_activity = datetime.fromisoformat(user['last_activity'])
-                    hours_since_activity = (datetime.now() - last_activity).total_seconds() / 3600
-                    
-                    current_hour = datetime.now().hour
-                    is_morning = 8 <= current_hour <= 12
-                    
-                    if hours_since_activity >= 24 and user.get('training_completed', False):
-                        reason = "completed"
-                    elif is_morning and hours_since_activity >= 8 and user.get('training_completed', False):
-                        reason = "morning"
-                    else:
-                        reason = "unknown"
-                    
-                    # Обновляем день и сбрасываем тренировку
-                    db.update_user(
-                        user['user_id'], 
-                        current_day=new_day,
-                        training_completed=False
-                    )
-                    progressed_count += 1
-                    
-                    # Отправляем уведомление о новом дне
-                    await self.send_new_day_notification(user['user_id'], new_day, reason)
-            
-            logger.info(f"Прогрессия дней выполнена для {progressed_count} пользователей")
+                    advances.append((user, new_day, self.progress_reason(user)))
+            
+            # Обновляем дни и сбрасываем тренировки одним COMMIT
+            advanced = set(await asyncio.to_thread(
+                db.advance_user_days, [(user['user_id'], user['current_day'], new_day) for user, new_day, _ in advances]
+            ))
+            advances = [advance for advance in advances if advance[0]['user_id'] in advanced]
+            
+            # Отправляем уведомления о новом дне параллельно
+            await self.fan_out([
+                (self.send_new_day_notification, (user['user_id'], new_day, reason, user))
+                for user, new_day, reason in advances
+            ])
+            
+            logger.info(f"Прогрессия дней выполнена для {len(advances)} пользователей за {time.monotonic() - started:.1f} с")
             
         except Exception as e:
             logger.error(f"Ошибка прогрессии дней: {e}")
     
+    async def fan_out(self, calls: List[Tuple[Callable, tuple]]):
+        """Параллельное выполнение вызовов (функция, аргументы) с ограничением одновременных;
+        ошибка одного вызова не мешает остальным"""
+        semaphore = asyncio.Semaphore(SCHEDULER_SETTINGS['fanout_concurrency'])
+        
+        async def run(func: Callable, args: tuple):
+            async with semaphore:
+                try:
+                    await func(*args)
+                except Exception as e:
+                    logger.error(f"Ошибка {func.__name__} для пользователя {args[0]}: {e}")
+        
+        async with asyncio.TaskGroup() as group:
+            for func, args in calls:
+                group.create_task(run(func, args))
+    
+    def progress_reason(self, user: dict) -> str:
+        """Причина перехода на следующий день (для текста уведомления)"""
+        last_activity = datetime.fromisoformat(user['last_activity'])
+        hours_since_activity = (datetime.now() - last_activity).total_seconds() / 3600
+        
+        current_hour = datetime.now().hour
+        is_morning = 8 <= current_hour <= 12
+        
+        if hours_since_activity >= 24 and user.get('training_completed', False):
+            return "completed"
+        elif is_morning and hours_since_activity >= 8 and user.get('training_completed', False):
+            return "morning"
+        return "unknown"
+    
     def should_progress_day(self, user: dict) -> bool:
         """Проверка, нужно ли перевести пользователя на следующий день"""
         # Переводим на следующий день, если:
@@ -347,8 +489,9 @@ class JobScheduler:
         
         return condition_1 or condition_2
     
-    async def send_new_day_notification(self, user_id: int, new_day: int, reason: str = "completed"):
-        """Отправка уведомления о новом дне и автоматическая отправка тренировки"""
+    async def send_new_day_notification(self, user_id: int, new_day: int, reason: str = "completed", user: dict = None):
+        """Отправка уведомления о новом дне и автоматическая отправка тренировки
+        (user - уже прочитанная строка пользователя, чтобы не читать ее повторно)"""
         try:
             # Получаем глобальное приложение
             import main
@@ -360,9 +503,8 @@ class JobScheduler:
             
             from keyboards import Keyboards
             keyboards = Keyboards()
-            from training import send_training_content
             
-            user = db.get_user(user_id)
+            user = user or db.get_user(user_id)
             if not user:
                 return
             
@@ -388,18 +530,16 @@ class JobScheduler:
 💪 Начнем день с пользой для здоровья!
                 """
             
-            await application.bot.send_message(
-                chat_id=user_id,
-                text=notification_text,
-                reply_markup=keyboards.main_menu()
+            await notification_planner.notify(
+                user_id, 'new_day', notification_text,
+                reply_markup=keyboards.main_menu(),
+                event_type='new_day_notification',
+                event_data=f'day_{new_day}_reason_{reason}'
             )
             
             # Автоматически отправляем тренировку нового дня
             await self.send_automatic_training(user_id, new_day)
             
-            # Добавляем событие в аналитику
-            db.add_analytics_event(user_id, 'new_day_notification', f'day_{new_day}_reason_{reason}')
-            
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления о новом дне: {e}")
     
@@ -412,15 +552,10 @@ class JobScheduler:
             if not application:
                 return
             
-            from training import TrainingSystem
-            from keyboards import Keyboards
-            keyboards = Keyboards()
             from telegram import InlineKeyboardButton, InlineKeyboardMarkup
             
-            training_manager = TrainingSystem()
-            
-            # Получаем контент тренировки
-            content = training_manager.training_content.get(day)
+            # Получаем контент тренировки (общий экземпляр: контент обновляется в нем при перезагрузке)
+            content = training_system.training_content.get(day)
             if not content:
                 logger.error(f"Контент тренировки дня {day} не найден")
                 return
@@ -459,30 +594,17 @@ class JobScheduler:
             
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            # Отправляем тренировку
-            if content['image']:
-                # Используем новую функцию для отправки изображения с текстом
-                from utils import send_image_with_text
-                await send_image_with_text(
-                    bot=application.bot,
-                    chat_id=user_id,
-                    image_path=content['image'],
-                    text=message_text,
-                    reply_markup=reply_markup,
-                    parse_mode='HTML'
-                )
-            else:
-                await application.bot.send_message(
-                    chat_id=user_id,
-                    text=message_text,
-                    reply_markup=reply_markup,
-                    parse_mode='HTML'
-                )
-            
-            # Добавляем событие в аналитику
-            db.add_analytics_event(user_id, 'training_auto_sent', f'day_{day}')
+            # Отправляем тренировку (вместе с уведомлением о новом дне, если оно еще в окне)
+            await notification_planner.notify(
+                user_id, 'training', message_text,
+                reply_markup=reply_markup,
+                parse_mode='HTML',
+                image_path=content['image'] or None,
+                event_type='training_auto_sent',
+                event_data=f'day_{day}'
+            )
             
-            logger.info(f"Автоматическая тренировка дня {day} отправлена пользователю {user_id}")
+            logger.info(f"Автоматическая тренировка дня {day} поставлена в очередь пользователю {user_id}")
             
         except Exception as e:
             logger.error(f"Ошибка автоматической отправки тренировки: {e}")
@@ -499,31 +621,80 @@ class JobScheduler:
                 max_instances=1
             )
             
+            # Ежечасная проверка партиций: партиция следующего месяца создается заранее,
+            # поэтому события после полуночи 1-го числа сразу попадают в нее
+            self.scheduler.add_job(
+                func=self.rotate_analytics_partition,
+                trigger=CronTrigger(minute=5, timezone='UTC'),
+                id='analytics_partition_rotation',
+                replace_existing=True,
+                max_instances=1
+            )
+            
             logger.info("Очистка аналитики запланирована")
             
         except Exception as e:
             logger.error(f"Ошибка планирования очистки аналитики: {e}")
     
+    async def rotate_analytics_partition(self):
+        """Подготовка партиций аналитики текущего и следующего месяца"""
+        await asyncio.to_thread(db.ensure_analytics_partitions)
+    
     async def cleanup_old_analytics(self):
         """Очистка старых данных аналитики"""
         try:
-            # Удаляем события старше 90 дней
-            cutoff_date = datetime.now() - timedelta(days=90)
+            # Удаляем партиции старше срока хранения целиком - без построчного DELETE
+            archive_dir = None
+            if ANALYTICS['archive_partitions']:
+                archive_dir = os.path.join(BACKUP_SETTINGS['directory'], 'analytics_archive')
             
-            with db.connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    'DELETE FROM analytics WHERE timestamp < ?',
-                    (cutoff_date,)
-                )
-                deleted_count = cursor.rowcount
-                conn.commit()
+            dropped = await asyncio.to_thread(
+                db.drop_old_analytics_partitions, ANALYTICS['retention_days'], archive_dir
+            )
             
-            logger.info(f"Удалено {deleted_count} старых записей аналитики")
+            logger.info(f"Удалено {len(dropped)} старых партиций аналитики")
             
         except Exception as e:
             logger.error(f"Ошибка очистки аналитики: {e}")
     
+    def schedule_streaks_rebuild(self):
+        """Планирование пересчета серий тренировок (заполнение при запуске и ежедневная сверка)"""
+        try:
+            # При первом запуске или после миграции таблица пуста - заполняем ее из истории
+            self.scheduler.add_job(
+                func=self.ensure_training_streaks,
+                trigger=DateTrigger(run_date=datetime.now(pytz.utc)),
+                id='streaks_initial_rebuild',
+                replace_existing=True,
+                misfire_grace_time=None
+            )
+            
+            # Инкрементальное обновление может разойтись с историей (часы, пропущенные события) -
+            # раз в сутки после прогрессии дней таблица пересчитывается целиком
+            self.scheduler.add_job(
+                func=self.rebuild_training_streaks,
+                trigger=CronTrigger(hour=1, minute=0, timezone='Europe/Moscow'),
+                id='streaks_rebuild',
+                replace_existing=True,
+                max_instances=1
+            )
+            
+            logger.info("Пересчет серий тренировок запланирован")
+            
+        except Exception as e:
+            logger.error(f"Ошибка планирования пересчета серий тренировок: {e}")
+    
+    async def ensure_training_streaks(self):
+        """Заполнение пустой таблицы серий тренировок (в отдельном потоке)"""
+        from analytics import advanced_analytics
+        await asyncio.to_thread(advanced_analytics.ensure_streaks)
+    
+    async def rebuild_training_streaks(self):
+        """Полный пересчет серий тренировок (в отдельном потоке)"""
+        from analytics import advanced_analytics
+        rebuilt = await asyncio.to_thread(advanced_analytics.rebuild_streaks)
+        logger.info(f"Серии тренировок пересчитаны: {rebuilt} пользователей")
+    
     def schedule_backup(self):
         """Планирование резервного копирования базы данных"""
         try:
@@ -541,16 +712,58 @@ class JobScheduler:
         except Exception as e:
             logger.error(f"Ошибка планирования резервного копирования: {e}")
     
+    def schedule_content_reload(self):
+        """Планирование проверки файлов контента (горячая перезагрузка текстов и пакетов)"""
+        try:
+            self.scheduler.add_job(
+                func=content_registry.reload,
+                trigger=IntervalTrigger(seconds=CONTENT_SETTINGS['reload_interval']),
+                id='content_reload',
+                replace_existing=True,
+                max_instances=1
+            )
+            
+            logger.info("Проверка обновлений контента запланирована")
+            
+        except Exception as e:
+            logger.error(f"Ошибка планирования проверки контента: {e}")
+    
+    def schedule_sql_trace_dump(self):
+        """Планирование записи отчета трассировки SQL в JSON"""
+        try:
+            if not SQL_TRACE_SETTINGS['enabled']:
+                return
+            
+            self.scheduler.add_job(
+                func=self.dump_sql_trace,
+                trigger=IntervalTrigger(seconds=SQL_TRACE_SETTINGS['dump_interval']),
+                id='sql_trace_dump',
+                replace_existing=True,
+                max_instances=1
+            )
+            
+            logger.info("Запись отчета трассировки SQL запланирована")
+            
+        except Exception as e:
+            logger.error(f"Ошибка планирования отчета трассировки SQL: {e}")
+    
+    async def dump_sql_trace(self):
+        """Запись отчета трассировки SQL (в отдельном потоке)"""
+        await asyncio.to_thread(sql_tracer.dump)
+    
     async def backup_database(self):
         """Резервное копирование базы данных"""
         try:
-            import shutil
-            from datetime import datetime
+            # Модуль резервного копирования нужен раз в сутки - импортируется по требованию
+            from backup import backup_manager
             
-            backup_filename = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-            shutil.copy2(db.db_path, backup_filename)
+            # Снимок, сжатие и ротация выполняются в отдельном потоке
+            backup_path = await backup_manager.run_backup()
             
-            logger.info(f"Резервная копия создана: {backup_filename}")
+            if backup_path:
+                logger.info(f"Резервная копия создана: {backup_path}")
+            else:
+                logger.error("Резервная копия не создана")
             
         except Exception as e:
             logger.error(f"Ошибка создания резервной копии: {e}")
@@ -569,35 +782,106 @@ class JobScheduler:
             self.schedule_day_progression()
             self.schedule_analytics_cleanup()
             self.schedule_backup()
+            self.schedule_streaks_rebuild()
+            self.schedule_content_reload()
+            self.schedule_sql_trace_dump()
             
-            # Восстанавливаем задачи пользователей из базы данных
-            self.restore_user_jobs()
+            # Задачи пользователей восстанавливаются разовой задачей уже после старта опроса,
+            # чтобы не задерживать обработку первых обновлений
+            self.scheduler.add_job(
+                func=self.restore_user_jobs,
+                trigger=DateTrigger(run_date=datetime.now(pytz.utc)),
+                id='restore_user_jobs',
+                replace_existing=True,
+                misfire_grace_time=None
+            )
+            
+            # Таймеры открытия следующего дня: свой цикл с колесом таймеров, записи - в pending_unlocks
+            unlock_timers.start()
             
             logger.info("Все запланированные задачи запущены")
             
         except Exception as e:
             logger.error(f"Ошибка запуска запланированных задач: {e}")
     
-    def restore_user_jobs(self):
-        """Восстановление задач пользователей из базы данных"""
+    async def restore_user_jobs(self):
+        """Восстановление задач пользователей из базы данных (пачками, с передачей управления event loop)"""
         try:
-            jobs = db.get_scheduled_jobs()
+            started = time.monotonic()
+            users = await asyncio.to_thread(db.get_users_with_scheduled_jobs)
+            batch_size = SCHEDULER_SETTINGS['restore_batch_size']
             
-            for job in jobs:
-                user_id = job['user_id']
-                user = db.get_user(user_id)
+            for start in range(0, len(users), batch_size):
+                # На паузе add_job не пересчитывает очередь планировщика после каждой задачи
+                self.scheduler.pause()
+                try:
+                    for user in users[start:start + batch_size]:
+                        try:
+                            self.add_user_jobs(user['user_id'], user['timezone'] or SCHEDULER_SETTINGS['timezone'])
+                        except Exception as e:
+                            logger.error(f"Ошибка восстановления задач пользователя {user['user_id']}: {e}")
+                finally:
+                    self.scheduler.resume()
                 
-                if user:
-                    self.schedule_user_jobs(user_id, user['timezone'])
+                # Между пачками event loop обрабатывает обновления и задачи
+                await asyncio.sleep(0)
             
-            logger.info(f"Восстановлены задачи для {len(jobs)} пользователей")
+            logger.info(f"Восстановлены задачи для {len(users)} пользователей за {time.monotonic() - started:.1f} с")
+            
+            # Напоминания, время которых прошло, пока бот не работал, досылаются, если еще уместны
+            await self.catch_up_missed(users)
             
         except Exception as e:
             logger.error(f"Ошибка восстановления задач пользователей: {e}")
     
+    def find_missed_reminders(self, users: List[Dict[str, Any]], last_sent: Dict[Tuple[int, str], str],
+                              now: datetime) -> List[Tuple[str, int]]:
+        """Пропущенные напоминания: слот сегодня уже наступил, окно уместности не истекло,
+        а события об отправке после начала окна слота нет. Возвращает список (метод, user_id)"""
+        spread = timedelta(seconds=self.slot_spread() if SCHEDULER_SETTINGS['smoothing'] else 0)
+        missed = []
+        for user in users:
+            tz = timezone(user['timezone'] or SCHEDULER_SETTINGS['timezone'])
+            local_now = now.astimezone(tz)
+            midnight = tz.localize(datetime(local_now.year, local_now.month, local_now.day))
+            
+            for name, hour, method, event_type in REMINDER_SLOTS:
+                fire_at = midnight + timedelta(seconds=hour * 3600 + self.slot_offset(user['user_id'], hour))
+                if not fire_at <= now < fire_at + timedelta(hours=SCHEDULER_SETTINGS['catch_up_hours'][name]):
+                    continue
+                sent_at = last_sent.get((user['user_id'], event_type))
+                if sent_at and pytz.utc.localize(datetime.fromisoformat(sent_at)) >= fire_at - spread:
+                    continue
+                missed.append((method, user['user_id']))
+        return missed
+    
+    async def catch_up_missed(self, users: List[Dict[str, Any]]):
+        """Досылка напоминаний, пропущенных за время остановки бота"""
+        try:
+            now = datetime.now(pytz.utc)
+            since = now - timedelta(hours=max(SCHEDULER_SETTINGS['catch_up_hours'].values()) + 1,
+                                    seconds=self.slot_spread())
+            last_sent = await asyncio.to_thread(
+                db.get_last_events, [event_type for *_, event_type in REMINDER_SLOTS], since
+            )
+            missed = self.find_missed_reminders(users, last_sent, now)
+            
+            # Рассылка идет через шлюз с приоритетом reminder, поэтому ответы пользователям не ждут
+            await self.fan_out([(getattr(self, method), (user_id,)) for method, user_id in missed])
+            
+            # Напоминания уходят через планировщик уведомлений (окно, бюджет, блокировки) - здесь известно
+            # только число поставленных в очередь; доставленные видны по событиям *_sent
+            self.catch_up_stats = {'at': now.isoformat(timespec='seconds'), 'queued': len(missed)}
+            if missed:
+                logger.info(f"Поставлено в очередь пропущенных напоминаний: {len(missed)}")
+            
+        except Exception as e:
+            logger.error(f"Ошибка досылки пропущенных напоминаний: {e}")
+    
     def shutdown(self):
         """Остановка планировщика"""
         try:
+            unlock_timers.stop()
             if self._started:
                 self.scheduler.shutdown()
                 self._started = False
@@ -130,11 +130,15 @@ class Keyboards:
                 [InlineKeyboardButton(BUTTONS['user_stats'], callback_data='admin_stats')],
                 [InlineKeyboardButton(BUTTONS['send_message'], callback_data='admin_send_message')],
                 [InlineKeyboardButton(BUTTONS['export_db'], callback_data='admin_export_db')],
+                [InlineKeyboardButton("🗜 Экспорт (колонки)", callback_data='admin_export_columns')],
                 [InlineKeyboardButton("📊 Аналитика", callback_data='admin_analytics')],
                 [InlineKeyboardButton("👥 Пользователи", callback_data='admin_users')],
                 [InlineKeyboardButton("💰 Платежи", callback_data='admin_payments')],
                 [InlineKeyboardButton("⭐ Отзывы", callback_data='admin_reviews')],
                 [InlineKeyboardButton("💪 Отзывы о тренировках", callback_data='admin_training_feedback')],
+                [InlineKeyboardButton("🔄 Обновить контент", callback_data='admin_reload_content')],
+                [InlineKeyboardButton("🕒 Планировщик", callback_data='admin_scheduler')],
+                [InlineKeyboardButton("🐢 SQL-запросы", callback_data='admin_sql_trace')],
                 [InlineKeyboardButton("🗑 Очистить и перезапустить бота", callback_data='admin_clear_db')],
                 [InlineKeyboardButton(BUTTONS['back_to_menu'], callback_data='main_menu')]
             ]
@@ -270,19 +274,30 @@ class Keyboards:
         return InlineKeyboardMarkup(keyboard)
     
     @staticmethod
-    def pagination_menu(current_page: int, total_pages: int, prefix: str) -> InlineKeyboardMarkup:
-        """Меню пагинации"""
+    def users_browser_menu(filter_key: str, prev_cursor: int = None, next_cursor: int = None,
+                           next_timezone_key: str = 'tz0') -> InlineKeyboardMarkup:
+        """Просмотр пользователей: фильтры и keyset-навигация из pagination_menu"""
+        filters = [('Все', 'all'), ('💎', 'prem'), ('Д1', 'd1'), ('Д2', 'd2'), ('Д3', 'd3'), ('🌍', next_timezone_key)]
+        keyboard = [[
+            InlineKeyboardButton(f"• {title}" if key == filter_key else title, callback_data=f'admin_users_{key}')
+            for title, key in filters
+        ]]
+        keyboard.extend(Keyboards.pagination_menu(f'admin_users_{filter_key}', prev_cursor, next_cursor).inline_keyboard)
+        return InlineKeyboardMarkup(keyboard)
+    
+    @staticmethod
+    def pagination_menu(prefix: str, prev_cursor: int = None, next_cursor: int = None) -> InlineKeyboardMarkup:
+        """Меню keyset-пагинации: курсор (id первой или последней строки страницы) передается в callback_data
+        как <prefix>_page_p<id> (назад) или <prefix>_page_n<id> (вперед)"""
         keyboard = []
         
         # Кнопки навигации
         nav_buttons = []
-        if current_page > 1:
-            nav_buttons.append(InlineKeyboardButton("⬅️", callback_data=f'{prefix}_page_{current_page-1}'))
-        
-        nav_buttons.append(InlineKeyboardButton(f"{current_page}/{total_pages}", callback_data='noop'))
+        if prev_cursor is not None:
+            nav_buttons.append(InlineKeyboardButton("⬅️", callback_data=f'{prefix}_page_p{prev_cursor}'))
         
-        if current_page < total_pages:
-            nav_buttons.append(InlineKeyboardButton("➡️", callback_data=f'{prefix}_page_{current_page+1}'))
+        if next_cursor is not None:
+            nav_buttons.append(InlineKeyboardButton("➡️", callback_data=f'{prefix}_page_n{next_cursor}'))
         
         if nav_buttons:
             keyboard.append(nav_buttons)
@@ -6,9 +6,12 @@
 import asyncio
 import logging
 import nest_asyncio
-import psutil
 import signal
 import os
+import sys
+import subprocess
+import json
+import time
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import (
@@ -17,20 +20,27 @@ from telegram.ext import (
 )
 
 # Импорты модулей
-from config import BOT_TOKEN, ADMIN_IDS
+from config import BOT_TOKEN, ADMIN_IDS, TELEGRAM_API_URL, HEARTBEAT_SETTINGS
 from logger import setup_logging, get_logger, log_user_action, log_error
 from enhanced_logger import main_logger
 from database import db
+from gateway import outbound
 from keyboards import keyboards
 from callbacks import callback_handlers
 from registration import registration_handler
 from training import training_system
-from payment import payment_system
-from admin import admin_panel
 from info import info_system
+# Слушатель событий аналитики ведет training_streaks с первого события, поэтому модуль загружается сразу;
+# админ-панель, платежи, экспорт и резервное копирование импортируются при первом обращении
+import analytics  # noqa: F401
 from utils import utils
 # from validation import error_handler  # Модуль не существует
 
+# Модули получают приложение через "import main"; при запуске скриптом модуль называется __main__,
+# и без этого import создал бы второй экземпляр модуля с пустым application
+if __name__ == '__main__':
+    sys.modules.setdefault('main', sys.modules[__name__])
+
 # Настройка логирования
 setup_logging()
 
@@ -38,6 +48,9 @@ setup_logging()
 logging.getLogger("httpx").setLevel(logging.CRITICAL)
 logging.getLogger("httpx").disabled = True
 
+# APScheduler пишет INFO на каждое добавление и запуск задачи - по три задачи на пользователя
+logging.getLogger("apscheduler").setLevel(logging.WARNING)
+
 logger = get_logger(__name__)
 
 # Поддержка Windows
@@ -53,6 +66,7 @@ class DianaLisaBot:
         self.application = None
         self.bot_token = BOT_TOKEN
         self.admin_ids = ADMIN_IDS
+        self.heartbeat_task = None
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка команды /start"""
@@ -71,6 +85,12 @@ class DianaLisaBot:
             # Проверяем, зарегистрирован ли пользователь
             existing_user = db.get_user(user_id)
             if existing_user:
+                # Пользователь снова пишет боту: чат доступен, рассылки и напоминания возобновляются
+                if existing_user.get('is_blocked') and db.set_chat_blocked(user_id, False, 'start_command'):
+                    from jobs import scheduler
+                    scheduler.add_user_jobs(user_id, existing_user.get('timezone') or 'Europe/Moscow')
+                    logger.info(f"Доставка пользователю {user_id} возобновлена после /start")
+                
                 # Проверяем, является ли пользователь админом
                 is_admin = user_id in self.admin_ids
                 
@@ -248,6 +268,7 @@ class DianaLisaBot:
         try:
             user_id = update.effective_user.id
             
+            from admin import admin_panel
             if not admin_panel.is_admin(user_id):
                 await update.message.reply_text(
                     "❌ У вас нет прав доступа к админ-панели.",
@@ -280,6 +301,7 @@ class DianaLisaBot:
             
             # Проверяем, ожидает ли бот сообщение для рассылки
             if context.user_data.get('waiting_for_broadcast'):
+                from admin import admin_panel
                 await admin_panel.process_broadcast_message(update, context)
                 context.user_data['waiting_for_broadcast'] = False
                 return
@@ -287,6 +309,7 @@ class DianaLisaBot:
             # Проверяем, ожидает ли бот сообщение для пользователя
             if context.user_data.get('waiting_for_user_message'):
                 target_user_id = context.user_data['waiting_for_user_message']
+                from admin import admin_panel
                 await admin_panel.process_user_message(update, context, target_user_id)
                 context.user_data['waiting_for_user_message'] = None
                 return
@@ -360,6 +383,7 @@ class DianaLisaBot:
     async def handle_pre_checkout(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка предварительной проверки платежа"""
         try:
+            from payment import payment_system
             await payment_system.handle_pre_checkout(update, context)
         except Exception as e:
             log_error(e, 'handle_pre_checkout')
@@ -371,6 +395,7 @@ class DianaLisaBot:
     async def handle_successful_payment(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка успешного платежа"""
         try:
+            from payment import payment_system
             await payment_system.handle_successful_payment(update, context)
         except Exception as e:
             log_error(e, 'handle_successful_payment')
@@ -409,10 +434,7 @@ class DianaLisaBot:
     async def startup(self):
         """Инициализация при запуске"""
         try:
-            # Инициализируем базу данных
-            db.init_database()
-            logger.info("База данных инициализирована")
-            
+            # База данных уже инициализирована при импорте database
             # Запускаем планировщик задач
             from jobs import scheduler
             scheduler.start_all_scheduled_jobs()
@@ -425,6 +447,43 @@ class DianaLisaBot:
             log_error(e, 'startup')
             raise
     
+    def write_heartbeat(self, status: str):
+        """Сигнал живости для bot_manager.py: статус, PID и время записи (атомарная замена файла)"""
+        heartbeat_file = HEARTBEAT_SETTINGS['file']
+        if not heartbeat_file:
+            return
+        try:
+            temp_file = f"{heartbeat_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'status': status, 'pid': os.getpid(), 'time': time.time()}, f)
+            os.replace(temp_file, heartbeat_file)
+        except Exception as e:
+            logger.error(f"Ошибка записи сигнала живости: {e}")
+    
+    async def heartbeat_loop(self):
+        """Периодический сигнал живости: пишется из event loop, поэтому зависший цикл его не обновит"""
+        while True:
+            self.write_heartbeat('ready')
+            await asyncio.sleep(HEARTBEAT_SETTINGS['interval'])
+    
+    async def post_init(self, application: Application):
+        """Хук Application после инициализации: запуск сервисов и сигнал готовности"""
+        await self.startup()
+        if HEARTBEAT_SETTINGS['file']:
+            self.heartbeat_task = asyncio.create_task(self.heartbeat_loop())
+    
+    async def post_stop(self, application: Application):
+        """Хук Application после остановки обработки: бот еще доступен, отправляем накопленные уведомления"""
+        from notifications import notification_planner
+        await notification_planner.flush_all()
+    
+    async def post_shutdown(self, application: Application):
+        """Хук Application при остановке (в том числе по SIGTERM от bot_manager.py)"""
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+        await self.shutdown()
+        self.write_heartbeat('stopped')
+    
     async def shutdown(self):
         """Очистка при завершении"""
         try:
@@ -450,21 +509,26 @@ class DianaLisaBot:
                 return
             
             # Создаем приложение
-            self.application = Application.builder().token(self.bot_token).build()
+            builder = Application.builder().token(self.bot_token)
+            if TELEGRAM_API_URL:
+                builder = builder.base_url(f"{TELEGRAM_API_URL}/bot").base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+            # Запуск и остановка сервисов через хуки жизненного цикла Application
+            builder = builder.post_init(self.post_init).post_stop(self.post_stop).post_shutdown(self.post_shutdown)
+            # Все исходящие запросы проходят через шлюз с лимитами и приоритетами
+            builder = builder.rate_limiter(outbound)
+            self.application = builder.build()
+            global application
             application = self.application  # Глобальная переменная
             
             # Настраиваем обработчики
             self.setup_handlers()
             
-            # Настраиваем обработчики запуска и завершения
-            self.application.add_handler(CommandHandler("startup", self.startup))
-            self.application.add_handler(CommandHandler("shutdown", self.shutdown))
-            
             # Запускаем бота
             logger.info("Запуск бота DianaLisa...")
             self.application.run_polling(
                 allowed_updates=Update.ALL_TYPES,
-                drop_pending_updates=True,
+                # Под супервизором накопившиеся за перезапуск обновления не сбрасываем
+                drop_pending_updates=not HEARTBEAT_SETTINGS['file'],
                 close_loop=False  # Не закрываем event loop при ошибках
             )
             
@@ -476,6 +540,8 @@ class DianaLisaBot:
 def check_and_kill_conflicting_processes():
     """Проверяет и останавливает конфликтующие процессы бота"""
     try:
+        import psutil
+        
         current_pid = os.getpid()
         killed_count = 0
         
@@ -498,7 +564,6 @@ def check_and_kill_conflicting_processes():
         if killed_count > 0:
             logger.info(f"Остановлено {killed_count} конфликтующих процессов")
             # Даем время процессам завершиться
-            import time
             time.sleep(2)
         else:
             logger.info("Конфликтующих процессов не найдено")
@@ -515,6 +580,40 @@ def setup_signal_handlers():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+def profile_startup(top: int = 15):
+    """Профиль холодного старта: python main.py --profile-startup (сводка python -X importtime)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        capture_output=True, text=True, encoding='utf-8', errors='replace',
+        env={**os.environ, 'BOT_TOKEN': BOT_TOKEN or 'profile'}
+    )
+    
+    # Строки вида "import time:   self [us] | cumulative | imported package"
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules.append((int(self_us), int(cumulative_us), name.strip()))
+    
+    if not modules:
+        print(result.stderr[-2000:])
+        return 1
+    
+    project = {os.path.splitext(f)[0] for f in os.listdir(os.path.dirname(os.path.abspath(__file__))) if f.endswith('.py')}
+    total = sum(self_us for self_us, _, _ in modules)
+    own = sum(self_us for self_us, _, name in modules if name in project)
+    print(f"Импорт main: {total / 1000:.1f} мс, модулей: {len(modules)}, из них модули бота: {own / 1000:.1f} мс")
+    
+    print("\nСамые тяжелые по полному времени (с вложенными импортами):")
+    for self_us, cumulative_us, name in sorted(modules, key=lambda m: m[1], reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} мс  {name}")
+    
+    print("\nСамые тяжелые по собственному времени:")
+    for self_us, cumulative_us, name in sorted(modules, key=lambda m: m[0], reverse=True)[:top]:
+        print(f"  {self_us / 1000:8.1f} мс  {name}")
+    return 0
+
 def main():
     """Главная функция"""
     try:
@@ -545,7 +644,6 @@ def main():
                     retry_count += 1
                     logger.warning(f"Конфликт с другим экземпляром бота. Попытка {retry_count}/{max_retries}")
                     if retry_count < max_retries:
-                        import time
                         time.sleep(5)  # Ждем 5 секунд перед повтором
                         continue
                 else:
@@ -561,4 +659,6 @@ def main():
         logger.critical("Критическая ошибка в главной функции")
 
 if __name__ == '__main__':
+    if '--profile-startup' in sys.argv:
+        sys.exit(profile_startup())
     main()
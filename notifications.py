@@ -0,0 +1,166 @@
+"""
+📬 Планировщик уведомлений бота DianaLisa
+Утром у одного пользователя совпадают прогрессия дня, утренняя мотивация и тренировка нового дня.
+Сообщения по расписанию собираются за короткое окно и уходят одним сообщением с одной клавиатурой,
+а число таких сообщений в сутки ограничено бюджетом (обязательные виды отправляются всегда).
+"""
+
+import asyncio
+import html
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+import pytz
+
+from config import NOTIFICATION_SETTINGS, SCHEDULER_SETTINGS
+from database import db
+from gateway import outbound
+from responder import responder
+
+logger = logging.getLogger(__name__)
+
+# Порядок частей в объединенном сообщении: приветствие и новости дня, затем напоминания, тренировка в конце.
+# Клавиатура берется у последней части, у которой она есть, - это самое конкретное действие
+KINDS = ('new_day', 'unlock', 'morning', 'training_reminder', 'evening', 'training')
+
+class Notification:
+    """Одна часть будущего сообщения; event_type - событие аналитики, записываемое после доставки"""
+
+    def __init__(self, kind: str, text: str, reply_markup=None, parse_mode: str = None, image_path: str = None,
+                 event_type: str = None, event_data: str = None):
+        self.kind = kind
+        self.text = text.strip()
+        self.reply_markup = reply_markup
+        self.parse_mode = parse_mode
+        self.image_path = image_path
+        self.event_type = event_type
+        self.event_data = event_data
+
+class NotificationPlanner:
+    """Класс для объединения сообщений пользователю и ограничения их числа в сутки"""
+
+    def __init__(self, settings: dict = None, database=None):
+        self.settings = {**NOTIFICATION_SETTINGS, **(settings or {})}
+        self.db = database or db
+        self.pending: Dict[int, Dict[str, Notification]] = {}  # user_id -> вид -> часть
+        self.timers: Dict[int, asyncio.TimerHandle] = {}
+        self.tasks = set()
+        self.budget_date = None
+        self.sent_today: Dict[int, int] = {}
+        self.stats = {'submitted': 0, 'messages': 0, 'merged': 0, 'over_budget': 0}
+
+    async def notify(self, user_id: int, kind: str, text: str, reply_markup=None,
+                     parse_mode: str = None, image_path: str = None,
+                     event_type: str = None, event_data: str = None):
+        """Постановка сообщения в окно пользователя; отправка - по истечении окна"""
+        self.stats['submitted'] += 1
+        parts = self.pending.setdefault(user_id, {})
+        # Повтор того же вида в окне заменяет прежний текст
+        parts[kind] = Notification(kind, text, reply_markup, parse_mode, image_path, event_type, event_data)
+
+        if user_id not in self.timers:
+            loop = asyncio.get_running_loop()
+            self.timers[user_id] = loop.call_later(self.settings['window'], self._start_flush, user_id)
+
+    def _start_flush(self, user_id: int):
+        task = asyncio.get_running_loop().create_task(self.flush(user_id))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _today(self) -> str:
+        return datetime.now(pytz.timezone(SCHEDULER_SETTINGS['timezone'])).date().isoformat()
+
+    def _remaining_budget(self, user_id: int) -> int:
+        today = self._today()
+        if today != self.budget_date:
+            self.budget_date = today
+            self.sent_today = {}
+        return self.settings['daily_budget'] - self.sent_today.get(user_id, 0)
+
+    def compose(self, parts: List[Notification]) -> Dict[str, Any]:
+        """Объединение частей: общий текст, клавиатура последней части с кнопками и изображение"""
+        parts = sorted(parts, key=lambda part: KINDS.index(part.kind) if part.kind in KINDS else len(KINDS))
+        parse_mode = 'HTML' if any(part.parse_mode for part in parts) else None
+        texts = []
+        for part in parts:
+            # Части без разметки экранируются, чтобы не сломать HTML соседних частей
+            texts.append(html.escape(part.text, quote=False) if parse_mode and not part.parse_mode else part.text)
+        text = '\n\n➖➖➖\n\n'.join(texts)
+
+        reply_markup = next((part.reply_markup for part in reversed(parts) if part.reply_markup), None)
+        image_path = next((part.image_path for part in parts if part.image_path), None)
+        if image_path and len(parts) > 1 and len(text) > 1000:
+            # Объединенный текст не помещается в подпись к фото - отправляем без изображения
+            image_path = None
+
+        return {'text': text, 'reply_markup': reply_markup, 'parse_mode': parse_mode, 'image_path': image_path}
+
+    async def flush(self, user_id: int):
+        """Отправка накопленных частей одним сообщением с учетом суточного бюджета"""
+        timer = self.timers.pop(user_id, None)
+        if timer:
+            timer.cancel()
+        parts = list(self.pending.pop(user_id, {}).values())
+        if not parts:
+            return None
+
+        try:
+            user = self.db.get_user(user_id)
+            if not user or user.get('is_blocked'):
+                return None
+
+            if self._remaining_budget(user_id) <= 0:
+                essential = [part for part in parts if part.kind in self.settings['essential']]
+                self.stats['over_budget'] += len(parts) - len(essential)
+                if len(essential) < len(parts):
+                    logger.info(f"Бюджет уведомлений пользователя {user_id} исчерпан, пропущено: "
+                                f"{[part.kind for part in parts if part not in essential]}")
+                parts = essential
+                if not parts:
+                    return None
+
+            import main
+            application = main.application
+            if not application:
+                logger.warning("Приложение не инициализировано")
+                return None
+
+            message = self.compose(parts)
+            with outbound.priority('reminder'):
+                result = await responder.send(bot=application.bot, chat_id=user_id, **message)
+
+            self.sent_today[user_id] = self.sent_today.get(user_id, 0) + 1
+            # События об отправке - только для доставленных частей (пропущенные по бюджету не учитываются)
+            await asyncio.to_thread(self._record_sent, user_id, parts)
+            self.stats['messages'] += 1
+            self.stats['merged'] += len(parts) - 1
+            if len(parts) > 1:
+                logger.info(f"Пользователю {user_id} отправлено объединенное уведомление: {[part.kind for part in parts]}")
+            return result
+
+        except Exception as e:
+            logger.error(f"Ошибка отправки уведомления пользователю {user_id}: {e}")
+            return None
+
+    def _record_sent(self, user_id: int, parts: List[Notification]):
+        """События аналитики доставленных частей одной транзакцией"""
+        try:
+            with self.db.transaction() as uow:
+                for part in parts:
+                    if part.event_type:
+                        uow.add_analytics_event(user_id, part.event_type, part.event_data)
+        except Exception as e:
+            logger.error(f"Ошибка записи событий уведомления пользователя {user_id}: {e}")
+
+    async def flush_all(self):
+        """Отправка всего накопленного без ожидания окна (при остановке бота)"""
+        for user_id in list(self.pending):
+            await self.flush(user_id)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики для диагностики"""
+        return {**self.stats, 'pending_users': len(self.pending)}
+
+# Глобальный экземпляр планировщика уведомлений
+notification_planner = NotificationPlanner()
@@ -13,6 +13,8 @@ from telegram.constants import ParseMode
 from config import PAYMENT_PROVIDER_TOKEN, CURRENCY, MESSAGES
 from keyboards import keyboards
 from database import db
+from gateway import outbound
+from content import content_registry
 
 logger = logging.getLogger(__name__)
 
@@ -89,6 +91,26 @@ class PaymentSystem:
                 ]
             }
         }
+        
+        # Цены и описания пакетов можно менять файлом content/packages.json без перезапуска
+        content_registry.register('packages', {
+            'course': self.course_packages,
+            'training': self.training_packages
+        }, self.apply_packages, normalize=self.validate_packages)
+    
+    @staticmethod
+    def validate_packages(content: dict) -> dict:
+        """Проверка пакетов из файла: у каждого должны быть название и положительная цена"""
+        for group in ('course', 'training'):
+            for package_type, package in content.get(group, {}).items():
+                if not package.get('name') or not isinstance(package.get('price'), (int, float)) or package['price'] <= 0:
+                    raise ValueError(f"некорректный пакет {group}/{package_type}")
+        return content
+    
+    def apply_packages(self, content: dict):
+        """Подмена пакетов из реестра контента"""
+        self.course_packages = content['course']
+        self.training_packages = content['training']
     
     async def create_payment_invoice(self, query, package_type: str, payment_type: str):
         """Создание инвойса для оплаты"""
@@ -126,16 +148,17 @@ class PaymentSystem:
             # Создаем инвойс
             prices = [LabeledPrice(package_info['name'], package_info['price'] * 100)]  # Цена в копейках
             
-            await query.bot.send_invoice(
-                chat_id=user_id,
-                title=package_info['name'],
-                description=description,
-                payload=transaction_id,
-                provider_token=self.payment_provider_token,
-                currency=self.currency,
-                prices=prices,
-                reply_markup=self.get_payment_keyboard(transaction_id)
-            )
+            with outbound.priority('payment'):
+                await query.get_bot().send_invoice(
+                    chat_id=user_id,
+                    title=package_info['name'],
+                    description=description,
+                    payload=transaction_id,
+                    provider_token=self.payment_provider_token,
+                    currency=self.currency,
+                    prices=prices,
+                    reply_markup=self.get_payment_keyboard(transaction_id)
+                )
             
             # Добавляем событие в аналитику
             db.add_analytics_event(user_id, 'payment_invoice_created', f"{payment_type}_{package_type}")
@@ -190,26 +213,28 @@ class PaymentSystem:
             # Определяем тип платежа и пакет
             payment_type, package_type = self.parse_transaction_id(transaction_id)
             
-            # Сохраняем платеж в базу данных
-            success = db.add_payment(
-                user_id=user_id,
-                amount=amount,
-                currency=currency,
-                payment_type=payment_type,
-                status='completed',
-                transaction_id=transaction_id
-            )
+            # Платеж, активация услуг и событие аналитики фиксируются вместе одной транзакцией
+            try:
+                with db.transaction() as uow:
+                    uow.add_payment(
+                        user_id=user_id,
+                        amount=amount,
+                        currency=currency,
+                        payment_type=payment_type,
+                        status='completed',
+                        transaction_id=transaction_id
+                    )
+                    self.activate_user_services(uow, user_id, payment_type, package_type)
+                    uow.add_analytics_event(user_id, 'payment_completed', f"{payment_type}_{package_type}")
+                success = True
+            except Exception as e:
+                logger.error(f"Ошибка сохранения платежа {transaction_id}: {e}")
+                success = False
             
             if success:
-                # Активируем услуги для пользователя
-                await self.activate_user_services(user_id, payment_type, package_type)
-                
                 # Отправляем подтверждение
                 await self.send_payment_confirmation(message, payment_type, package_type)
                 
-                # Добавляем событие в аналитику
-                db.add_analytics_event(user_id, 'payment_completed', f"{payment_type}_{package_type}")
-                
                 logger.info(f"Платеж успешно обработан: {transaction_id}")
             else:
                 await message.reply_text(
@@ -261,31 +286,20 @@ class PaymentSystem:
             logger.error(f"Ошибка парсинга ID транзакции: {e}")
             return None, None
     
-    async def activate_user_services(self, user_id: int, payment_type: str, package_type: str):
-        """Активация услуг для пользователя"""
-        try:
-            user = db.get_user(user_id)
-            if not user:
-                return
-            
-            if payment_type == 'course':
-                # Активируем премиум доступ
-                premium_expires = datetime.now() + timedelta(days=30)
-                db.update_user(user_id, 
-                             is_premium=True, 
-                             premium_expires=premium_expires)
-                
+    def activate_user_services(self, uow, user_id: int, payment_type: str, package_type: str):
+        """Активация услуг для пользователя в транзакции платежа (ошибка откатывает и сам платеж)"""
+        if payment_type == 'course':
+            # Активируем премиум доступ (если пользователя нет, UPDATE ничего не изменит)
+            premium_expires = datetime.now() + timedelta(days=30)
+            if uow.update_user(user_id, is_premium=True, premium_expires=premium_expires):
                 logger.info(f"Премиум доступ активирован для пользователя {user_id}")
-                
-            elif payment_type == 'training':
-                # Добавляем тренировки к балансу пользователя
-                training_count = self.get_training_count(package_type)
-                # Здесь можно добавить логику для отслеживания количества тренировок
-                
-                logger.info(f"Тренировки активированы для пользователя {user_id}: {training_count}")
             
-        except Exception as e:
-            logger.error(f"Ошибка активации услуг: {e}")
+        elif payment_type == 'training':
+            # Добавляем тренировки к балансу пользователя
+            training_count = self.get_training_count(package_type)
+            # Здесь можно добавить логику для отслеживания количества тренировок
+            
+            logger.info(f"Тренировки активированы для пользователя {user_id}: {training_count}")
     
     def get_training_count(self, package_type: str) -> int:
         """Получение количества тренировок в пакете"""
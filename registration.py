@@ -4,7 +4,6 @@
 """
 
 import re
-import sqlite3
 import logging
 from datetime import datetime
 from telegram import Update
@@ -15,6 +14,7 @@ from config import MESSAGES
 from keyboards import Keyboards
 from database import db
 from utils import validate_phone, get_user_timezone
+from responder import responder
 # from validation import input_validator, error_handler, ValidationError  # Модуль не существует
 
 logger = logging.getLogger(__name__)
@@ -127,20 +127,11 @@ class RegistrationHandler:
             except:
                 pass  # Игнорируем ошибки удаления
             
-            # Удаляем старое сообщение с кнопкой "Назад к регистрации"
-            try:
-                await context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=update.message.message_id - 1
-                )
-            except:
-                pass  # Игнорируем ошибки удаления
-            
             # Отправляем ошибку с картинкой
-            from utils import send_image_with_text
-            await send_image_with_text(
+            await responder.update_last(
                 bot=context.bot,
                 chat_id=update.effective_chat.id,
+                message_id=update.message.message_id - 1,
                 image_path="znakomstvo.jpg",
                 text="❌ Имя должно содержать только буквы. Цифры и специальные символы не допускаются.",
                 reply_markup=keyboards.name_input_keyboard(),
@@ -158,20 +149,11 @@ class RegistrationHandler:
             except:
                 pass  # Игнорируем ошибки удаления
             
-            # Удаляем старое сообщение с кнопкой "Назад к регистрации"
-            try:
-                await context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=update.message.message_id - 1
-                )
-            except:
-                pass  # Игнорируем ошибки удаления
-            
             # Отправляем ошибку с картинкой
-            from utils import send_image_with_text
-            await send_image_with_text(
+            await responder.update_last(
                 bot=context.bot,
                 chat_id=update.effective_chat.id,
+                message_id=update.message.message_id - 1,
                 image_path="znakomstvo.jpg",
                 text="❌ Имя слишком длинное. Максимум 50 символов.",
                 reply_markup=keyboards.name_input_keyboard(),
@@ -192,20 +174,11 @@ class RegistrationHandler:
         except:
             pass  # Игнорируем ошибки удаления
         
-        # Удаляем старое сообщение с кнопкой "Назад к регистрации"
-        try:
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=update.message.message_id - 1
-            )
-        except:
-            pass  # Игнорируем ошибки удаления
-        
         # Отправляем новое сообщение о вводе телефона с картинкой
-        from utils import send_image_with_text
-        await send_image_with_text(
+        await responder.update_last(
             bot=context.bot,
             chat_id=update.effective_chat.id,
+            message_id=update.message.message_id - 1,
             image_path="znakomstvo.jpg",
             text=MESSAGES['phone_request'],
             reply_markup=keyboards.phone_input_keyboard(),
@@ -237,20 +210,11 @@ class RegistrationHandler:
             except:
                 pass  # Игнорируем ошибки удаления
             
-            # Удаляем старое сообщение с кнопкой "Назад к регистрации"
-            try:
-                await context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=update.message.message_id - 1
-                )
-            except:
-                pass  # Игнорируем ошибки удаления
-            
             # Отправляем ошибку с картинкой
-            from utils import send_image_with_text
-            await send_image_with_text(
+            await responder.update_last(
                 bot=context.bot,
                 chat_id=update.effective_chat.id,
+                message_id=update.message.message_id - 1,
                 image_path="znakomstvo.jpg",
                 text="❌ Неверный формат номера телефона. Используйте только цифры, плюс, скобки, пробелы и дефисы. Пример: +7 (999) 123-45-67",
                 reply_markup=keyboards.phone_input_keyboard(),
@@ -269,20 +233,11 @@ class RegistrationHandler:
             except:
                 pass  # Игнорируем ошибки удаления
             
-            # Удаляем старое сообщение с кнопкой "Назад к регистрации"
-            try:
-                await context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=update.message.message_id - 1
-                )
-            except:
-                pass  # Игнорируем ошибки удаления
-            
             # Отправляем ошибку с картинкой
-            from utils import send_image_with_text
-            await send_image_with_text(
+            await responder.update_last(
                 bot=context.bot,
                 chat_id=update.effective_chat.id,
+                message_id=update.message.message_id - 1,
                 image_path="znakomstvo.jpg",
                 text="❌ Этот номер телефона уже используется. Попробуйте другой.",
                 reply_markup=keyboards.phone_input_keyboard(),
@@ -302,16 +257,7 @@ class RegistrationHandler:
         except:
             pass  # Игнорируем ошибки удаления
         
-        # Удаляем старое сообщение с кнопкой "Назад к регистрации"
-        try:
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=update.message.message_id - 1
-            )
-        except:
-            pass  # Игнорируем ошибки удаления
-        
-        # Завершаем регистрацию
+        # Завершаем регистрацию (старое сообщение с кнопкой "Назад к регистрации" заменяется там)
         await self.complete_registration(update, context, user_id)
     
     async def handle_timezone_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -371,24 +317,31 @@ class RegistrationHandler:
             logger.info(f"Завершение регистрации для пользователя {user_id}")
             logger.info(f"Состояние регистрации: {state}")
             
-            # Создаем пользователя в базе данных
-            success = db.add_user(
-                user_id=user_id,
-                username=state.get('username'),
-                first_name=state.get('name'),
-                last_name=state.get('last_name'),
-                phone=state.get('phone'),
-                timezone=state.get('timezone')
-            )
+            # Пользователь, событие аналитики и напоминания сохраняются одной транзакцией
+            timezone = state.get('timezone', 'Europe/Moscow')
+            try:
+                with db.transaction() as uow:
+                    uow.add_user(
+                        user_id=user_id,
+                        username=state.get('username'),
+                        first_name=state.get('name'),
+                        last_name=state.get('last_name'),
+                        phone=state.get('phone'),
+                        timezone=state.get('timezone')
+                    )
+                    uow.add_analytics_event(user_id, 'registration_completed')
+                    self.schedule_user_reminders(uow, user_id, timezone)
+                    
+                    # Проверяем, что пользователь действительно добавлен
+                    added_user = uow.get_user(user_id)
+                success = True
+            except Exception as e:
+                logger.error(f"Ошибка сохранения пользователя {user_id}: {e}")
+                success = False
             
             logger.info(f"Результат добавления пользователя {user_id}: {success}")
             
             if success:
-                # Добавляем событие в аналитику
-                db.add_analytics_event(user_id, 'registration_completed')
-                
-                # Проверяем, что пользователь действительно добавлен
-                added_user = db.get_user(user_id)
                 if not added_user:
                     logger.error(f"Пользователь {user_id} не найден после добавления!")
                     await self.handle_registration_error(update, "Ошибка сохранения данных")
@@ -403,27 +356,16 @@ class RegistrationHandler:
 {MESSAGES['registration_success']}
                 """
                 
-                # Удаляем старое сообщение с кнопкой "Назад к регистрации"
-                try:
-                    await context.bot.delete_message(
-                        chat_id=update.effective_chat.id,
-                        message_id=update.message.message_id - 1
-                    )
-                except:
-                    pass  # Игнорируем ошибки удаления
-                
                 # Отправляем приветственное сообщение с главным меню
-                await context.bot.send_message(
+                await responder.update_last(
+                    bot=context.bot,
                     chat_id=update.effective_chat.id,
+                    message_id=update.message.message_id - 1,
                     text=welcome_text,
                     reply_markup=keyboards.main_menu(),
                     parse_mode=ParseMode.HTML
                 )
                 
-                # Планируем напоминания
-                timezone = state.get('timezone', 'Europe/Moscow')
-                await self.schedule_user_reminders(user_id, timezone)
-                
                 logger.info(f"Пользователь {user_id} успешно зарегистрирован и получил доступ к меню")
             else:
                 await self.handle_registration_error(update, "Ошибка сохранения данных")
@@ -435,22 +377,18 @@ class RegistrationHandler:
             logger.error(f"Ошибка завершения регистрации для пользователя {user_id}: {e}")
             await self.handle_registration_error(update, "Произошла ошибка при регистрации")
     
-    async def schedule_user_reminders(self, user_id: int, timezone: str):
-        """Планирование напоминаний для пользователя"""
-        try:
-            # Простое планирование без сложной логики
-            # Утреннее напоминание (8:00)
-            morning_time = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
-            db.add_scheduled_job(user_id, 'morning_motivation', morning_time)
-            
-            # Вечернее напоминание (20:00)
-            evening_time = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0)
-            db.add_scheduled_job(user_id, 'evening_motivation', evening_time)
-            
-            logger.info(f"Напоминания запланированы для пользователя {user_id}")
-            
-        except Exception as e:
-            logger.error(f"Ошибка планирования напоминаний: {e}")
+    def schedule_user_reminders(self, uow, user_id: int, timezone: str):
+        """Планирование напоминаний для пользователя (в транзакции регистрации)"""
+        # Простое планирование без сложной логики
+        # Утреннее напоминание (8:00)
+        morning_time = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+        uow.add_scheduled_job(user_id, 'morning_motivation', morning_time)
+        
+        # Вечернее напоминание (20:00)
+        evening_time = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0)
+        uow.add_scheduled_job(user_id, 'evening_motivation', evening_time)
+        
+        logger.info(f"Напоминания запланированы для пользователя {user_id}")
     
     async def handle_registration_error(self, update: Update, error_message: str):
         """Обработка ошибок регистрации"""
@@ -481,7 +419,7 @@ class RegistrationHandler:
     def is_phone_taken(self, phone: str) -> bool:
         """Проверка, занят ли номер телефона"""
         try:
-            with sqlite3.connect(db.db_path) as conn:
+            with db.connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT user_id FROM users WHERE phone = ?', (phone,))
                 return cursor.fetchone() is not None
@@ -522,7 +460,7 @@ class RegistrationHandler:
         
         # Находим пользователя, который пригласил
         try:
-            with sqlite3.connect(db.db_path) as conn:
+            with db.connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT user_id FROM users WHERE referral_code = ?', (referral_code,))
                 referrer = cursor.fetchone()
@@ -541,7 +479,7 @@ class RegistrationHandler:
                     }
                     
                     # Увеличиваем счетчик рефералов
-                    db.update_user(referrer_id, total_referrals=db.get_user(referrer_id)['total_referrals'] + 1)
+                    db.increment(referrer_id, 'total_referrals')
                     
                     await update.message.reply_text(
                         f"🎉 Ты приглашен(а) другом! Начинаем регистрацию!\n\n{MESSAGES['name_request']}",
@@ -0,0 +1,221 @@
+"""
+✏️ Ответы бота редактированием сообщения DianaLisa
+Вместо удаления сообщения с кнопкой и отправки нового сообщение редактируется на месте:
+один вызов Bot API вместо двух, без повторной загрузки фото.
+Для каждого чата запоминается последнее сообщение бота, его тип и отпечаток содержимого,
+поэтому повторный показ того же экрана не вызывает Bot API вообще.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from telegram import InputFile, InputMediaPhoto
+from telegram.error import BadRequest, TelegramError
+
+from config import RESPONDER_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+class Responder:
+    """Класс для ответа пользователю редактированием последнего сообщения бота"""
+
+    def __init__(self, max_chats: int = None):
+        self.max_chats = max_chats or RESPONDER_SETTINGS['max_chats']
+        # chat_id -> {'message_id', 'kind', 'image_path', 'fingerprint'} последнего сообщения бота
+        self.last_messages: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.file_ids: Dict[str, str] = {}  # путь к изображению -> file_id в Telegram
+        self.stats = {'edits': 0, 'skipped': 0, 'sends': 0, 'deletes': 0, 'fallbacks': 0}
+
+    def render(self, text: str, reply_markup=None, parse_mode: str = None, image_path: str = None) -> Dict[str, Any]:
+        """Итоговое содержимое сообщения: тип, текст (подпись для фото) и отпечаток"""
+        from utils import split_long_text
+
+        if image_path and not os.path.exists(image_path):
+            logger.warning(f"Файл изображения не найден: {image_path}")
+            image_path = None
+
+        kind = 'photo' if image_path else 'text'
+        # В подпись к фото помещается только начало текста, как и в send_image_with_text
+        body = split_long_text(text)[0] if image_path else text
+        markup = json.dumps(reply_markup.to_dict(), sort_keys=True, ensure_ascii=False) if reply_markup else ''
+        fingerprint = hashlib.sha1(
+            '\x00'.join([kind, image_path or '', body, parse_mode or '', markup]).encode('utf-8')
+        ).hexdigest()
+        return {'kind': kind, 'image_path': image_path, 'body': body, 'fingerprint': fingerprint}
+
+    def remember(self, chat_id: int, message_id: int, rendered: Dict[str, Any], message=None):
+        """Запоминание последнего сообщения бота в чате и file_id загруженного фото"""
+        photo = getattr(message, 'photo', None)
+        if rendered['image_path'] and photo:
+            self.file_ids[rendered['image_path']] = photo[-1].file_id
+
+        self.last_messages[chat_id] = {
+            'message_id': message_id,
+            'kind': rendered['kind'],
+            'image_path': rendered['image_path'],
+            'fingerprint': rendered['fingerprint']
+        }
+        self.last_messages.move_to_end(chat_id)
+        while len(self.last_messages) > self.max_chats:
+            self.last_messages.popitem(last=False)
+
+    def forget(self, chat_id: int):
+        """Сообщение удалено или отправлено в обход пайплайна"""
+        self.last_messages.pop(chat_id, None)
+
+    def _photo(self, image_path: str):
+        """Уже загруженное фото отправляется по file_id, новое - файлом"""
+        file_id = self.file_ids.get(image_path)
+        if file_id:
+            return file_id
+        with open(image_path, 'rb') as photo:
+            return InputFile(photo.read(), filename=os.path.basename(image_path))
+
+    async def send(self, bot, chat_id: int, text: str, reply_markup=None,
+                   parse_mode: str = None, image_path: str = None):
+        """Отправка нового сообщения (фото с подписью или текст) с запоминанием в реестре"""
+        rendered = self.render(text, reply_markup, parse_mode, image_path)
+        message = None
+
+        if rendered['kind'] == 'photo':
+            try:
+                message = await bot.send_photo(
+                    chat_id=chat_id,
+                    photo=self._photo(rendered['image_path']),
+                    caption=rendered['body'],
+                    reply_markup=reply_markup,
+                    parse_mode=parse_mode
+                )
+                self.stats['sends'] += 1
+            except Exception as e:
+                logger.error(f"Ошибка при отправке изображения: {e}")
+                # Устаревший file_id не используем повторно, текст отправляем без изображения
+                self.file_ids.pop(rendered['image_path'], None)
+                self.stats['fallbacks'] += 1
+                rendered = self.render(text, reply_markup, parse_mode)
+
+        if message is None:
+            message = await bot.send_message(
+                chat_id=chat_id,
+                text=rendered['body'],
+                reply_markup=reply_markup,
+                parse_mode=parse_mode
+            )
+            self.stats['sends'] += 1
+
+        self.remember(chat_id, message.message_id, rendered, message)
+        return message
+
+    async def replace(self, bot, chat_id: int, message_id: int, text: str, reply_markup=None,
+                      parse_mode: str = None, image_path: str = None):
+        """Прежнее поведение: удаление сообщения и отправка нового"""
+        try:
+            await bot.delete_message(chat_id=chat_id, message_id=message_id)
+            self.stats['deletes'] += 1
+        except Exception:
+            pass
+        self.forget(chat_id)
+        return await self.send(bot, chat_id, text, reply_markup, parse_mode, image_path)
+
+    async def reply(self, bot, query, text: str, reply_markup=None,
+                    parse_mode: str = None, image_path: str = None):
+        """Ответ на нажатие кнопки: редактирование сообщения с кнопкой, если это возможно"""
+        message = query.message
+        last = self.last_messages.get(message.chat_id)
+
+        if last and last['message_id'] != message.message_id:
+            # Кнопка нажата в старом сообщении - ответ должен оказаться внизу чата
+            return await self.replace(bot, message.chat_id, message.message_id, text, reply_markup, parse_mode, image_path)
+
+        kind = 'photo' if message.photo else 'text'
+        file_id = message.photo[-1].file_id if message.photo else None
+        return await self.edit(bot, message.chat_id, message.message_id, kind, file_id,
+                               text, reply_markup, parse_mode, image_path, message)
+
+    async def update_last(self, bot, chat_id: int, message_id: int, text: str, reply_markup=None,
+                          parse_mode: str = None, image_path: str = None):
+        """Ответ на текстовый ввод: последнее сообщение бота в чате редактируется вместо удаления.
+        message_id - сообщение, которое удаляется, если в реестре чата нет (например, после перезапуска)"""
+        last = self.last_messages.get(chat_id)
+        if not last:
+            return await self.replace(bot, chat_id, message_id, text, reply_markup, parse_mode, image_path)
+        return await self.edit(bot, chat_id, last['message_id'], last['kind'], None,
+                               text, reply_markup, parse_mode, image_path)
+
+    async def edit(self, bot, chat_id: int, message_id: int, kind: str, file_id: Optional[str],
+                   text: str, reply_markup=None, parse_mode: str = None, image_path: str = None, message=None):
+        """Редактирование сообщения подходящим методом; при невозможности - удаление и отправка нового"""
+        rendered = self.render(text, reply_markup, parse_mode, image_path)
+        last = self.last_messages.get(chat_id)
+
+        if last and last['message_id'] == message_id and last['fingerprint'] == rendered['fingerprint']:
+            self.stats['skipped'] += 1
+            return message
+
+        # Текстовое сообщение нельзя превратить в фото и наоборот - только новым сообщением
+        if kind != rendered['kind']:
+            return await self.replace(bot, chat_id, message_id, text, reply_markup, parse_mode, image_path)
+
+        try:
+            if rendered['kind'] == 'text':
+                edited = await bot.edit_message_text(
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    text=rendered['body'],
+                    reply_markup=reply_markup,
+                    parse_mode=parse_mode
+                )
+            elif self._same_photo(last, file_id, rendered['image_path']):
+                edited = await bot.edit_message_caption(
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    caption=rendered['body'],
+                    reply_markup=reply_markup,
+                    parse_mode=parse_mode
+                )
+            else:
+                edited = await bot.edit_message_media(
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    media=InputMediaPhoto(
+                        media=self._photo(rendered['image_path']),
+                        caption=rendered['body'],
+                        parse_mode=parse_mode
+                    ),
+                    reply_markup=reply_markup
+                )
+            self.stats['edits'] += 1
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                # Сообщение слишком старое, удалено или не редактируется
+                logger.warning(f"Не удалось отредактировать сообщение {message_id}: {e}")
+                self.stats['fallbacks'] += 1
+                return await self.replace(bot, chat_id, message_id, text, reply_markup, parse_mode, image_path)
+            self.stats['skipped'] += 1
+            edited = message
+        except TelegramError as e:
+            logger.warning(f"Не удалось отредактировать сообщение {message_id}: {e}")
+            self.stats['fallbacks'] += 1
+            return await self.replace(bot, chat_id, message_id, text, reply_markup, parse_mode, image_path)
+
+        # edit_* возвращает True для inline-сообщений - тогда file_id взять неоткуда
+        self.remember(chat_id, message_id, rendered, edited)
+        return edited
+
+    def _same_photo(self, last: Optional[Dict[str, Any]], file_id: Optional[str], image_path: str) -> bool:
+        """В сообщении уже это изображение: достаточно заменить подпись"""
+        if last:
+            return last['image_path'] == image_path
+        # После перезапуска реестр пуст - сравниваем с file_id загруженного фото
+        return bool(file_id and self.file_ids.get(image_path) == file_id)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики вызовов Bot API для диагностики"""
+        return {**self.stats, 'chats': len(self.last_messages), 'cached_photos': len(self.file_ids)}
+
+# Глобальный экземпляр пайплайна ответов
+responder = Responder()
@@ -0,0 +1,302 @@
+"""
+🐢 Трассировка SQL-запросов бота DianaLisa
+Каждое соединение Database получает set_trace_callback: видны все выполняемые SQLite операторы,
+включая неявные BEGIN/COMMIT модуля sqlite3 и COMMIT при выходе из with conn.
+Оператор длится от своего trace-события до следующего или до конца вызова execute/fetch/commit.
+Запросы группируются по отпечатку (текст без литералов): число, суммарное время, p95 по кольцевому буферу.
+Медленные запросы сохраняются вместе с EXPLAIN QUERY PLAN - по нему видно полное сканирование (SCAN).
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import SQL_TRACE_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_PLACEHOLDERS = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACES = re.compile(r"\s+")
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+def normalize_sql(statement: str) -> str:
+    """Текст запроса без литералов и лишних пробелов: одинаковые запросы с разными значениями совпадают"""
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _PLACEHOLDERS.sub('?, ...', statement)
+    return _SPACES.sub(' ', statement).strip()
+
+class TracedCursor(sqlite3.Cursor):
+    """Курсор, у которого время чтения строк добавляется к оператору последнего execute"""
+
+    def execute(self, sql, parameters=()):
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.entry = self.connection._finish_call()
+
+    def executemany(self, sql, seq_of_parameters):
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.entry = self.connection._finish_call()
+
+    def _timed_fetch(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self.connection._extend(getattr(self, 'entry', None), time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+class TracedConnection(sqlite3.Connection):
+    """Соединение с трассировкой операторов через set_trace_callback"""
+
+    tracer: "SQLTracer" = None
+
+    def _start_tracing(self, tracer: "SQLTracer"):
+        self.tracer = tracer
+        self._open = None  # (выполняемый оператор, время начала)
+        self._pending_slow: List[Dict[str, Any]] = []
+        self._explaining = False
+        self.set_trace_callback(self._on_trace)
+
+    def _on_trace(self, statement: str):
+        # Внутри callback нельзя выполнять запросы на этом соединении - только учет времени
+        if self._explaining:
+            return
+        now = time.perf_counter()
+        if self._open and self._open[0] == statement:
+            # Триггеры (вставка в представление analytics) повторяют trace того же оператора
+            return
+        self._close(now)
+        self._open = (statement, now)
+
+    def _close(self, now: float) -> Optional[Dict[str, Any]]:
+        if not self._open:
+            return None
+        statement, started = self._open
+        self._open = None
+        entry = self.tracer.record(statement, now - started)
+        if entry['slow']:
+            self._pending_slow.append(entry['slow'])
+        return entry
+
+    def _finish_call(self) -> Optional[Dict[str, Any]]:
+        """Конец вызова execute/commit: оператор закрыт, медленные запросы получают план"""
+        entry = self._close(time.perf_counter())
+        pending, self._pending_slow = self._pending_slow, []
+        for slow in pending:
+            self._explain(slow)
+        return entry
+
+    def _extend(self, entry: Optional[Dict[str, Any]], duration: float):
+        if entry is not None:
+            slow = self.tracer.extend(entry, duration)
+            if slow:
+                self._explain(slow)
+
+    def _explain(self, slow: Dict[str, Any]):
+        statement = slow.pop('statement', None)
+        if not statement or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return
+        self._explaining = True
+        try:
+            rows = sqlite3.Connection.execute(self, f"EXPLAIN QUERY PLAN {statement}").fetchall()
+            slow['plan'] = [row[-1] for row in rows]
+        except sqlite3.Error as e:
+            slow['plan'] = [f"не удалось получить план: {e}"]
+        finally:
+            self._explaining = False
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TracedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._finish_call()
+
+    def commit(self):
+        try:
+            return super().commit()
+        finally:
+            self._finish_call()
+
+    def rollback(self):
+        try:
+            return super().rollback()
+        finally:
+            self._finish_call()
+
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            self._finish_call()
+
+class SQLTracer:
+    """Класс для сбора статистики SQL-запросов по отпечаткам"""
+
+    def __init__(self, settings: dict = None):
+        self.settings = {**SQL_TRACE_SETTINGS, **(settings or {})}
+        self.lock = threading.Lock()  # Запросы выполняются и в потоках asyncio.to_thread
+        self.fingerprints: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.slow_queries = deque(maxlen=self.settings['slow_log_size'])
+        self.started_at = datetime.now()
+
+    def connect(self, path: str, **kwargs) -> sqlite3.Connection:
+        """sqlite3.connect с трассировкой (если она включена)"""
+        if not self.settings['enabled']:
+            return sqlite3.connect(path, **kwargs)
+        conn = sqlite3.connect(path, factory=TracedConnection, **kwargs)
+        conn._start_tracing(self)
+        return conn
+
+    @staticmethod
+    def fingerprint(sql: str) -> str:
+        return hashlib.sha1(sql.encode('utf-8')).hexdigest()[:12]
+
+    def record(self, statement: str, duration: float) -> Dict[str, Any]:
+        """Учет выполнения оператора; для медленного возвращается запись журнала (план добавит соединение)"""
+        sql = normalize_sql(statement)
+        key = self.fingerprint(sql)
+        with self.lock:
+            stats = self.fingerprints.get(key)
+            if stats is None:
+                stats = self.fingerprints[key] = {
+                    'sql': sql, 'count': 0, 'total': 0.0, 'max': 0.0, 'slow': 0,
+                    'samples': deque(maxlen=self.settings['samples'])
+                }
+            self.fingerprints.move_to_end(key)
+            while len(self.fingerprints) > self.settings['max_fingerprints']:
+                self.fingerprints.popitem(last=False)
+
+            sample = [duration]
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+            stats['samples'].append(sample)
+
+        entry = {'key': key, 'sample': sample, 'statement': statement, 'slow': None}
+        entry['slow'] = self._check_slow(entry, stats)
+        return entry
+
+    def extend(self, entry: Dict[str, Any], duration: float) -> Optional[Dict[str, Any]]:
+        """Чтение строк после execute - часть времени того же оператора"""
+        with self.lock:
+            stats = self.fingerprints.get(entry['key'])
+            entry['sample'][0] += duration
+            if stats is not None:
+                stats['total'] += duration
+                stats['max'] = max(stats['max'], entry['sample'][0])
+        if entry['slow'] is not None:
+            entry['slow']['ms'] = round(entry['sample'][0] * 1000, 2)
+            return None
+        entry['slow'] = self._check_slow(entry, stats)
+        return entry['slow']
+
+    def _check_slow(self, entry: Dict[str, Any], stats: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        duration = entry['sample'][0]
+        if duration * 1000 < self.settings['slow_ms'] or stats is None:
+            return None
+        slow = {
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'fingerprint': entry['key'],
+            'sql': stats['sql'],
+            'ms': round(duration * 1000, 2),
+            'statement': entry['statement']  # Для EXPLAIN; в журнал не попадает (там значения пользователей)
+        }
+        with self.lock:
+            stats['slow'] += 1
+            self.slow_queries.append(slow)
+        logger.warning(f"Медленный SQL ({slow['ms']} мс): {stats['sql'][:200]}")
+        return slow
+
+    @staticmethod
+    def _percentile(values: List[float], percent: float) -> float:
+        if not values:
+            return 0.0
+        values = sorted(values)
+        return values[min(len(values) - 1, math.ceil(percent / 100 * len(values)) - 1)]
+
+    def get_report(self, limit: int = None) -> Dict[str, Any]:
+        """Запросы по убыванию суммарного времени и журнал медленных запросов"""
+        with self.lock:
+            items = [(key, dict(stats), [sample[0] for sample in stats['samples']])
+                     for key, stats in self.fingerprints.items()]
+            slow = [{k: v for k, v in item.items() if k != 'statement'} for item in self.slow_queries]
+
+        queries = []
+        for key, stats, samples in items:
+            queries.append({
+                'fingerprint': key,
+                'sql': stats['sql'],
+                'count': stats['count'],
+                'total_ms': round(stats['total'] * 1000, 2),
+                'avg_ms': round(stats['total'] / max(stats['count'], 1) * 1000, 3),
+                'p95_ms': round(self._percentile(samples, 95) * 1000, 3),
+                'max_ms': round(stats['max'] * 1000, 3),
+                'slow': stats['slow']
+            })
+        queries.sort(key=lambda item: item['total_ms'], reverse=True)
+
+        return {
+            'since': self.started_at.isoformat(timespec='seconds'),
+            'slow_ms': self.settings['slow_ms'],
+            'queries': queries[:limit] if limit else queries,
+            'slow_queries': slow,
+            'full_scans': sorted({item['fingerprint'] for item in slow
+                                  if any(step.startswith('SCAN') for step in item.get('plan', []))})
+        }
+
+    def dump(self, path: str = None) -> Optional[str]:
+        """Запись отчета в JSON (периодически из планировщика)"""
+        path = path or self.settings['dump_path']
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            report = self.get_report()
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+            return path
+        except Exception as e:
+            logger.error(f"Ошибка записи отчета SQL: {e}")
+            return None
+
+    def reset(self):
+        """Сброс накопленной статистики"""
+        with self.lock:
+            self.fingerprints.clear()
+            self.slow_queries.clear()
+            self.started_at = datetime.now()
+
+# Глобальный экземпляр трассировки SQL
+sql_tracer = SQLTracer()
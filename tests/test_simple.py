@@ -238,6 +238,917 @@ class TestDianaLisaBotIntegration:
         print(f"OK: Получено {len(users)} пользователей за {duration:.2f} секунд")
         assert duration < 1.0, f"Получение пользователей заняло слишком много времени: {duration:.2f}с"
 
+    def test_user_profile_cache(self, clean_db):
+        """Тест профиля вовлеченности: один проход, кэш и инвалидация"""
+        print("\nТестирование профиля вовлеченности...")
+        
+        from analytics import AdvancedAnalytics
+        
+        db = clean_db
+        analytics = AdvancedAnalytics(db)
+        db.add_user(user_id=7001, username='profile', first_name='Профиль', email='profile@test.com')
+        db.add_analytics_event(7001, 'button_click', 'menu')
+        db.add_analytics_event(7001, 'training_completed', 'day_1')
+        
+        metrics = analytics.get_user_engagement_metrics(7001)
+        assert metrics['total_events'] == 2, "Неверное количество событий"
+        assert metrics['event_types'] == {'button_click': 1, 'training_completed': 1}
+        assert analytics.get_training_analytics(7001)['current_streak'] == 1
+        
+        # Новое событие сбрасывает кэш профиля
+        db.add_analytics_event(7001, 'button_click', 'menu')
+        assert analytics.get_user_engagement_metrics(7001)['total_events'] == 3, "Кэш не сброшен"
+        
+        # Пакетный режим совпадает с поштучным
+        profiles = analytics.build_all_profiles()
+        assert profiles[7001]['engagement']['total_events'] == 3
+        
+        # Размер кэша ограничен: вытесняется самый давно использованный профиль
+        db.add_user(user_id=7002, username='profile2', first_name='Профиль')
+        with patch('analytics.PROFILE_CACHE_SIZE', 1):
+            analytics.get_user_profile(7001, 7)
+            analytics.get_user_profile(7002, 7)
+        assert list(analytics._profile_cache) == [(7002, 7)]
+
+        # close() отписывает экземпляр: временные экземпляры не копятся в слушателях общей базы
+        listeners = len(db._event_listeners)
+        second = AdvancedAnalytics(db)
+        assert len(db._event_listeners) == listeners + 2
+        second.close()
+        analytics.close()
+        assert len(db._event_listeners) == listeners - 2, "Слушатели не сняты"
+        print("OK: Профиль вовлеченности строится и кэшируется корректно")
+
+    def test_training_streaks(self, clean_db):
+        """Тест серий тренировок: gaps-and-islands, инкрементальное обновление совпадает с пересчетом"""
+        print("\nТестирование серий тренировок...")
+
+        from analytics import AdvancedAnalytics
+
+        db = clean_db
+        analytics = AdvancedAnalytics(db)
+        for user_id, name in ((7101, 'Серия'), (7102, 'Пропуск'), (7103, 'Новичок')):
+            db.add_user(user_id=user_id, username=f'streak{user_id}', first_name=name)
+
+        def snapshot():
+            with sqlite3.connect(db.db_path) as conn:
+                return conn.execute('''
+                    SELECT user_id, current_streak, longest_streak, total_streaks, last_training_date
+                    FROM training_streaks ORDER BY user_id
+                ''').fetchall()
+
+        # История без слушателей: серия 3 дня, пропуск, вчера; у второго пользователя - одна давняя тренировка
+        with sqlite3.connect(db.db_path) as conn:
+            conn.execute("DELETE FROM training_streaks")
+            conn.executemany('''
+                INSERT INTO analytics (user_id, event_type, event_data, timestamp)
+                VALUES (?, 'training_completed', 'day', DATETIME('now', ?))
+            ''', [(7101, '-6 day'), (7101, '-5 day'), (7101, '-5 day'), (7101, '-4 day'),
+                  (7101, '-1 day'), (7102, '-10 day')])
+            conn.execute("INSERT INTO analytics (user_id, event_type) VALUES (7102, 'button_click')")
+
+        streaks = analytics.compute_all_streaks()
+        assert streaks[7101] == {'current': 1, 'longest': 3, 'total': 1}
+        assert streaks[7102] == {'current': 0, 'longest': 1, 'total': 0}
+
+        # Пустая таблица заполняется из истории один раз
+        assert analytics.ensure_streaks() == 2
+        assert analytics.ensure_streaks() == 0
+
+        # Сегодняшние тренировки обновляют таблицу инкрементально - результат совпадает с полным пересчетом
+        db.add_analytics_event(7101, 'training_completed', 'day_5')
+        db.add_analytics_event(7101, 'training_completed', 'day_5')
+        db.add_analytics_event(7103, 'training_completed', 'day_1')
+        incremental = snapshot()
+        assert analytics.rebuild_streaks() == 3
+        assert snapshot() == incremental
+        assert [row[1:4] for row in incremental] == [(2, 3, 2), (1, 1, 0), (1, 1, 0)]
+
+        leaderboard = analytics.get_streak_leaderboard(limit=2)
+        assert [(item['user_id'], item['current_streak']) for item in leaderboard] == [(7101, 2), (7103, 1)]
+        assert leaderboard[0]['first_name'] == 'Серия' and leaderboard[0]['longest_streak'] == 3
+        analytics.close()
+        print("OK: Серии тренировок рассчитываются корректно")
+
+    def test_unlock_timers(self, clean_db):
+        """Тест таймеров открытия дня: колесо, окно в памяти и восстановление из базы"""
+        print("\nТестирование таймеров открытия дней...")
+
+        import random
+        from unlocks import TimingWheel, UnlockTimers
+
+        # Колесо выдает каждый таймер ровно один раз и не раньше срока
+        start = 1_000_000.0
+        wheel = TimingWheel(1.0, (8, 8, 8), start)
+        fire_times = [start + random.uniform(-5, 1500) for _ in range(500)]
+        for fire_at in fire_times:
+            wheel.add(fire_at, fire_at)
+        fired = []
+        now = start
+        while now < start + 1600:
+            now += random.choice([1, 3, 70])
+            for fire_at in wheel.advance(now):
+                assert fire_at <= now, "Таймер сработал раньше срока"
+                fired.append(fire_at)
+        assert sorted(fired) == sorted(fire_times)
+        assert len(wheel) == 0
+
+        # Таймеры в базе, в памяти - только ближайшее окно; новый экземпляр (перезапуск) их подхватывает
+        db = clean_db
+        with sqlite3.connect(db.db_path) as conn:
+            conn.execute("DELETE FROM pending_unlocks")
+        now = datetime.now().timestamp()
+        timers = UnlockTimers(db)
+        timers.schedule(8001, 2, now - 10)
+        timers.schedule(8002, 3, now + 86400)
+
+        restarted = UnlockTimers(db)
+        opened = []
+        async def fire(user_id, day):
+            opened.append((user_id, day))
+            db.delete_pending_unlock(user_id, day)
+        restarted.fire = fire
+        asyncio.run(restarted.process(now))
+
+        assert opened == [(8001, 2)], "Просроченный таймер не сработал после перезапуска"
+        assert 8002 not in restarted.entries, "Таймер вне окна загружен в память"
+        assert [row['user_id'] for row in db.get_pending_unlocks(now + 2 * 86400)] == [8002]
+
+        # Неудавшееся открытие не удаляет запись и повторяется; после успеха запись удаляется
+        from callbacks import callback_handlers
+        timers = UnlockTimers(db)
+        with patch.object(callback_handlers, 'open_next_training_day', AsyncMock(return_value=False)):
+            asyncio.run(timers.fire(8002, 3))
+        assert [row['user_id'] for row in db.get_pending_unlocks(now + 2 * 86400)] == [8002]
+        assert timers.entries[8002][0] == 3 and len(timers.wheel) == 1, "Повтор открытия не запланирован"
+        with patch.object(callback_handlers, 'open_next_training_day', AsyncMock(return_value=True)):
+            asyncio.run(timers.fire(8002, 3))
+        assert db.get_pending_unlocks(now + 2 * 86400) == []
+        print("OK: Таймеры открытия дней работают корректно")
+
+    def test_analytics_partition_routing(self, clean_db):
+        """Тест партиций аналитики: вставка через представление попадает в партицию месяца события"""
+        print("\nТестирование маршрутизации событий по партициям...")
+
+        from database import ANALYTICS_PARTITION_PREFIX
+
+        db = clean_db
+        with sqlite3.connect(db.db_path) as conn:
+            past, current, upcoming = conn.execute('''
+                SELECT strftime('%Y-%m-15 12:00:00', 'now', 'start of month', '-2 months'),
+                       strftime('%Y%m', 'now'),
+                       strftime('%Y-%m-01 00:00:30', 'now', 'start of month', '+1 month')
+            ''').fetchone()
+            db.bulk_load_analytics(conn, [(8201, 'seed', None, past)])
+            conn.executemany('INSERT INTO analytics (user_id, event_type, timestamp) VALUES (?, ?, ?)',
+                             [(8201, 'late', past), (8201, 'midnight', upcoming),
+                              (8201, 'unknown_month', '2001-01-01 00:00:00'), (8201, 'now', None)])
+
+            def partition_of(event_type):
+                for partition in db.get_analytics_partitions():
+                    if conn.execute(f'SELECT 1 FROM {partition} WHERE event_type = ?', (event_type,)).fetchone():
+                        return partition[len(ANALYTICS_PARTITION_PREFIX):]
+
+            assert partition_of('late') == past[:4] + past[5:7], "Событие прошлого месяца попало в текущую партицию"
+            assert partition_of('midnight') == upcoming[:4] + upcoming[5:7], "Партиция следующего месяца не создана заранее"
+            assert partition_of('unknown_month') == current and partition_of('now') == current
+            ids = [row[0] for row in conn.execute("SELECT id FROM analytics WHERE user_id = 8201 ORDER BY id")]
+            assert len(ids) == len(set(ids)) == 5, "Нарушена общая последовательность id"
+        print("OK: События распределяются по партициям месяца события")
+
+    def test_analytics_partition_drop_rollback(self, clean_db):
+        """Тест удаления старых партиций: ошибка архивации откатывает все удаления"""
+        print("\nТестирование отката удаления партиций...")
+
+        db = clean_db
+        with sqlite3.connect(db.db_path) as conn:
+            old_months = conn.execute('''
+                SELECT strftime('%Y-%m-10 12:00:00', 'now', 'start of month', '-15 months'),
+                       strftime('%Y-%m-10 12:00:00', 'now', 'start of month', '-14 months')
+            ''').fetchone()
+            db.bulk_load_analytics(conn, [(8211, 'old', None, timestamp) for timestamp in old_months])
+        expired = db.get_analytics_partitions()[:2]
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            with patch.object(db, '_archive_partition', side_effect=[None, OSError('disk full')]):
+                assert db.drop_old_analytics_partitions(365, archive_dir) == [], "При ошибке возвращены удаленные партиции"
+        assert db.get_analytics_partitions()[:2] == expired, "Удаление не откатилось"
+        with sqlite3.connect(db.db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM analytics WHERE user_id = 8211").fetchone()[0] == 2
+
+        assert db.drop_old_analytics_partitions(365) == expired
+        assert not set(expired) & set(db.get_analytics_partitions())
+        print("OK: Ошибка удаления партиций откатывает изменения")
+
+    def test_collected_tips_migration(self, clean_db):
+        """Тест миграции советов: разобранные строки переносятся, поврежденные остаются в колонке"""
+        print("\nТестирование миграции советов...")
+
+        db = clean_db
+        rows = {
+            8101: '[{"type": "water", "text": "Пейте воду", "timestamp": "2026-01-01T08:00:00"}]',
+            8102: '[{"type": "sleep"',
+            8103: '[{"type": "walk", "text": "Гуляйте"}, {"text": "без типа"}]'
+        }
+        for user_id in rows:
+            db.add_user(user_id=user_id, username=f'tips{user_id}', first_name='Советы')
+        with sqlite3.connect(db.db_path) as conn:
+            conn.execute("DELETE FROM user_tips")
+            conn.executemany("UPDATE users SET collected_tips = ? WHERE user_id = ?",
+                             [(value, user_id) for user_id, value in rows.items()])
+
+        db.init_database()
+
+        with sqlite3.connect(db.db_path) as conn:
+            left = dict(conn.execute("SELECT user_id, collected_tips FROM users WHERE user_id IN (8101, 8102, 8103)"))
+            moved = conn.execute("SELECT user_id, tip_type, tip_text FROM user_tips ORDER BY user_id").fetchall()
+        assert moved == [(8101, 'water', 'Пейте воду')], "Перенесены советы из поврежденных строк"
+        assert left == {8101: '[]', 8102: rows[8102], 8103: rows[8103]}, "Поврежденные строки очищены"
+        print("OK: Миграция советов не теряет данные")
+
+    def test_users_keyset_pages(self, clean_db):
+        """Тест keyset-пагинации пользователей: проход вперед и назад без пропусков и повторов"""
+        print("\nТестирование постраничного просмотра пользователей...")
+
+        import admin
+
+        db = clean_db
+        # Две пары с одинаковой датой регистрации: порядок внутри пары задает user_id
+        dates = ['2026-01-01', '2026-01-02', '2026-01-02', '2026-01-03', '2026-01-04', '2026-01-04', '2026-01-05']
+        for index, date in enumerate(dates):
+            user_id = 8501 + index
+            db.add_user(user_id=user_id, username=f'page{user_id}', first_name='Страница')
+            db.update_user(user_id, registration_date=f'{date} 10:00:00', current_day=1 + index % 2)
+        expected = [8507, 8506, 8505, 8504, 8503, 8502, 8501]
+
+        pages, cursor = [], None
+        while True:
+            page = db.get_users_page(3, after_user_id=cursor)
+            pages.append([user['user_id'] for user in page['users']])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        assert pages == [expected[0:3], expected[3:6], expected[6:]], f"Неверные страницы вперед: {pages}"
+        assert page['prev_cursor'] == 8501
+
+        backward, cursor = [], page['prev_cursor']
+        while cursor is not None:
+            page = db.get_users_page(3, before_user_id=cursor)
+            backward.insert(0, [user['user_id'] for user in page['users']])
+            cursor = page['prev_cursor']
+        assert backward == [expected[0:3], expected[3:6]], f"Неверные страницы назад: {backward}"
+
+        # Фильтр сохраняется при переходе по курсору
+        first = db.get_users_page(2, current_day=1)
+        second = db.get_users_page(2, after_user_id=first['next_cursor'], current_day=1)
+        assert [user['user_id'] for user in first['users'] + second['users']] == [8507, 8505, 8503, 8501]
+
+        # Кнопка "вперед" меню пагинации открывает следующую страницу в админ-панели
+        markup = keyboards.users_browser_menu('d1', None, first['next_cursor'])
+        next_callback = markup.inline_keyboard[1][0].callback_data
+        assert next_callback == f"admin_users_d1_page_n{first['next_cursor']}"
+        query = AsyncMock()
+        with patch.object(admin, 'db', db), patch.object(admin, 'USERS_PAGE_SIZE', 2):
+            asyncio.run(admin.admin_panel.show_users(query, next_callback))
+        text = query.edit_message_text.await_args.args[0]
+        assert 'current_day=1' in text and text.count('Страница') == 2
+        print("OK: Keyset-пагинация пользователей работает корректно")
+
+    def test_backup_restore(self):
+        """Тест резервного копирования: сжатая копия, проверка, восстановление и ротация"""
+        print("\nТестирование резервного копирования...")
+
+        from backup import BackupManager
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = Database(os.path.join(temp_dir, 'backup_source.db'))
+            db.add_user(user_id=8401, username='backup', first_name='Копия')
+            manager = BackupManager(db.db_path, os.path.join(temp_dir, 'backups'), keep_last=2)
+
+            backup_path = manager.create_backup()
+            assert backup_path and backup_path.endswith('.db.gz') and manager.verify_backup(backup_path)
+
+            # Поврежденная копия не проходит проверку и не восстанавливается
+            broken_path = os.path.join(temp_dir, 'backups', 'broken.db.gz')
+            with open(broken_path, 'wb') as f:
+                f.write(b'not a backup')
+            assert not manager.verify_backup(broken_path) and not manager.restore_backup(broken_path)
+
+            # Изменения после копии откатываются восстановлением
+            with sqlite3.connect(db.db_path) as conn:
+                conn.execute("DELETE FROM users")
+            assert db.get_user(8401) is None
+            assert manager.restore_backup(backup_path)
+            assert db.get_user(8401)['first_name'] == 'Копия', "База не восстановлена"
+
+            # Ротация оставляет keep_last самых новых копий
+            for stamp in ('20200101_000000', '20210101_000000', '20220101_000000'):
+                shutil.copy(backup_path, os.path.join(temp_dir, 'backups', f'backup_source_{stamp}.db.gz'))
+            assert manager.apply_retention() == 2
+            assert [os.path.basename(path) for path in manager.list_backups()] == [
+                os.path.basename(backup_path), 'backup_source_20220101_000000.db.gz'
+            ]
+        print("OK: Резервное копирование работает корректно")
+
+    def test_data_export(self, clean_db):
+        """Тест потокового экспорта: CSV с профилями вовлеченности и колоночный JSON Lines по страницам"""
+        print("\nТестирование экспорта данных...")
+
+        import csv
+        import gzip
+        import io
+        import json
+        from analytics import AdvancedAnalytics
+        from export import DataExporter, PROFILE_COLUMNS
+
+        db = clean_db
+        for user_id in (8301, 8302, 8303):
+            db.add_user(user_id=user_id, username=f'export{user_id}', first_name='Экспорт')
+        db.add_analytics_event(8301, 'button_click', 'menu')
+        db.add_analytics_event(8301, 'training_completed', 'day_1')
+        db.add_analytics_event(8303, 'button_click', 'menu')
+        # Страница из двух строк: слияние с профилями проходит через границу страниц
+        analytics = AdvancedAnalytics(db)
+        exporter = DataExporter(db, analytics, batch_size=2)
+
+        spool, rows_count, filename = exporter.export_table('users')
+        with gzip.open(spool, 'rt', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert rows_count == 3 and filename.endswith('.csv.gz')
+        assert list(rows[0])[-len(PROFILE_COLUMNS):] == PROFILE_COLUMNS
+        merged = {int(row['user_id']): (int(row['total_events_30d']), int(row['longest_streak'])) for row in rows}
+        assert merged == {8301: (2, 1), 8302: (0, 0), 8303: (1, 0)}, f"Неверное слияние профилей: {merged}"
+
+        spool, rows_count, filename = exporter.export_table('analytics', fmt='columns')
+        with gzip.open(spool, 'rt', encoding='utf-8') as f:
+            groups = [json.loads(line) for line in f]
+        assert rows_count == 3 and filename.endswith('.jsonl.gz')
+        assert [len(group['id']) for group in groups] == [2, 1], "Группы не совпадают со страницами"
+        assert [event for group in groups for event in group['event_type']] == ['button_click', 'training_completed', 'button_click']
+        analytics.close()
+        print("OK: Экспорт данных работает корректно")
+
+    def test_dashboard_counters(self, clean_db):
+        """Тест счетчиков админ-панели: агрегаты, кэш на время TTL и его сброс"""
+        print("\nТестирование счетчиков админ-панели...")
+        import time
+        from database import DASHBOARD_CACHE_TTL
+
+        db = clean_db
+        db.invalidate_dashboard_cache()
+        for user_id, day in ((8601, 1), (8602, 1), (8603, 3)):
+            db.add_user(user_id=user_id, username=f'dash{user_id}', first_name='Счетчик')
+            db.update_user_day(user_id, day)
+        db.update_user(8603, is_premium=True)
+
+        counters = db.get_dashboard_counters()
+        assert counters == {'total': 3, 'premium': 1, 'users_by_day': {1: 2, 3: 1}}, f"Неверные счетчики: {counters}"
+
+        # Запись в обход Database.update_user не сбрасывает кэш: в пределах TTL значения прежние
+        with db.transaction() as uow:
+            uow.update_user(8601, current_day=2)
+        assert db.get_dashboard_counters() == counters, "Кэш не использован в пределах TTL"
+
+        # После истечения TTL счетчики пересчитываются
+        with patch('database.time.monotonic', return_value=time.monotonic() + DASHBOARD_CACHE_TTL + 1):
+            counters = db.get_dashboard_counters()
+        assert counters['users_by_day'] == {1: 1, 2: 1, 3: 1}, f"Кэш не обновлен после TTL: {counters}"
+
+        # Добавление пользователя и смена премиума сбрасывают кэш сразу
+        db.add_user(user_id=8604, username='dash8604', first_name='Счетчик')
+        assert db.get_dashboard_counters()['total'] == 4, "Кэш не сброшен после добавления пользователя"
+        db.update_user(8601, is_premium=True)
+        assert db.get_dashboard_counters()['premium'] == 2, "Кэш не сброшен после смены премиума"
+        print("OK: Счетчики админ-панели работают корректно")
+
+    def test_atomic_counters(self, clean_db):
+        """Тест счетчиков пользователя: атомарный инкремент и сумма покупок в транзакции платежа"""
+        print("\nТестирование атомарных счетчиков...")
+        import threading
+
+        db = clean_db
+        db.add_user(user_id=8701, username='counter', first_name='Счетчик')
+
+        # Параллельные инкременты не теряют обновлений (нет чтения-изменения-записи)
+        results = []
+        def refer():
+            for _ in range(25):
+                results.append(db.increment(8701, 'total_referrals'))
+        threads = [threading.Thread(target=refer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == 100 and all(results)
+        assert db.get_user(8701)['total_referrals'] == 100, "Потеряны параллельные инкременты"
+
+        assert not db.increment(8701, 'current_day'), "Инкремент разрешен для поля, не являющегося счетчиком"
+        assert not db.increment(8799, 'total_referrals'), "Инкремент несуществующего пользователя"
+
+        # В сумму покупок попадают только завершенные платежи
+        db.add_payment(8701, 990.0, 'RUB', 'course', 'completed', 'course_8701_a')
+        db.add_payment(8701, 500.0, 'RUB', 'course', 'pending', 'course_8701_b')
+        db.add_payment(8701, 10.0, 'RUB', 'tip', 'completed', 'tip_8701_c')
+        stats = db.get_user_stats(8701)
+        assert db.get_user(8701)['total_purchases'] == 1000.0
+        assert stats['payments_count'] == 2 and stats['total_spent'] == 1000.0, f"Неверная статистика: {stats}"
+        print("OK: Счетчики пользователя обновляются атомарно")
+
+    def test_transaction(self, clean_db):
+        """Тест единицы работы: одна фиксация на все записи, откат при ошибке"""
+        print("\nТестирование транзакций...")
+
+        db = clean_db
+        db.add_user(user_id=9001, username='uow', first_name='Транзакция')
+
+        with db.transaction() as uow:
+            uow.update_user(9001, training_completed=True)
+            uow.add_analytics_event(9001, 'training_toggled', 'state_True')
+            assert uow.add_tip(9001, 'training', 'Совет')
+            assert uow.get_user(9001)['training_completed'], "Запись не видна внутри транзакции"
+        assert db.get_user(9001)['training_completed']
+        assert len(db.get_collected_tips(9001)) == 1
+
+        # Ошибка в середине откатывает все записи блока
+        with pytest.raises(ValueError):
+            with db.transaction() as uow:
+                uow.add_payment(9001, 500.0, 'RUB', 'course', 'completed', 'course_basic_9001_x')
+                uow.increment(9001, 'not_a_counter')
+        assert db.get_user(9001)['total_purchases'] == 0, "Платеж не откатился"
+        print("OK: Транзакции работают корректно")
+
+    def test_responder(self):
+        """Тест ответов редактированием: правка на месте, пропуск без изменений, замена при смене типа"""
+        print("\nТестирование ответов редактированием...")
+
+        from responder import Responder
+
+        responder = Responder()
+        bot = MagicMock()
+        bot.edit_message_text = AsyncMock(side_effect=lambda **kw: MagicMock(message_id=kw['message_id'], photo=[]))
+        bot.edit_message_caption = AsyncMock(side_effect=lambda **kw: MagicMock(message_id=kw['message_id']))
+        bot.send_photo = AsyncMock(return_value=MagicMock(message_id=11, photo=[MagicMock(file_id='photo_1')]))
+        bot.delete_message = AsyncMock()
+        query = MagicMock(message=MagicMock(message_id=10, chat_id=1, photo=[]))
+
+        asyncio.run(responder.reply(bot, query, text="Меню", reply_markup=keyboards.main_menu()))
+        asyncio.run(responder.reply(bot, query, text="Меню", reply_markup=keyboards.main_menu()))
+        assert bot.edit_message_text.await_count == 1, "Повторный показ того же экрана вызвал Bot API"
+
+        # Текст нельзя отредактировать в фото - удаление и отправка
+        asyncio.run(responder.reply(bot, query, text="Фото", image_path="DianaLisa2.jpg"))
+        assert bot.delete_message.await_count == 1 and bot.send_photo.await_count == 1
+
+        # То же изображение с другим текстом - только подпись
+        query.message = MagicMock(message_id=11, chat_id=1, photo=[MagicMock(file_id='photo_1')])
+        asyncio.run(responder.reply(bot, query, text="Другое", image_path="DianaLisa2.jpg"))
+        assert bot.edit_message_caption.await_count == 1 and bot.send_photo.await_count == 1
+        assert responder.get_stats()['edits'] == 2 and responder.get_stats()['skipped'] == 1
+        print("OK: Ответы редактированием работают корректно")
+
+    def test_outbound_gateway(self):
+        """Тест исходящего шлюза: токены по приоритету, повтор после RetryAfter"""
+        print("\nТестирование исходящего шлюза...")
+
+        import time
+        from telegram.error import RetryAfter
+        from gateway import OutboundGateway
+
+        gateway = OutboundGateway({'global_rate': 50.0, 'global_burst': 1})
+        order = []
+        calls = []
+
+        async def send(name, priority, chat_id):
+            async def callback():
+                order.append(name)
+                return True
+            await gateway.process_request(callback, (), {}, 'sendMessage', {'chat_id': chat_id}, {'priority': priority})
+
+        async def flaky():
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise RetryAfter(0.05)
+            return True
+
+        async def scenario():
+            await gateway.initialize()
+            # Первый запрос забирает единственный токен, остальные ждут в очереди
+            await asyncio.gather(send('b1', 'broadcast', 1), send('b2', 'broadcast', 2),
+                                 send('r', 'reminder', 3), send('i', 'interactive', 4))
+            result = await gateway.process_request(flaky, (), {}, 'sendMessage', {'chat_id': 5}, None)
+            await gateway.shutdown()
+            return result
+
+        assert asyncio.run(scenario()) is True
+        assert order == ['b1', 'i', 'r', 'b2'], f"Неверный порядок выдачи токенов: {order}"
+        assert len(calls) == 2 and calls[1] - calls[0] >= 0.04, "Повтор после RetryAfter без паузы"
+        assert gateway.get_stats()['interactive']['retry_after'] == 1
+        print("OK: Исходящий шлюз работает корректно")
+
+    def test_blocked_chats(self, clean_db):
+        """Тест учета недоступных чатов: Forbidden исключает из рассылок, /start возвращает"""
+        print("\nТестирование недоступных чатов...")
+
+        from telegram.error import Forbidden
+        from gateway import OutboundGateway
+
+        db = clean_db
+        db.add_user(user_id=9101, username='blocked', first_name='Заблокировал')
+        db.add_user(user_id=9102, username='active', first_name='Активный')
+        gateway = OutboundGateway(database=db)
+
+        async def blocked_send():
+            raise Forbidden("Forbidden: bot was blocked by the user")
+
+        with pytest.raises(Forbidden):
+            asyncio.run(gateway.process_request(blocked_send, (), {}, 'sendMessage', {'chat_id': 9101}, None))
+
+        assert db.get_user(9101)['is_blocked'], "Чат не отмечен недоступным"
+        assert [user['user_id'] for user in db.get_all_users(include_blocked=False)] == [9102]
+        assert db.get_users_count(include_blocked=False) == 1
+        assert gateway.get_stats()['interactive']['undeliverable'] == 1
+
+        # Повторный /start снимает отметку
+        assert db.set_chat_blocked(9101, False, 'start_command')
+        assert not db.set_chat_blocked(9101, False), "Статус не должен меняться повторно"
+        assert db.get_users_count(include_blocked=False) == 2
+        print("OK: Недоступные чаты учитываются корректно")
+
+    def test_notification_planner(self, clean_db):
+        """Тест планировщика уведомлений: объединение сообщений окна и суточный бюджет"""
+        print("\nТестирование планировщика уведомлений...")
+
+        from notifications import NotificationPlanner
+
+        db = clean_db
+        db.add_user(user_id=9201, username='planner', first_name='Утро')
+        planner = NotificationPlanner({'window': 0.01, 'daily_budget': 1}, database=db)
+        bot = MagicMock()
+        bot.send_message = AsyncMock(return_value=MagicMock(message_id=1, photo=[]))
+
+        async def morning():
+            await planner.notify(9201, 'morning', "Доброе утро <3", reply_markup=keyboards.training_menu(2),
+                                 event_type='morning_motivation_sent')
+            await planner.notify(9201, 'training', "<b>День 2</b>", reply_markup=keyboards.main_menu(), parse_mode='HTML')
+            await planner.notify(9201, 'new_day', "Начинается День 2")
+            await asyncio.sleep(0.05)
+            # Бюджет исчерпан: мотивация пропускается, открытие дня обязательно
+            await planner.notify(9201, 'evening', "Добрый вечер", event_type='evening_motivation_sent')
+            await planner.notify(9201, 'unlock', "День 3 доступен")
+            await asyncio.sleep(0.05)
+
+        with patch.dict(sys.modules, {'main': MagicMock(application=MagicMock(bot=bot))}):
+            asyncio.run(morning())
+
+        assert bot.send_message.await_count == 2
+        first = bot.send_message.await_args_list[0].kwargs
+        assert first['text'].index("Начинается") < first['text'].index("Доброе утро &lt;3") < first['text'].index("<b>День 2</b>")
+        assert first['parse_mode'] == 'HTML' and first['reply_markup'] == keyboards.main_menu()
+        assert bot.send_message.await_args_list[1].kwargs['text'] == "День 3 доступен"
+        stats = planner.get_stats()
+        assert stats['merged'] == 2 and stats['over_budget'] == 1 and stats['pending_users'] == 0
+        # Событие об отправке записывается только для доставленной части
+        with sqlite3.connect(db.db_path) as conn:
+            events = [row[0] for row in conn.execute("SELECT event_type FROM analytics WHERE user_id = 9201")]
+        assert events == ['morning_motivation_sent'], f"Неверные события отправки: {events}"
+        print("OK: Планировщик уведомлений работает корректно")
+
+    def test_slot_smoothing(self):
+        """Тест разнесения напоминаний: постоянный сдвиг пользователя в пределах окна, окно по лимиту шлюза"""
+        print("\nТестирование разнесения напоминаний...")
+
+        from jobs import JobScheduler
+
+        job_scheduler = JobScheduler()
+        offsets = [job_scheduler.slot_offset(user_id, 18) for user_id in range(1000, 3000)]
+        assert offsets == [job_scheduler.slot_offset(user_id, 18) for user_id in range(1000, 3000)], "Сдвиг должен быть постоянным"
+        assert min(offsets) >= -600 and max(offsets) <= 600
+        # Сдвиги распределены по всему окну, а не собраны в одной секунде
+        assert len({offset // 60 for offset in offsets}) >= 20
+
+        trigger = job_scheduler.get_cron_trigger(18, 'Europe/Moscow', 1000)
+        offset = job_scheduler.slot_offset(1000, 18)
+        next_run = trigger.get_next_fire_time(None, datetime(2030, 1, 1, 12, 0, tzinfo=trigger.timezone))
+        assert (next_run.hour * 3600 + next_run.minute * 60 + next_run.second) == 18 * 3600 + offset
+
+        # Сдвиг не зависит от числа пользователей с задачами: ранее созданные триггеры остаются верными
+        job_scheduler.job_ids.update({user_id: {} for user_id in range(100000)})
+        assert job_scheduler.slot_offset(1000, 18) == offset
+
+        # Расчетное число пользователей не помещается в окно при доле лимита шлюза - окно расширяется
+        with patch.dict('config.SCHEDULER_SETTINGS', {'smoothing_capacity': 100000}):
+            assert job_scheduler.slot_spread() > 600
+        print("OK: Напоминания разносятся корректно")
+
+    def test_morning_slot_merge(self, clean_db):
+        """Тест утреннего слота: сдвиг 08:00 не выводит мотивацию из окна объединения с прогрессией дней"""
+        print("\nТестирование объединения утренних сообщений...")
+
+        from config import NOTIFICATION_SETTINGS
+        from jobs import JobScheduler
+        from notifications import NotificationPlanner
+
+        job_scheduler = JobScheduler()
+        window = NOTIFICATION_SETTINGS['window']
+        offsets = {user_id: job_scheduler.slot_offset(user_id, 8) for user_id in range(1000, 3000)}
+        assert all(0 <= offset < window for offset in offsets.values()), "Утренний сдвиг вне окна планировщика"
+        assert len(set(offsets.values())) > 10, "Утренние напоминания не разнесены"
+
+        # Прогрессия в 08:00 открывает окно, мотивация приходит со сдвигом пользователя; время сжато в scale раз
+        db = clean_db
+        db.add_user(user_id=9301, username='morning', first_name='Утро')
+        scale = 0.002
+        latest = max(offsets.values())
+        planner = NotificationPlanner({'window': window * scale}, database=db)
+        bot = MagicMock()
+        bot.send_message = AsyncMock(return_value=MagicMock(message_id=1, photo=[]))
+
+        async def morning():
+            await planner.notify(9301, 'new_day', "Начинается День 2")
+            await asyncio.sleep(latest * scale)
+            await planner.notify(9301, 'morning', "Доброе утро")
+            await asyncio.sleep(window * scale * 1.5)
+
+        with patch.dict(sys.modules, {'main': MagicMock(application=MagicMock(bot=bot))}):
+            asyncio.run(morning())
+        assert bot.send_message.await_count == 1, "Утренние сообщения не объединены"
+        assert planner.get_stats()['merged'] == 1
+        print("OK: Утренние сообщения объединяются")
+
+    def test_progress_user_days(self, clean_db):
+        """Тест прогрессии дней: переходы одной транзакцией, ошибка уведомления одного пользователя не мешает другим"""
+        print("\nТестирование прогрессии дней...")
+
+        from jobs import JobScheduler
+
+        db = clean_db
+        for user_id in (9301, 9302, 9303):
+            db.add_user(user_id=user_id, username=f'user{user_id}', first_name='Прогресс')
+            db.update_user(user_id, training_completed=user_id != 9303,
+                           last_activity=(datetime.now() - timedelta(hours=30)).isoformat())
+
+        job_scheduler = JobScheduler()
+        notified = []
+
+        async def notify(user_id, new_day, reason, user=None):
+            if user_id == 9301:
+                raise RuntimeError("Ошибка отправки")
+            notified.append((user_id, new_day, reason))
+
+        with patch('jobs.db', db), patch.object(job_scheduler, 'send_new_day_notification', side_effect=notify):
+            asyncio.run(job_scheduler.progress_user_days())
+
+        assert notified == [(9302, 2, 'completed')]
+        assert db.get_user(9301)['current_day'] == 2 and not db.get_user(9301)['training_completed']
+        assert db.get_user(9303)['current_day'] == 1, "Без выполненной тренировки день не меняется"
+        # День уже изменился (например, открыт таймером) - повторный переход не выполняется
+        assert db.advance_user_days([(9302, 1, 2)]) == []
+        print("OK: Прогрессия дней работает корректно")
+
+    def test_scheduler_health_and_catch_up(self):
+        """Тест наблюдаемости планировщика и поиска напоминаний, пропущенных за время остановки"""
+        print("\nТестирование состояния планировщика...")
+
+        import pytz
+        from apscheduler.events import (
+            EVENT_JOB_EXECUTED, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED, JobExecutionEvent, JobSubmissionEvent
+        )
+        from jobs import JobScheduler
+
+        job_scheduler = JobScheduler()
+        scheduled = datetime.now(pytz.utc) - timedelta(seconds=2)
+        job_scheduler._on_job_event(JobSubmissionEvent(EVENT_JOB_SUBMITTED, 'morning_1', 'default', [scheduled]))
+        job_scheduler._on_job_event(JobExecutionEvent(EVENT_JOB_EXECUTED, 'morning_1', 'default', scheduled))
+        job_scheduler._on_job_event(JobExecutionEvent(EVENT_JOB_MISSED, 'morning_2', 'default', scheduled))
+        morning = job_scheduler.get_health()['groups']['morning']
+        assert morning['executed'] == 1 and morning['missed'] == 1 and morning['avg_lag_ms'] >= 2000
+
+        # Бот не работал в 8:00 по Москве: утреннее напоминание еще уместно, вечернее еще не наступило
+        moscow = pytz.timezone('Europe/Moscow')
+        now = moscow.localize(datetime(2030, 1, 1, 9, 0)).astimezone(pytz.utc)
+        users = [{'user_id': 1, 'timezone': 'Europe/Moscow'}, {'user_id': 2, 'timezone': None}]
+        sent_today = {(2, 'morning_motivation_sent'): (now - timedelta(minutes=30)).strftime('%Y-%m-%d %H:%M:%S')}
+        assert job_scheduler.find_missed_reminders(users, sent_today, now) == [('send_morning_motivation', 1)]
+
+        # Через 4 часа после слота утреннее напоминание уже неуместно
+        late = now + timedelta(hours=4, minutes=15)
+        assert job_scheduler.find_missed_reminders(users, {}, late) == []
+
+        # В состоянии - число поставленных в очередь напоминаний
+        with patch.object(job_scheduler, 'find_missed_reminders', return_value=[('send_morning_motivation', 1)]), \
+                patch.object(job_scheduler, 'send_morning_motivation', AsyncMock()) as send, \
+                patch('jobs.db.get_last_events', return_value={}):
+            asyncio.run(job_scheduler.catch_up_missed(users))
+        send.assert_awaited_once_with(1)
+        assert job_scheduler.get_health()['catch_up']['queued'] == 1
+        print("OK: Состояние планировщика и досылка работают корректно")
+
+    def test_sql_trace(self, clean_db):
+        """Тест трассировки SQL: отпечатки без литералов, p95, медленные запросы с планом, JSON-отчет"""
+        print("\nТестирование трассировки SQL...")
+
+        import json
+        from sqltrace import SQLTracer, normalize_sql
+
+        assert normalize_sql("SELECT * FROM users WHERE user_id = 42 AND phone = '+7 900'") == \
+            normalize_sql("SELECT  *  FROM users WHERE user_id = 7 AND phone = 'x'")
+        assert normalize_sql("SELECT 1 FROM t WHERE id IN (?, ?, ?)") == "SELECT ? FROM t WHERE id IN (?, ...)"
+
+        tracer = SQLTracer({'enabled': True, 'slow_ms': 0})
+        with tracer.connect(clean_db.db_path) as conn:
+            for user_id in (9401, 9402, 9403):
+                conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchall()
+            conn.execute("SELECT COUNT(*) FROM users WHERE first_name = 'Тест'").fetchone()
+
+        report = tracer.get_report()
+        lookup = next(item for item in report['queries'] if item['sql'] == "SELECT * FROM users WHERE user_id = ?")
+        assert lookup['count'] == 3 and lookup['p95_ms'] <= lookup['max_ms']
+        # Без индекса по first_name - полное сканирование, значения пользователей в отчет не попадают
+        scan = next(item for item in report['slow_queries'] if 'first_name' in item['sql'])
+        assert any(step.startswith('SCAN') for step in scan['plan']) and scan['fingerprint'] in report['full_scans']
+        assert 'Тест' not in json.dumps(report, ensure_ascii=False)
+
+        path = tracer.dump(os.path.join(os.path.dirname(clean_db.db_path), 'sql_trace.json'))
+        with open(path, encoding='utf-8') as f:
+            assert json.load(f)['queries'], "Отчет не записан"
+
+        # Сообщение админ-панели не превышает лимит и не обрывается внутри <code>
+        import admin
+        for index in range(8):
+            tracer.record(f"SELECT t{index}.a FROM t{index} WHERE a " + "<" * 200, 0.001)
+        query = AsyncMock()
+        with patch.object(admin, 'sql_tracer', tracer):
+            asyncio.run(admin.admin_panel.show_sql_trace(query))
+        text = query.edit_message_text.await_args.args[0]
+        assert len(text) <= 4000 and text.count('<code>') == text.count('</code>') > 0
+        print("OK: Трассировка SQL работает корректно")
+
+    def test_content_reload(self):
+        """Тест горячей перезагрузки контента: задача планировщика подменяет контент по изменению файла"""
+        print("\nТестирование перезагрузки контента...")
+        import json
+        from config import CONTENT_SETTINGS
+        from content import ContentRegistry
+        from jobs import JobScheduler
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            live = {}
+            registry = ContentRegistry(temp_dir)
+            registry.register('faq', {'title': 'FAQ', 'answer': 'Встроенный ответ'}, lambda data: live.update(content=data))
+            path = os.path.join(temp_dir, 'faq.json')
+
+            def publish(content, mtime_ns):
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(content if isinstance(content, str) else json.dumps(content, ensure_ascii=False))
+                os.utime(path, ns=(mtime_ns, mtime_ns))
+
+            job_scheduler = JobScheduler()
+            with patch('jobs.content_registry', registry):
+                job_scheduler.schedule_content_reload()
+            job = job_scheduler.scheduler.get_job('content_reload')
+            assert job.trigger.interval == timedelta(seconds=CONTENT_SETTINGS['reload_interval'])
+
+            # Без файла остается встроенный контент
+            assert asyncio.run(job.func()) == [] and 'content' not in live
+
+            # Новый файл подменяет раздел целиком: переопределения поверх встроенных значений
+            publish({'version': 2, 'data': {'answer': 'Новый ответ'}}, 10**18)
+            assert asyncio.run(job.func()) == ['faq']
+            assert live['content'] == {'title': 'FAQ', 'answer': 'Новый ответ'}
+            assert registry.get_versions() == {'faq': 2}
+
+            # Без изменения mtime файл не перечитывается; ошибочный файл не применяется
+            assert asyncio.run(job.func()) == []
+            previous = live['content']
+            publish('{"version": 3, "data": ', 10**18 + 1)
+            assert asyncio.run(job.func()) == [] and live['content'] is previous
+            assert registry.get_versions() == {'faq': 2}
+        print("OK: Контент перезагружается задачей планировщика")
+
+    def test_supervisor_health(self):
+        """Тест супервизора: готовность и живость по сигналу, экспоненциальная задержка, crash loop"""
+        print("\nТестирование супервизора бота...")
+        import json
+        import time
+        import bot_manager
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            heartbeat_file = os.path.join(temp_dir, 'heartbeat.json')
+
+            def beat(status, age=0.0, pid=4242):
+                with open(heartbeat_file, 'w', encoding='utf-8') as f:
+                    json.dump({'status': status, 'pid': pid, 'time': time.time() - age}, f)
+
+            with patch.object(bot_manager, 'HEARTBEAT_FILE', heartbeat_file), \
+                 patch.object(bot_manager, 'METRICS_FILE', os.path.join(temp_dir, 'metrics.json')), \
+                 patch('bot_manager.signal.signal'):
+                manager = bot_manager.BotManager({'max_restarts': 2, 'backoff_initial': 1, 'backoff_max': 3})
+                manager.bot_process = MagicMock(pid=4242, returncode=1)
+                manager.bot_process.poll.return_value = None
+                manager.started_at = time.monotonic()
+
+                # До сигнала готовности ждем, сигнал чужого процесса не учитывается
+                assert manager.check_health() is None and manager.ready_at is None
+                beat('ready', pid=1)
+                assert manager.check_health() is None and manager.ready_at is None
+                beat('ready')
+                assert manager.check_health() is None and manager.metrics['last_ready_s'] is not None
+
+                # Устаревший сигнал - зависание, завершившийся процесс - падение
+                beat('ready', age=manager.settings['liveness_timeout'] + 1)
+                assert manager.check_health() == 'hang'
+                manager.bot_process.poll.return_value = 1
+                assert manager.check_health() == 'crash'
+
+                # Задержка растет до потолка, лимит перезапусков в окне останавливает супервизор
+                delays = []
+                with patch.object(manager, 'stop_bot'), patch.object(manager, 'start_bot', return_value=True), \
+                     patch.object(manager.stop_event, 'wait', side_effect=lambda delay: delays.append(delay) or False):
+                    assert manager.restart_bot('crash') and manager.restart_bot('hang')
+                    assert not manager.restart_bot('crash')
+                assert delays == [1, 2] and manager.backoff == 3
+                assert manager.metrics['crashes'] == 2 and manager.metrics['hangs'] == 1
+                assert manager.metrics['crash_loop'] and not manager.running
+                with open(os.path.join(temp_dir, 'metrics.json'), encoding='utf-8') as f:
+                    assert json.load(f)['crash_loop'], "Метрики crash loop не сохранены"
+        print("OK: Супервизор отслеживает готовность, живость и перезапуски")
+
+    def test_lifecycle_hooks(self):
+        """Тест хуков Application: запуск и остановка планировщика, сигнал живости, отправка накопленных уведомлений"""
+        print("\nТестирование хуков жизненного цикла...")
+        import json
+        import main
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            heartbeat_file = os.path.join(temp_dir, 'heartbeat.json')
+
+            def heartbeat():
+                with open(heartbeat_file, encoding='utf-8') as f:
+                    return json.load(f)
+
+            async def scenario(bot, application):
+                await bot.post_init(application)
+                scheduler.start_all_scheduled_jobs.assert_called_once()
+                await asyncio.sleep(0.05)
+                assert heartbeat()['status'] == 'ready' and heartbeat()['pid'] == os.getpid()
+
+                await bot.post_stop(application)
+                flush_all.assert_awaited_once()
+                scheduler.shutdown.assert_not_called()
+
+                await bot.post_shutdown(application)
+                await asyncio.sleep(0)
+                scheduler.shutdown.assert_called_once()
+                assert bot.heartbeat_task.cancelled(), "Цикл сигнала живости не остановлен"
+                assert heartbeat()['status'] == 'stopped'
+
+            scheduler = MagicMock()
+            flush_all = AsyncMock()
+            with patch.dict(main.HEARTBEAT_SETTINGS, {'file': heartbeat_file, 'interval': 0.01}), \
+                 patch('jobs.scheduler', scheduler), \
+                 patch('notifications.notification_planner.flush_all', flush_all):
+                asyncio.run(scenario(main.DianaLisaBot(), MagicMock()))
+        print("OK: Хуки жизненного цикла запускают и останавливают сервисы")
+
+    def test_startup_profile_and_lazy_imports(self, capsys):
+        """Тест холодного старта: редко используемые подсистемы не загружаются при импорте main, сводка importtime"""
+        print("\nТестирование холодного старта...")
+        import subprocess
+        import main
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = subprocess.run(
+                [sys.executable, '-c', "import sys, main; print('loaded:', *sorted(m for m in "
+                 "('admin', 'payment', 'export', 'backup', 'jobs', 'psutil') if m in sys.modules))"],
+                capture_output=True, text=True, cwd=root, timeout=60,
+                env={**os.environ, 'BOT_TOKEN': 'test', 'DATABASE_PATH': os.path.join(temp_dir, 'startup.db')}
+            )
+        assert result.returncode == 0, result.stderr[-2000:]
+        loaded = next(line for line in result.stdout.splitlines() if line.startswith('loaded:'))
+        assert loaded == 'loaded:', f"Подсистемы загружены при старте: {loaded}"
+
+        # Сводка importtime: собственное и полное время, модули бота отдельно
+        stderr = '\n'.join([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       500 |       9000 | telegram',
+            'import time:      3000 |       3000 |   httpx',
+            'import time:      1500 |       2500 | database',
+            'import time:      1000 |       1000 |   sqltrace',
+        ])
+        with patch('main.subprocess.run', return_value=MagicMock(stderr=stderr)) as run:
+            assert main.profile_startup(top=2) == 0
+        assert run.call_args.args[0][1:] == ['-X', 'importtime', '-c', 'import main']
+        report = capsys.readouterr().out
+        assert 'Импорт main: 6.0 мс, модулей: 4, из них модули бота: 2.5 мс' in report
+        cumulative, own = report.split('Самые тяжелые по собственному времени')
+        assert cumulative.index('telegram') < cumulative.index('httpx') and 'sqltrace' not in cumulative
+        assert own.index('httpx') < own.index('database') and 'telegram' not in own
+
+        with patch('main.subprocess.run', return_value=MagicMock(stderr='python: bad option')):
+            assert main.profile_startup() == 1
+        print("OK: Холодный старт профилируется, подсистемы загружаются лениво")
+
 if __name__ == "__main__":
     # Запуск тестов через pytest
     import subprocess
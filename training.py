@@ -12,7 +12,11 @@ from telegram.constants import ParseMode
 from config import MESSAGES, IMAGES, BUTTONS
 from keyboards import keyboards
 from database import db
+from gateway import outbound
+from notifications import notification_planner
 from utils import get_user_timezone
+from content import content_registry
+from responder import responder
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +29,14 @@ class TrainingSystem:
             2: self.get_day2_content(),
             3: self.get_day3_content()
         }
+        
+        # Программу дней можно менять файлом content/training.json без перезапуска
+        content_registry.register('training', self.training_content, self.apply_content,
+                                  normalize=lambda content: {int(day): data for day, data in content.items()})
+    
+    def apply_content(self, content: dict):
+        """Подмена программы тренировок из реестра контента"""
+        self.training_content = content
     
     def get_day1_content(self) -> dict:
         """Контент для дня 1"""
@@ -180,13 +192,9 @@ class TrainingSystem:
             user = db.get_user(user_id)
             
             if not user:
-                try:
-                    await query.delete_message()
-                except:
-                    pass
-                
-                await context.bot.send_message(
-                    chat_id=user_id,
+                await responder.reply(
+                    bot=context.bot,
+                    query=query,
                     text="❌ Сначала нужно зарегистрироваться. Используйте /start",
                     reply_markup=keyboards.back_to_main()
                 )
@@ -194,13 +202,9 @@ class TrainingSystem:
             
             # Проверяем, может ли пользователь получить тренировку этого дня
             if not self.can_access_training(user, day):
-                try:
-                    await query.delete_message()
-                except:
-                    pass
-                
-                await context.bot.send_message(
-                    chat_id=user_id,
+                await responder.reply(
+                    bot=context.bot,
+                    query=query,
                     text="❌ У вас нет доступа к этой тренировке. Пройдите предыдущие дни.",
                     reply_markup=keyboards.main_menu()
                 )
@@ -208,13 +212,9 @@ class TrainingSystem:
             
             content = self.training_content.get(day)
             if not content:
-                try:
-                    await query.delete_message()
-                except:
-                    pass
-                
-                await context.bot.send_message(
-                    chat_id=user_id,
+                await responder.reply(
+                    bot=context.bot,
+                    query=query,
                     text="❌ Тренировка не найдена.",
                     reply_markup=keyboards.back_to_main()
                 )
@@ -240,31 +240,19 @@ class TrainingSystem:
             
             # Отправляем сообщение
             if content['image']:
-                # Удаляем предыдущее сообщение и отправляем новое с изображением
-                try:
-                    await query.delete_message()
-                except:
-                    pass  # Игнорируем ошибки удаления
-                
                 # Используем новую функцию для отправки изображения с текстом
-                from utils import send_image_with_text
-                await send_image_with_text(
+                await responder.reply(
                     bot=context.bot,
-                    chat_id=user_id,
+                    query=query,
                     image_path=content['image'],
                     text=message_text,
                     reply_markup=reply_markup,
                     parse_mode=ParseMode.HTML
                 )
             else:
-                # Удаляем предыдущее сообщение и отправляем новое
-                try:
-                    await query.delete_message()
-                except:
-                    pass  # Игнорируем ошибки удаления
-                
-                await context.bot.send_message(
-                    chat_id=user_id,
+                await responder.reply(
+                    bot=context.bot,
+                    query=query,
                     text=message_text,
                     reply_markup=reply_markup,
                     parse_mode=ParseMode.HTML
@@ -277,13 +265,9 @@ class TrainingSystem:
             
         except Exception as e:
             logger.error(f"Ошибка отправки тренировки: {e}")
-            try:
-                await query.delete_message()
-            except:
-                pass
-            
-            await context.bot.send_message(
-                chat_id=user_id,
+            await responder.reply(
+                bot=context.bot,
+                query=query,
                 text="❌ Произошла ошибка при загрузке тренировки.",
                 reply_markup=keyboards.back_to_main()
             )
@@ -349,12 +333,13 @@ class TrainingSystem:
 🔥 Скидка 50% только сегодня!
             """
             
-            await application.bot.send_message(
-                chat_id=user_id,
-                text=offer_text,
-                reply_markup=keyboards.course_packages(),
-                parse_mode=ParseMode.HTML
-            )
+            with outbound.priority('reminder'):
+                await application.bot.send_message(
+                    chat_id=user_id,
+                    text=offer_text,
+                    reply_markup=keyboards.course_packages(),
+                    parse_mode=ParseMode.HTML
+                )
             
         except Exception as e:
             logger.error(f"Ошибка отправки предложения полного курса: {e}")
@@ -394,7 +379,7 @@ class TrainingSystem:
                 return
             
             user = db.get_user(user_id)
-            if not user:
+            if not user or user.get('is_blocked'):
                 return
             
             reminder_text = f"""
@@ -407,16 +392,14 @@ class TrainingSystem:
 💪 Ты можешь это сделать! Начни прямо сейчас!
             """
             
-            await application.bot.send_message(
-                chat_id=user_id,
-                text=reminder_text,
+            await notification_planner.notify(
+                user_id, 'training_reminder', reminder_text,
                 reply_markup=keyboards.training_menu(day),
-                parse_mode=ParseMode.HTML
+                parse_mode=ParseMode.HTML,
+                event_type='training_reminder_sent',
+                event_data=f'day_{day}'
             )
             
-            # Добавляем событие в аналитику
-            db.add_analytics_event(user_id, 'training_reminder_sent', f'day_{day}')
-            
         except Exception as e:
             logger.error(f"Ошибка отправки напоминания о тренировке: {e}")
 
@@ -0,0 +1,207 @@
+"""
+⏰ Таймеры открытия следующего дня тренировок DianaLisa
+Таймеры хранятся в таблице pending_unlocks и переживают перезапуск бота.
+В памяти - иерархическое колесо таймеров только на ближайшее окно (по умолчанию 1 час),
+следующее окно подгружается из базы по индексу fire_at.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytz
+
+from config import SCHEDULER_SETTINGS, UNLOCK_SETTINGS
+from database import db
+
+logger = logging.getLogger(__name__)
+
+class TimingWheel:
+    """Иерархическое колесо таймеров: уровень i - slots[i] ячеек шириной span[i] шагов.
+    Таймер попадает на нижний уровень, который его вмещает, и по мере приближения
+    срока переносится (каскадом) на уровни ниже; добавление и шаг - O(1) в среднем."""
+
+    def __init__(self, tick: float, slots: Tuple[int, ...], now: float):
+        self.tick = tick
+        self.slots = slots
+        self.spans = [1]
+        for count in slots[:-1]:
+            self.spans.append(self.spans[-1] * count)
+        self.capacity = self.spans[-1] * slots[-1]
+        self.levels = [[[] for _ in range(count)] for count in slots]
+        self.current = int(now // tick)
+        self.due = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _place(self, target: int, item: Any):
+        delta = target - self.current
+        if delta <= 0:
+            self.due.append(item)
+            return
+        last = len(self.slots) - 1
+        for level, (span, count) in enumerate(zip(self.spans, self.slots)):
+            # Таймеры дальше окна лежат на верхнем уровне и перекладываются при каждом его обороте
+            if delta < span * count or level == last:
+                self.levels[level][(target // span) % count].append((target, item))
+                return
+
+    def add(self, fire_at: float, item: Any):
+        """Добавление таймера; срок округляется вверх до шага, поэтому раньше времени он не сработает"""
+        self.size += 1
+        self._place(math.ceil(fire_at / self.tick), item)
+
+    def advance(self, now: float) -> List[Any]:
+        """Продвижение колеса до момента now; возвращает сработавшие таймеры"""
+        target = int(now // self.tick)
+
+        if target - self.current >= self.capacity:
+            # Пропущено больше полного окна (сон системы, долгая блокировка): раскладываем заново
+            entries = [entry for level in self.levels for bucket in level for entry in bucket]
+            self.levels = [[[] for _ in range(count)] for count in self.slots]
+            self.current = target
+            for entry_target, item in entries:
+                self._place(entry_target, item)
+
+        while self.current < target:
+            self.current += 1
+            # Сначала верхние уровни, чтобы перенесенные таймеры успели попасть в нижнюю ячейку этого шага
+            for level in range(len(self.slots) - 1, 0, -1):
+                span = self.spans[level]
+                if self.current % span == 0:
+                    index = (self.current // span) % self.slots[level]
+                    bucket, self.levels[level][index] = self.levels[level][index], []
+                    for entry_target, item in bucket:
+                        self._place(entry_target, item)
+
+            index = self.current % self.slots[0]
+            bucket, self.levels[0][index] = self.levels[0][index], []
+            self.due.extend(item for _, item in bucket)
+
+        due, self.due = self.due, []
+        self.size -= len(due)
+        return due
+
+class UnlockTimers:
+    """Класс для долговременных таймеров открытия следующего дня"""
+
+    def __init__(self, database=None, settings: dict = None):
+        self.db = database or db
+        self.settings = {**UNLOCK_SETTINGS, **(settings or {})}
+        self.tick = self.settings['tick']
+        self.wheel = TimingWheel(self.tick, self.settings['wheel_slots'], time.time())
+        self.horizon = self.wheel.capacity * self.tick
+        self.entries: Dict[int, Tuple[int, float]] = {}  # user_id -> (день, время) для загруженного окна
+        self.loaded_until = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    def next_unlock_time(self, user_timezone: str = None) -> datetime:
+        """Завтра в час открытия по времени пользователя"""
+        tz = pytz.timezone(user_timezone or SCHEDULER_SETTINGS['timezone'])
+        now = datetime.now(tz)
+        next_time = (now + timedelta(days=1)).replace(hour=self.settings['open_hour'], minute=0, second=0, microsecond=0)
+        return tz.normalize(next_time)
+
+    def schedule(self, user_id: int, day: int, fire_at: float) -> bool:
+        """Таймер сохраняется в базе; в колесо попадает, только если срабатывает в загруженном окне"""
+        if not self.db.add_pending_unlock(user_id, day, fire_at):
+            return False
+
+        if fire_at < self.loaded_until:
+            self.entries[user_id] = (day, fire_at)
+            self.wheel.add(fire_at, (user_id, day, fire_at))
+        else:
+            # Прежний таймер пользователя в окне больше не актуален
+            self.entries.pop(user_id, None)
+        return True
+
+    async def load_window(self, now: float):
+        """Подгрузка таймеров следующего окна из базы (первая загрузка - вместе с просроченными)"""
+        since = self.loaded_until or None
+        until = now + self.horizon - 2 * self.tick
+        # Граница сдвигается до чтения: таймеры, добавленные во время чтения, schedule кладет в колесо сам
+        self.loaded_until = until
+
+        rows = await asyncio.to_thread(self.db.get_pending_unlocks, until, since)
+        loaded = 0
+        for row in rows:
+            if row['user_id'] in self.entries:
+                continue
+            self.entries[row['user_id']] = (row['day'], row['fire_at'])
+            self.wheel.add(row['fire_at'], (row['user_id'], row['day'], row['fire_at']))
+            loaded += 1
+
+        if loaded:
+            logger.info(f"Загружено таймеров открытия дней: {loaded}, в памяти: {len(self.entries)}")
+
+    async def process(self, now: float = None):
+        """Один шаг: подгрузка окна при необходимости и открытие дней по сработавшим таймерам"""
+        now = now or time.time()
+        if now >= self.loaded_until - self.horizon / 2:
+            await self.load_window(now)
+
+        for user_id, day, fire_at in self.wheel.advance(now):
+            # Таймер мог быть заменен более новым (повторное планирование)
+            if self.entries.get(user_id) != (day, fire_at):
+                continue
+            del self.entries[user_id]
+            await self.fire(user_id, day)
+
+    async def fire(self, user_id: int, day: int):
+        """Открытие дня; запись удаляется только после успешного открытия, иначе таймер повторяется"""
+        try:
+            from callbacks import callback_handlers
+            if await callback_handlers.open_next_training_day(user_id, day):
+                self.db.delete_pending_unlock(user_id, day)
+                return
+        except Exception as e:
+            logger.error(f"Ошибка срабатывания таймера открытия Дня {day} для пользователя {user_id}: {e}")
+
+        # Запись остается в базе (после перезапуска таймер подхватится), в памяти - повтор через retry_delay
+        retry_at = time.time() + self.settings['retry_delay']
+        logger.warning(f"День {day} для пользователя {user_id} не открыт, повтор через {self.settings['retry_delay']} с")
+        if user_id not in self.entries:
+            self.entries[user_id] = (day, retry_at)
+            self.wheel.add(retry_at, (user_id, day, retry_at))
+
+    async def run(self):
+        """Цикл колеса таймеров"""
+        while True:
+            try:
+                await self.process()
+            except Exception as e:
+                logger.error(f"Ошибка обработки таймеров открытия дней: {e}")
+            await asyncio.sleep(self.tick)
+
+    def start(self):
+        """Запуск цикла в текущем event loop"""
+        if self.task and not self.task.done():
+            return
+        self.wheel = TimingWheel(self.tick, self.settings['wheel_slots'], time.time())
+        self.entries = {}
+        self.loaded_until = 0.0
+        self.task = asyncio.get_running_loop().create_task(self.run())
+        logger.info("Таймеры открытия дней запущены")
+
+    def stop(self):
+        """Остановка цикла"""
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние колеса для диагностики"""
+        return {
+            'in_memory': len(self.entries),
+            'wheel_size': len(self.wheel),
+            'loaded_until': datetime.fromtimestamp(self.loaded_until).isoformat(timespec='seconds') if self.loaded_until else None,
+            'running': bool(self.task and not self.task.done())
+        }
+
+# Глобальный экземпляр таймеров
+unlock_timers = UnlockTimers()
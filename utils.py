@@ -6,13 +6,11 @@
 import re
 import logging
 import pytz
-import os
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 import hashlib
 import random
 import string
-from telegram import InputFile
 from telegram.constants import ParseMode
 
 logger = logging.getLogger(__name__)
@@ -430,8 +428,6 @@ def send_motivational_message(user_id: int, message: str = None):
     return message
 
 # Новые функции для улучшенной визуализации
-import os
-from telegram import InputFile
 from telegram.constants import ParseMode
 import logging
 
@@ -511,43 +507,14 @@ def split_long_text(text: str, max_length: int = 1000) -> tuple[str, str]:
 
 async def send_image_with_text(bot, chat_id: int, image_path: str, text: str, 
                              reply_markup=None, parse_mode: str = ParseMode.HTML):
-    """Отправка изображения с текстом"""
+    """Отправка изображения с текстом (повторно - по file_id, без загрузки файла)"""
+    from responder import responder
     try:
         logger.info(f"Попытка отправить изображение: {image_path}")
-        
-        # Разделяем длинный текст
-        caption_text, message_text = split_long_text(text)
-        
-        if not os.path.exists(image_path):
-            logger.warning(f"Файл изображения не найден: {image_path}")
-            # Если изображение не найдено, отправляем только текст
-            await bot.send_message(
-                chat_id=chat_id,
-                text=text,
-                reply_markup=reply_markup,
-                parse_mode=parse_mode
-            )
-            return
-        
-        logger.info(f"Файл изображения найден, размер: {os.path.getsize(image_path)} байт")
-        
-        with open(image_path, 'rb') as photo:
-            await bot.send_photo(
-                chat_id=chat_id,
-                photo=InputFile(photo),
-                caption=caption_text,
-                reply_markup=reply_markup,
-                parse_mode=parse_mode
-            )
-            logger.info("Изображение успешно отправлено")
-            
-            # НЕ отправляем дополнительный текст отдельным сообщением
-            # Все содержимое должно быть в caption изображения
-            if message_text:
-                logger.info("Дополнительный текст не отправлен (убрано по требованию)")
+        # Если изображение не найдено или не отправилось, отправляется только текст
+        return await responder.send(bot, chat_id, text, reply_markup, parse_mode, image_path)
     except Exception as e:
         logger.error(f"Ошибка при отправке изображения: {e}")
-        # В случае ошибки отправляем только текст
         await bot.send_message(
             chat_id=chat_id,
             text=text,